@@ -4,15 +4,83 @@ import requests
 import logging
 import time
 import json
+import os
+import itertools
+from collections.abc import Iterable
 import constants # Import constants
 from .decorators import retry_request # Import the decorator
+from .http_session import get_session
+from .json_codec import loads as json_loads
 
 # --- CDX API Fetching --- 
+def _iter_cdx_rows(response):
+    """
+    Yields CDX rows one at a time from a streamed `output=json` response.
+    The CDX server writes one row per line ('[["original",...],' ... '[...]]'),
+    so each line is decoded on its own instead of loading the whole body first.
+    """
+    for line in response.iter_lines():
+        line = line.strip()
+        if line.startswith(b'[[') and line.endswith(b']]'):
+            # Whole array on a single line (small result sets)
+            yield from json_loads(line)
+            continue
+        line = line.rstrip(b',')
+        if line.startswith(b'[['): # First line carries the outer opening bracket
+            line = line[1:]
+        if line.endswith(b']]'): # Last line carries the outer closing bracket
+            line = line[:-1]
+        if not line or line in (b'[', b']', b'[]'):
+            continue
+        yield json_loads(line)
+
+
+def _load_cdx_cache(cache_file, cache_key):
+    """Returns the cached CDX entry (validators + rows) for `cache_key`, or None."""
+    if not cache_file or not os.path.exists(cache_file):
+        return None
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        entry = cache.get(cache_key) if isinstance(cache, dict) else None
+        if entry and isinstance(entry.get('rows'), list):
+            return entry
+    except (json.JSONDecodeError, OSError) as e:
+        logging.warning(f"Could not read CDX cache file {cache_file}: {e}. Ignoring cache.")
+    return None
+
+
+def _save_cdx_cache(cache_file, cache_key, etag, last_modified, rows):
+    """Stores the CDX rows together with the response validators for the next run."""
+    try:
+        cache = {}
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    cache = json.load(f)
+                if not isinstance(cache, dict):
+                    cache = {}
+            except json.JSONDecodeError:
+                cache = {}
+        cache[cache_key] = {'etag': etag, 'last_modified': last_modified, 'rows': rows}
+        # Write to a temp file first so an interrupted run can't leave a truncated cache behind
+        tmp_file = f"{cache_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, cache_file)
+        logging.debug(f"Saved {len(rows)} CDX records to cache file {cache_file}.")
+    except OSError as e:
+        logging.error(f"Error saving CDX cache file {cache_file}: {e}")
+
+
 @retry_request(non_retryable_status=[404]) # Apply decorator, 404 is not retryable here
 def fetch_cdx_index(config):
     """
     Fetches the CDX index for the target domain using the retry decorator.
     Returns list of results, empty list, or None on failure.
+    Only the newest snapshot row of each URL is kept while the index streams in
+    (malformed rows are passed through for process_cdx_data to report), so memory
+    grows with the number of unique URLs rather than the number of snapshots.
     """
     cdx_url = config.get('cdx_api_url', constants.CDX_API_URL) # Use constant default
     target_domain = config['target_domain']
@@ -25,29 +93,67 @@ def fetch_cdx_index(config):
         'fl': constants.CDX_FIELDS, # Use constant
         'filter': [constants.CDX_FILTER_STATUS, constants.CDX_FILTER_MIMETYPE], # Use constants
     }
-    headers = {'User-Agent': user_agent}
+
+    # Revalidate a cached index from a previous run instead of downloading it again
+    cache_file = config.get('cdx_cache_file', constants.DEFAULT_CDX_CACHE_FILE)
+    cache_key = f"{cdx_url}?url={params['url']}"
+    cached = _load_cdx_cache(cache_file, cache_key)
+    conditional_headers = {}
+    if cached:
+        if cached.get('etag'):
+            conditional_headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            conditional_headers['If-Modified-Since'] = cached['last_modified']
 
     logging.info(f"Querying CDX API ({cdx_url}) for {target_domain}...")
     
     # The decorator handles the try/except for RequestException/Timeout and the retry loop/delay
-    response = requests.get(cdx_url, params=params, headers=headers, timeout=request_timeout)
-
-    try:
-        if response.status_code == 200:
+    # Stream the body so rows are parsed while the (possibly huge) index is still downloading
+    # The context manager returns the connection to the pool however the block exits
+    with get_session(user_agent).get(cdx_url, params=params, timeout=request_timeout, stream=True,
+                                     headers=conditional_headers or None) as response:
+        if response.status_code == 304 and cached: # Not Modified - reuse the rows from the last run
+            logging.info(f"CDX index for {target_domain} not modified since last run. Using {len(cached['rows'])} cached records.")
+            return cached['rows']
+        elif response.status_code == 200:
             try:
-                data = response.json()
-                if data and isinstance(data, list) and len(data) > 0:
-                    # Check if first item looks like header, remove if so
-                    if data[0] == constants.CDX_JSON_HEADER_ROW: # Use constant
-                        logging.debug("Removing CDX header row.")
-                        return data[1:]
+                rows = _iter_cdx_rows(response)
+                # Only the first row can be the header: check it once, outside the per-row loop
+                first_row = next(rows, None)
+                if first_row == constants.CDX_JSON_HEADER_ROW: # Use constant
+                    logging.debug("Removing CDX header row.")
+                elif first_row is not None:
+                    rows = itertools.chain((first_row,), rows) # Not a header, keep it
+
+                latest_rows = {} # original URL -> its newest row; older snapshots are dropped as they stream past
+                invalid_rows = []
+                mimetypes = {} # One shared str per distinct mimetype (the filter makes nearly all rows text/html)
+                get_latest = latest_rows.get # Bind once; called for every row
+                for row in rows:
+                    # Same validity check as process_cdx_data's fast path
+                    if (type(row) is list and len(row) >= 2 and type(row[0]) is str and row[0]
+                            and type(row[1]) is str and len(row[1]) == 14 and row[1].isdigit()):
+                        previous = get_latest(row[0])
+                        if previous is None or row[1] > previous[1]:
+                            if len(row) > 2 and type(row[2]) is str:
+                                row[2] = mimetypes.setdefault(row[2], row[2]) # Drop the decoder's per-row copy
+                            latest_rows[row[0]] = row
                     else:
-                        return data # Assume no header row
-                else:
+                        invalid_rows.append(row)
+                data = list(latest_rows.values())
+                data.extend(invalid_rows)
+                if not data:
                     logging.warning("CDX API returned empty or invalid data.")
                     return [] # Return empty list for no results
-            except json.JSONDecodeError:
-                logging.error(f"Failed to decode JSON response from CDX API. Response text: {response.text[:500]}...")
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+                if cache_file and (etag or last_modified): # Only cacheable if the server gave us a validator
+                    _save_cdx_cache(cache_file, cache_key, etag, last_modified, data)
+                return data
+            except requests.exceptions.RequestException:
+                raise # Connection dropped partway through the stream; let the decorator retry
+            except json.JSONDecodeError as e:
+                logging.error(f"Failed to decode JSON response from CDX API: {e}")
                 return None # Indicate failure
             except Exception as e:
                  logging.error(f"Unexpected error processing CDX JSON response: {e}")
@@ -65,12 +171,7 @@ def fetch_cdx_index(config):
         else:
             logging.error(f"CDX API request failed with unhandled status code: {response.status_code}. URL: {response.url}")
             return None # Indicate non-retryable failure
-            
-    finally:
-         # Ensure the response is always closed
-         if 'response' in locals() and response:
-              response.close()
-              
+
     # This part should ideally not be reached if the decorator handles retries correctly
     # and the function returns None or [] or data, or raises an exception.
     # If the decorator returns None after exhausting retries, that None will be returned.
@@ -83,8 +184,9 @@ def process_cdx_data(cdx_data):
     Processes the raw CDX data to find the latest snapshot for each unique URL.
     
     Args:
-        cdx_data (list): A list of lists, where each inner list represents a 
-                         snapshot [original_url, timestamp, mimetype].
+        cdx_data (iterable): A list (or any iterable, e.g. a generator) of lists,
+                         where each inner list represents a snapshot
+                         [original_url, timestamp, mimetype].
                          Assumes header row is already removed if present.
 
     Returns:
@@ -94,44 +196,45 @@ def process_cdx_data(cdx_data):
     if cdx_data is None:
         logging.error("Cannot process CDX data: input is None.")
         return None
-    if not isinstance(cdx_data, list):
-        logging.error(f"Cannot process CDX data: input is not a list (type: {type(cdx_data)}).")
+    if isinstance(cdx_data, (str, bytes, dict)) or not isinstance(cdx_data, Iterable):
+        logging.error(f"Cannot process CDX data: input is not a list of records (type: {type(cdx_data)}).")
         return None
 
     latest_snapshots = {}
     processed_count = 0
     skipped_count = 0
 
-    logging.info(f"Processing {len(cdx_data)} CDX records...")
+    if isinstance(cdx_data, list):
+        logging.info(f"Processing {len(cdx_data)} CDX records...")
+    else:
+        logging.info("Processing CDX records...")
 
+    get_latest = latest_snapshots.get # Bind once; called for every record
     for record in cdx_data:
+        # Fast path: a well-formed record [url, YYYYMMDDHHMMSS, ...] goes straight to the update.
+        # Exact type checks are enough here (the JSON decoder only produces plain lists/strs).
+        if type(record) is list and len(record) >= 2:
+            original_url, timestamp_str = record[0], record[1]
+            # mimetype = record[2] # Mimetype available if needed later
+            if original_url and type(timestamp_str) is str and len(timestamp_str) == 14 and timestamp_str.isdigit():
+                # Keep the newer timestamp; a single .get() probe instead of `in` + `[]`
+                previous = get_latest(original_url)
+                if previous is None or timestamp_str > previous:
+                    latest_snapshots[original_url] = timestamp_str
+
+                processed_count += 1
+                if processed_count % 1000 == 0: # Log progress periodically
+                     logging.info(f"Processed {processed_count} CDX records...")
+                continue
+
+        # Slow path: work out why the record was rejected, for the log
+        skipped_count += 1
         if not isinstance(record, list) or len(record) < 2:
             logging.warning(f"Skipping invalid CDX record: {record}")
-            skipped_count += 1
-            continue
-
-        original_url = record[0]
-        timestamp_str = record[1]
-        # mimetype = record[2] # Mimetype available if needed later
-
-        if not original_url or not timestamp_str:
-             logging.warning(f"Skipping CDX record with missing URL or timestamp: {record}")
-             skipped_count += 1
-             continue
-
-        # Basic validation of timestamp format (YYYYMMDDHHMMSS)
-        if not (len(timestamp_str) == 14 and timestamp_str.isdigit()):
-            logging.warning(f"Skipping CDX record with invalid timestamp format '{timestamp_str}': {record}")
-            skipped_count += 1
-            continue
-            
-        # Check if this URL is already tracked and if the current timestamp is newer
-        if original_url not in latest_snapshots or timestamp_str > latest_snapshots[original_url]:
-            latest_snapshots[original_url] = timestamp_str
-        
-        processed_count += 1
-        if processed_count % 1000 == 0: # Log progress periodically
-             logging.info(f"Processed {processed_count} CDX records...")
+        elif not record[0] or not record[1]:
+            logging.warning(f"Skipping CDX record with missing URL or timestamp: {record}")
+        else:
+            logging.warning(f"Skipping CDX record with invalid timestamp format '{record[1]}': {record}")
 
     logging.info(f"Finished processing CDX data. Found latest snapshots for {len(latest_snapshots)} unique URLs.")
     if skipped_count > 0:
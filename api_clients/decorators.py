@@ -1,14 +1,146 @@
 # Decorators for API client functions
 import time
+import random
 import logging;
 import requests
 import functools
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import constants # Import constants
 
 DEFAULT_TIMEOUT = 60 # Default timeout for requests within the decorator
 
-def retry_request(max_retries_key="max_retries", delay_key="request_delay_seconds", non_retryable_status=[404], return_on_failure=None):
+
+class CircuitBreaker:
+    """
+    Tracks consecutive retryable failures (429/5xx, timeouts, connection errors) for one
+    decorated function, i.e. one upstream service. After `threshold` failures in a row the
+    breaker opens and calls fail fast for `cooldown` seconds; then a single probe request is
+    let through (half-open) and its outcome either closes the breaker or re-opens it.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name):
+        self.name = name
+        self.state = self.CLOSED
+        self.fail_count = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow_request(self, cooldown):
+        """Returns True if a request may be made now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= cooldown:
+                self.state = self.HALF_OPEN # Let one probe through
+                return True
+            return False # Open and cooling down, or a probe is already in flight
+
+    def record_success(self):
+        """The service answered (even with a non-retryable error): close the breaker."""
+        with self._lock:
+            if self.state != self.CLOSED:
+                logging.info(f"Circuit breaker for {self.name} closed again.")
+            self.state = self.CLOSED
+            self.fail_count = 0
+
+    def release_probe(self):
+        """A call ended without an outcome (e.g. Ctrl+C mid-probe): let the next call probe instead."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN # opened_at is already past the cooldown
+
+    def record_failure(self, threshold, cooldown):
+        """Counts a retryable failure and opens the breaker once `threshold` is reached."""
+        with self._lock:
+            self.fail_count += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.fail_count >= threshold):
+                logging.warning(f"Circuit breaker for {self.name} opened after {self.fail_count} consecutive failures. "
+                                f"Failing fast for {cooldown} seconds.")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+def parse_retry_after(value):
+    """
+    Parses a Retry-After header value, given either as delay-seconds or as an HTTP-date.
+    Returns the number of seconds to wait (never negative), or None if missing/unparsable.
     """
-    Decorator to add retry logic with exponential backoff to functions making HTTP requests.
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None: # HTTP-dates are GMT
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class _LazyUrlSnippet:
+    """
+    The "for <url>..." text used in retry log messages. The URL is searched for in the
+    wrapped call's arguments only when the snippet is first formatted (i.e. on a warning
+    or error path, or with DEBUG enabled), not on every successful call.
+    """
+    __slots__ = ('_func_name', '_args', '_kwargs', '_text')
+
+    def __init__(self, func_name, args, kwargs):
+        self._func_name = func_name
+        self._args = args
+        self._kwargs = kwargs
+        self._text = None
+
+    def __str__(self):
+        if self._text is None:
+            url_to_log = self._kwargs.get('url') # Prioritize 'url' kwarg
+            if not url_to_log:
+                # Find first string arg starting with http
+                for arg in self._args:
+                    if isinstance(arg, str) and arg.startswith('http'):
+                        url_to_log = arg
+                        break
+            # If still not found, check other kwargs (less likely)
+            if not url_to_log:
+                for key, value in self._kwargs.items():
+                    if key != 'config' and isinstance(value, str) and value.startswith('http'):
+                        url_to_log = value
+                        break
+            if url_to_log:
+                self._text = f"for {url_to_log[:80]}..." # Log truncated URL
+            else:
+                self._text = f"for function {self._func_name}"
+        return self._text
+
+
+_circuit_breakers = {} # One breaker per decorated function
+_circuit_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(name):
+    """Returns the circuit breaker registered under `name`, creating it on first use."""
+    with _circuit_breakers_lock:
+        if name not in _circuit_breakers:
+            _circuit_breakers[name] = CircuitBreaker(name)
+        return _circuit_breakers[name]
+
+def reset_circuit_breakers():
+    """Forgets all breaker state (e.g. between independent runs or tests)."""
+    with _circuit_breakers_lock:
+        _circuit_breakers.clear()
+
+def retry_request(max_retries_key="max_retries", delay_key="request_delay_seconds", max_delay_key="max_retry_delay_seconds", non_retryable_status=[404], return_on_failure=None):
+    """
+    Decorator to add retry logic with jittered exponential backoff to functions making HTTP requests.
+    Backoff uses "decorrelated jitter": each wait is drawn from [delay, previous_wait * 3] and
+    capped, so concurrent callers hitting the same rate limit do not retry in lockstep.
+    A Retry-After header on a 429/5xx response raises the wait to at least the advertised delay.
+    A per-function CircuitBreaker makes calls fail fast (returning `return_on_failure`)
+    while the upstream service keeps answering 429/5xx or timing out.
     Assumes the wrapped function:
     - Makes a single primary `requests` call (e.g., requests.get).
     - Accepts a 'config' dictionary keyword argument (`config=...`) containing keys
@@ -20,6 +152,7 @@ def retry_request(max_retries_key="max_retries", delay_key="request_delay_second
     Args:
         max_retries_key (str): Key in the config dict for max retries.
         delay_key (str): Key in the config dict for base delay in seconds.
+        max_delay_key (str): Key in the config dict for the maximum delay between retries in seconds.
         non_retryable_status (list): List of HTTP status codes that should NOT trigger a retry.
     """
     def decorator(func):
@@ -46,11 +179,6 @@ def retry_request(max_retries_key="max_retries", delay_key="request_delay_second
                     if url_to_log:
                         log_url_snippet = f"for {url_to_log[:80]}..."
                     logging.error(f"Request failed {log_url_snippet} (no retries applied): {e}")
-                    if hasattr(e, 'response') and e.response:
-                        try:
-                            e.response.close()
-                        except Exception:
-                            pass # Ignore errors during close
                     return return_on_failure
                 except Exception as e:
                     logging.error(f"Unexpected error during {func.__name__} execution (no retries applied): {e}", exc_info=True)
@@ -58,45 +186,55 @@ def retry_request(max_retries_key="max_retries", delay_key="request_delay_second
 
             max_retries = config.get(max_retries_key, 3)
             delay = config.get(delay_key, 1)
+            max_delay = config.get(max_delay_key, constants.DEFAULT_MAX_RETRY_DELAY)
+            breaker_threshold = config.get('circuit_breaker_threshold', constants.DEFAULT_CIRCUIT_BREAKER_THRESHOLD)
+            breaker_cooldown = config.get('circuit_breaker_cooldown_seconds', constants.DEFAULT_CIRCUIT_BREAKER_COOLDOWN)
+            breaker = get_circuit_breaker(f"{func.__module__}.{func.__name__}") if breaker_threshold else None
 
-            # --- URL Snippet Finding (Improved) ---
-            log_url_snippet = f"for function {func.__name__}"
-            url_to_log = kwargs.get('url') # Prioritize 'url' kwarg
-            if not url_to_log:
-                # Find first string arg starting with http
-                for arg in args:
-                    if isinstance(arg, str) and arg.startswith('http'):
-                        url_to_log = arg
-                        break
-            # If still not found, check other kwargs (less likely)
-            if not url_to_log:
-                 for key, value in kwargs.items():
-                     if key != 'config' and isinstance(value, str) and value.startswith('http'):
-                         url_to_log = value
-                         break
-            if url_to_log:
-                log_url_snippet = f"for {url_to_log[:80]}..." # Log truncated URL
+            # --- URL Snippet (found lazily, only if a message is actually logged) ---
+            log_url_snippet = _LazyUrlSnippet(func.__name__, args, kwargs)
 
             # --- Retry Loop ---
             retries = 0
-            logging.debug(f"DEBUG: Decorator: Starting retry loop for {func.__name__} {log_url_snippet}, max_retries={max_retries}")
+            prev_wait = delay # Seed for decorrelated jitter
+            retry_after = None # Server-advertised wait from the last 429/503 response, if any
+            logging.debug("Decorator: Starting retry loop for %s %s, max_retries=%s", func.__name__, log_url_snippet, max_retries)
             last_exception = None
 
             while True: # Loop until success, non-retryable error, or max retries exceeded
                 try:
-                    logging.debug(f"DEBUG: Decorator: Loop iteration start, retries={retries}")
+                    logging.debug("Decorator: Loop iteration start, retries=%s", retries)
                     # --- Delay ---
                     if retries > 0:
-                        wait_time = (2 ** (retries - 1)) * delay
+                        wait_time = random.uniform(delay, prev_wait * 3)
+                        if retry_after is not None: # The server's Retry-After is a floor for our own guess
+                            wait_time = max(wait_time, retry_after)
+                            retry_after = None
+                        wait_time = min(max_delay, wait_time)
+                        prev_wait = max(wait_time, delay)
                         logging.warning(f"Retrying request {log_url_snippet} ({retries}/{max_retries}) after delay of {wait_time:.2f} seconds...")
                         time.sleep(wait_time)
 
+                    # --- Fail Fast While the Service Is Down ---
+                    if breaker and not breaker.allow_request(breaker_cooldown):
+                        logging.warning(f"Circuit breaker for {func.__name__} is open. Skipping request {log_url_snippet}.")
+                        return return_on_failure
+
                     # --- Call Original Function ---
-                    logging.debug(f"DEBUG: Decorator: Calling wrapped function {func.__name__}")
-                    result = func(*args, **kwargs)
+                    logging.debug("Decorator: Calling wrapped function %s", func.__name__)
+                    try:
+                        result = func(*args, **kwargs)
+                    except Exception:
+                        raise # Handled below, where each error type records its outcome
+                    except BaseException: # KeyboardInterrupt/SystemExit: no outcome, don't leave the breaker half-open
+                        if breaker:
+                            breaker.release_probe()
+                        raise
+                    if breaker:
+                        breaker.record_success()
                     # --- Return Immediately on Success (Any result, including None) ---
-                    logging.debug(f"DEBUG: Decorator: Wrapped function returned: {type(result)} {str(result)[:100]}") # Log type and snippet
-                    logging.debug(f"DEBUG: Decorator: Returning result immediately.")
+                    logging.debug("Decorator: Wrapped function returned: %s %.100s", type(result), result) # Formatted only if DEBUG is enabled
+                    logging.debug("Decorator: Returning result immediately.")
                     return result
 
                 # --- Exception Handling ---
@@ -104,7 +242,7 @@ def retry_request(max_retries_key="max_retries", delay_key="request_delay_second
                     last_exception = e
                     status_code = None
                     response_obj = None
-                    logging.debug(f"DEBUG: Decorator: Entering HTTPError block, exception={e}")
+                    logging.debug("Decorator: Entering HTTPError block, exception=%s", e)
                     should_close_response = False
 
                     if hasattr(e, 'response') and e.response is not None:
@@ -114,74 +252,83 @@ def retry_request(max_retries_key="max_retries", delay_key="request_delay_second
 
                     # Check for non-retryable status codes FIRST
                     if status_code in non_retryable_status:
+                        if breaker:
+                            breaker.record_success() # The service is up, the resource just isn't there
                         logging.warning(f"HTTP error {status_code} {log_url_snippet} is non-retryable. Failing.")
-                        logging.debug(f"DEBUG: Decorator: Non-retryable status {status_code}, returning None.")
+                        logging.debug("Decorator: Non-retryable status %s, returning None.", status_code)
                         # Removed explicit close call; wrapped function's finally should handle it.
                         return return_on_failure # Non-retryable failure
 
 
                     # Check for retryable status codes NEXT (429 or 5xx)
                     elif status_code and (status_code == 429 or status_code >= 500):
+                        if breaker:
+                            breaker.record_failure(breaker_threshold, breaker_cooldown)
+                        retry_after = parse_retry_after(getattr(response_obj, 'headers', {}).get('Retry-After'))
                         if retries < max_retries:
                             logging.warning(f"Retryable HTTP error {status_code} {log_url_snippet}. Retrying ({retries+1}/{max_retries})...")
                             retries += 1
                             # Removed response_obj.close() here to avoid double closing before retry
-                            logging.debug(f"DEBUG: Decorator: Continuing loop for retryable HTTPError {status_code}, retries={retries}")
+                            logging.debug("Decorator: Continuing loop for retryable HTTPError %s, retries=%s", status_code, retries)
                             continue # Go to next iteration for retry
                         else:
                             logging.warning(f"Retryable HTTP error {status_code} {log_url_snippet}. Max retries ({max_retries}) reached.")
-                            logging.debug(f"DEBUG: Decorator: Breaking loop after max retries for HTTPError {status_code}")
+                            logging.debug("Decorator: Breaking loop after max retries for HTTPError %s", status_code)
                             # Removed explicit close call; wrapped function's finally should handle it.
                             break # Exit loop to log final error
 
 
                     # Handle other HTTP errors (e.g., other 4xx or if status_code is None)
                     else:
+                        if breaker:
+                            breaker.record_success() # The service answered; the request itself was bad
                         err_msg = f"Unhandled HTTP error ({status_code or 'no status code'}) encountered {log_url_snippet}: {e}"
                         logging.error(err_msg)
                         # Removed explicit close call; wrapped function's finally should handle it.
-                        logging.debug(f"DEBUG: Decorator: Returning None for unhandled HTTPError ({status_code or 'no status code'}).")
+                        logging.debug("Decorator: Returning None for unhandled HTTPError (%s).", status_code or 'no status code')
                         return return_on_failure # Indicate failure for unhandled HTTP errors
 
-                except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                # ChunkedEncodingError: the connection dropped partway through a streamed body
+                except (requests.exceptions.Timeout, requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
                     last_exception = e
                     exc_type = type(e).__name__
-                    logging.debug(f"DEBUG: Decorator: Entering {exc_type} block, exception={e}")
+                    logging.debug("Decorator: Entering %s block, exception=%s", exc_type, e)
+                    if breaker:
+                        breaker.record_failure(breaker_threshold, breaker_cooldown)
                     if retries < max_retries:
                         logging.warning(f"{exc_type} occurred {log_url_snippet}. Retrying ({retries+1}/{max_retries})...")
                         retries += 1
-                        logging.debug(f"DEBUG: Decorator: Continuing loop for {exc_type}, retries={retries}")
+                        logging.debug("Decorator: Continuing loop for %s, retries=%s", exc_type, retries)
                         continue # Go to next iteration for retry
                     else:
                         logging.warning(f"{exc_type} occurred {log_url_snippet}. Max retries ({max_retries}) reached.")
-                        logging.debug(f"DEBUG: Decorator: Breaking loop after max retries for {exc_type}")
+                        logging.debug("Decorator: Breaking loop after max retries for %s", exc_type)
                         break # Exit loop to log final error
 
                 except requests.exceptions.RequestException as e:
                     # Catch other request exceptions AFTER specific ones
                     last_exception = e
                     logging.error(f"Unhandled RequestException {log_url_snippet}: {e}")
-                    # Ensure response is closed if it exists on the exception
-                    logging.debug(f"DEBUG: Decorator: Entering unhandled RequestException block, exception={e}")
-                    if hasattr(e, 'response') and e.response:
-                        try:
-                            e.response.close()
-                        except Exception:
-                            pass
+                    if breaker:
+                        breaker.record_failure(breaker_threshold, breaker_cooldown)
+                    # The wrapped function's `with` block has already closed any response
+                    logging.debug("Decorator: Entering unhandled RequestException block, exception=%s", e)
                     return return_on_failure # Don't retry unknown RequestExceptions
 
 
                 except Exception as e:
                      # Catch unexpected errors from func itself
                      last_exception = e
-                     logging.debug(f"DEBUG: Decorator: Entering unexpected Exception block, exception={e}")
+                     logging.debug("Decorator: Entering unexpected Exception block, exception=%s", e)
                      logging.error(f"Unexpected error during {func.__name__} execution {log_url_snippet}: {e}", exc_info=True)
-                     logging.debug(f"DEBUG: Decorator: Returning None for unexpected Exception.")
+                     if breaker:
+                         breaker.record_success() # Not a service failure; don't leave a probe half-open
+                     logging.debug("Decorator: Returning None for unexpected Exception.")
                      return return_on_failure # Indicate failure
 
             # --- After Loop (Max Retries Reached for a retryable error) ---
             logging.error(f"Request failed {log_url_snippet} after {max_retries} retries. Last exception: {last_exception}")
-            logging.debug(f"DEBUG: Decorator: Returning None after loop (max retries reached).")
+            logging.debug("Decorator: Returning None after loop (max retries reached).")
             return return_on_failure # Indicate final failure after retries
 
         return wrapper
@@ -0,0 +1,80 @@
+# Shared HTTP session for all API clients
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+import constants # Import constants
+from .decorators import parse_retry_after
+from .rate_limiter import HostRateLimiter
+
+_rate_limiter = HostRateLimiter() # Unlimited until configure_rate_limit() is called
+_session = None
+_session_user_agent = None # User-Agent last set on the session; avoids a header lookup per call
+_session_lock = threading.Lock()
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that takes a token from the per-host rate limiter before each request
+    actually goes out, so concurrent workers share one request budget per host.
+    A 429/503 with a Retry-After header holds back all requests to that host, not
+    just the retry of the request that received it.
+    """
+
+    def __init__(self, rate_limiter, **kwargs):
+        self.rate_limiter = rate_limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        host = urlsplit(request.url).hostname
+        self.rate_limiter.acquire(host)
+        response = super().send(request, **kwargs)
+        if response.status_code in (429, 503):
+            self.rate_limiter.pause(host, parse_retry_after(response.headers.get('Retry-After')))
+        return response
+
+
+def configure_rate_limit(requests_per_second, burst=constants.RATE_LIMIT_BURST, max_pause=constants.DEFAULT_MAX_RETRY_DELAY):
+    """
+    Limits requests to each host to `requests_per_second` (0 = unlimited), allowing short bursts.
+    A Retry-After from the server holds the host back for at most `max_pause` seconds.
+    """
+    _rate_limiter.configure(requests_per_second, burst, max_pause)
+
+
+def get_session(user_agent=None):
+    """
+    Returns the process-wide requests.Session, creating it on first use.
+    The session keeps connections to web.archive.org / timetravel.mementoweb.org
+    alive between calls instead of opening a new TCP+TLS connection per request.
+    If `user_agent` is given, it is set as the session's default User-Agent header.
+    """
+    global _session, _session_user_agent
+    if _session is None:
+        with _session_lock:
+            if _session is None: # Re-check after acquiring the lock
+                session = requests.Session()
+                adapter = RateLimitedAdapter(
+                    _rate_limiter,
+                    pool_connections=constants.HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=constants.HTTP_POOL_MAXSIZE,
+                    pool_block=False
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+
+    if user_agent and user_agent != _session_user_agent:
+        _session.headers['User-Agent'] = user_agent
+        _session_user_agent = user_agent
+    return _session
+
+
+def close_session():
+    """Closes the shared session (if any) and releases its pooled connections."""
+    global _session, _session_user_agent
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+            _session_user_agent = None
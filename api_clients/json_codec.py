@@ -0,0 +1,29 @@
+# Fast JSON decoding for API responses (and encoding for the checkpoint)
+import json
+
+try:
+    import orjson
+except ImportError: # orjson is optional; fall back to the stdlib parser
+    orjson = None
+
+
+def loads(data):
+    """
+    Decodes a JSON document from bytes (or str).
+    Uses orjson when it is installed, which parses the raw response bytes directly
+    instead of decoding them to str first; otherwise falls back to the json module.
+    Both raise a json.JSONDecodeError (sub)class on malformed input.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj):
+    """
+    Encodes `obj` as compact JSON and returns UTF-8 bytes, ready for a file opened in 'wb'.
+    Uses orjson when it is installed; otherwise falls back to the json module.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
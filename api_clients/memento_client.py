@@ -1,17 +1,38 @@
 # Module for interacting with the Memento Time Travel API
 
-import requests
 import logging
 import time
 import json
-from datetime import datetime
-from urllib.parse import urlparse
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import constants # Import constants
 from .decorators import retry_request # Import the decorator
+from .http_session import get_session
+from .json_codec import loads as json_loads
 
 from html_processor import extract_and_convert_content
 from file_handler import save_markdown, save_checkpoint
 
+_HTML_TAG_RE = re.compile(rb'<html', re.IGNORECASE) # Case-insensitive check without a lowercased copy of the body
+
+
+def _utc_timestamp14():
+    """
+    Returns the current UTC time as a 14-digit Wayback/Memento timestamp (YYYYMMDDHHMMSS).
+    Archive timestamps are UTC; formatting time.gmtime() fields directly is also cheaper
+    than building a datetime and calling strftime().
+    """
+    t = time.gmtime()
+    return f"{t.tm_year:04d}{t.tm_mon:02d}{t.tm_mday:02d}{t.tm_hour:02d}{t.tm_min:02d}{t.tm_sec:02d}"
+
+
+def _uri_host(uri):
+    """
+    Returns the lowercased host[:port] part of an absolute or scheme-relative URI.
+    Plain string slicing; much cheaper than urlparse() for this single check.
+    """
+    return uri.partition('//')[2].split('/', 1)[0].lower()
+
 
 # --- Memento Fallback ---
 @retry_request(non_retryable_status=[404])
@@ -23,26 +44,23 @@ def fetch_memento_snapshot(original_url, config, wayback_timestamp=None):
     user_agent = config.get('user_agent', constants.DEFAULT_USER_AGENT)
     request_timeout = config.get('request_timeout_api', constants.DEFAULT_TIMEOUT_API) 
 
-    # Use Wayback timestamp if available, otherwise current time
+    # Use Wayback timestamp if available, otherwise current (UTC) time
     if wayback_timestamp and len(wayback_timestamp) == 14 and wayback_timestamp.isdigit():
         memento_dt_str = wayback_timestamp
     else:
-        memento_dt_str = datetime.now().strftime('%Y%m%d%H%M%S')
+        memento_dt_str = _utc_timestamp14()
 
     # Use constant for base URL
     memento_api_url = f"{constants.MEMENTO_API_BASE_URL}{memento_dt_str}/{original_url}"
-    headers = {'User-Agent': user_agent}
     
     logging.info(f"Querying Memento API: {memento_api_url}")
 
     # Decorator handles try/except for RequestException/Timeout and retry loop/delay
-    response = requests.get(memento_api_url, headers=headers, timeout=request_timeout)
-    
     memento_uri = None # Initialize to None
-    try:
+    with get_session(user_agent).get(memento_api_url, timeout=request_timeout) as response:
         if response.status_code == 200:
             try:
-                data = response.json()
+                data = json_loads(response.content) # Parse the raw bytes, no intermediate str
                 # Check structure carefully before accessing keys
                 if (data and isinstance(data, dict) and 
                     'mementos' in data and isinstance(data['mementos'], dict) and
@@ -53,7 +71,7 @@ def fetch_memento_snapshot(original_url, config, wayback_timestamp=None):
                     potential_uri = data['mementos']['closest']['uri'][0] # URI is usually in a list
                     
                     # CRITICAL CHECK: Avoid web.archive.org loops
-                    if 'web.archive.org' not in urlparse(potential_uri).netloc:
+                    if 'web.archive.org' not in _uri_host(potential_uri):
                         logging.info(f"Found potential Memento URI: {potential_uri}")
                         memento_uri = potential_uri
                     else:
@@ -79,14 +97,44 @@ def fetch_memento_snapshot(original_url, config, wayback_timestamp=None):
         else: # Other client errors (4xx not in non_retryable_status list)
             logging.error(f"Memento API request failed with unhandled client error {response.status_code}. Skipping. URL: {response.url}")
             # memento_uri remains None
-            
-    finally:
-        # Ensure the response is always closed
-        if 'response' in locals() and response:
-             response.close()
 
     return memento_uri
 
+def fetch_mementos_batch(snapshots, config):
+    """
+    Looks up Memento snapshots for many URLs concurrently using a bounded thread pool.
+    Workers share the pooled HTTP session, so the pool size is capped at the
+    session's per-host connection limit.
+
+    Args:
+        snapshots (dict): Maps original URLs to their Wayback timestamps (or None).
+        config (dict): Configuration dictionary.
+
+    Returns:
+        dict: Maps each original URL (in input order) to its Memento URI, or None if none was found.
+    """
+    if not snapshots:
+        return {}
+
+    max_workers = min(config.get('memento_workers', constants.DEFAULT_MEMENTO_WORKERS), constants.HTTP_POOL_MAXSIZE)
+    logging.info(f"Querying Memento API for {len(snapshots)} URLs using {max_workers} workers...")
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_url = {
+            executor.submit(fetch_memento_snapshot, original_url, config=config, wayback_timestamp=timestamp): original_url
+            for original_url, timestamp in snapshots.items()
+        }
+        for future in as_completed(future_to_url):
+            original_url = future_to_url[future]
+            try:
+                results[original_url] = future.result()
+            except Exception as e: # The decorator normally swallows errors; guard anyway
+                logging.error(f"Unexpected error looking up Memento snapshot for {original_url}: {e}")
+                results[original_url] = None
+
+    return {original_url: results.get(original_url) for original_url in snapshots}
+
 @retry_request(non_retryable_status=[404, 403], return_on_failure=False)
 def fetch_and_process_memento_content(memento_uri, original_url, config, processed_urls_set):
     """
@@ -97,20 +145,18 @@ def fetch_and_process_memento_content(memento_uri, original_url, config, process
 
     user_agent = config.get('user_agent', constants.DEFAULT_USER_AGENT)
     request_timeout = config.get('request_timeout_content', constants.DEFAULT_TIMEOUT_CONTENT)
-    headers = {'User-Agent': user_agent}
 
     logging.info(f"Attempting to fetch content from Memento URI: {memento_uri}")
 
     # Decorator handles try/except for RequestException/Timeout and retry loop/delay
-    response = requests.get(memento_uri, headers=headers, timeout=request_timeout)
-
     success = False # Initialize success flag
-    try:
+    with get_session(user_agent).get(memento_uri, timeout=request_timeout) as response:
         if response.status_code == 200:
             try:
-                response.encoding = 'utf-8' # Assume UTF-8
-                memento_html = response.text
-                if memento_html and "<html" in memento_html.lower():
+                # Hand the raw bytes to the parser, which decodes them once (as UTF-8),
+                # instead of keeping both response.content and a decoded response.text alive
+                memento_html = response.content
+                if memento_html and _HTML_TAG_RE.search(memento_html):
                     logging.info(f"Successfully fetched HTML from Memento URI: {memento_uri}")
 
                     # --- Process Memento HTML --- 
@@ -123,7 +169,7 @@ def fetch_and_process_memento_content(memento_uri, original_url, config, process
                         # success remains False
                     else:
                         # Save markdown
-                        memento_timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+                        memento_timestamp = _utc_timestamp14()
                         save_success = save_markdown(title, markdown_content, original_url, memento_timestamp, config)
                         
                         if save_success:
@@ -155,10 +201,5 @@ def fetch_and_process_memento_content(memento_uri, original_url, config, process
         else: # Other client errors (4xx not in non_retryable_status list)
             logging.error(f"Memento content request failed with unhandled client error {response.status_code}. Skipping. URL: {response.url}")
             # success remains False
-            
-    finally:
-        # Ensure the response is always closed
-        if 'response' in locals() and response:
-             response.close()
 
     return success
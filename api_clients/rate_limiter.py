@@ -0,0 +1,80 @@
+# Client-side rate limiting for outgoing HTTP requests
+import time
+import threading
+
+
+class TokenBucket:
+    """
+    Token bucket for one host: allows `burst` requests at once, refilled at `rate`
+    requests per second (0 = unlimited). Callers reserve a token and are told how long
+    to wait, so waiting happens outside the lock and concurrent callers are served in
+    arrival order. `pause_until` blocks the host entirely (e.g. after a 429).
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Takes one token and returns the number of seconds to wait before sending."""
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            if self.rate:
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                self.tokens -= 1 # May go negative: the deficit is the caller's place in the queue
+                if self.tokens < 0:
+                    wait = -self.tokens / self.rate
+            return max(wait, self.blocked_until - now)
+
+    def pause_until(self, deadline):
+        """Blocks the host until `deadline` (a time.monotonic() value)."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, deadline)
+
+
+class HostRateLimiter:
+    """Keeps one TokenBucket per host, all sharing the same rate, burst and maximum pause."""
+
+    def __init__(self, rate=0, burst=1, max_pause=None):
+        self.rate = rate
+        self.burst = burst
+        self.max_pause = max_pause # None = no cap on pause()
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def configure(self, rate, burst, max_pause=None):
+        """
+        Sets the per-host rate (requests per second, 0 = unlimited), burst and the
+        longest pause() a server may impose (None = no cap); resets all buckets.
+        """
+        with self._lock:
+            self.rate = rate
+            self.burst = burst
+            self.max_pause = max_pause
+            self._buckets = {}
+
+    def _bucket(self, host):
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(host, TokenBucket(self.rate, self.burst))
+        return bucket
+
+    def acquire(self, host):
+        """Blocks until a request to `host` may be sent."""
+        wait = self._bucket(host).reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, host, seconds):
+        """Holds back every request to `host` for `seconds` (e.g. a 429's Retry-After), at most `max_pause`."""
+        if seconds and seconds > 0:
+            if self.max_pause is not None:
+                seconds = min(seconds, self.max_pause)
+            self._bucket(host).pause_until(time.monotonic() + seconds)
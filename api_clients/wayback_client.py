@@ -1,43 +1,96 @@
 # Module for fetching content/assets from Wayback Machine
 
+import os
+import re
 import requests
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import constants # Import constants
 from .decorators import retry_request # Import the decorator
+from .http_session import get_session
+
+_HTML_TAG_RE = re.compile(rb'<html', re.IGNORECASE) # Case-insensitive check without a lowercased copy of the body
+# Archive URLs are built as _ARCHIVE_PREFIX + timestamp + _RAW_MARKER + url
+_ARCHIVE_PREFIX = constants.WAYBACK_BASE_URL
+_RAW_MARKER = constants.WAYBACK_RAW_PREFIX + "/"
 
 # --- Asset Fetching --- 
+def _stream_to_file(response, dest_path, asset_url, archive_url, chunk_size):
+    """
+    Writes a streamed response body to `dest_path` chunk by chunk.
+    Returns `dest_path`, or None if the body was empty or could not be written.
+    A partial file is removed on failure; network errors are re-raised so the
+    retry decorator can retry the download.
+    """
+    written = 0
+    try:
+        with open(dest_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                written += len(chunk)
+    except requests.exceptions.RequestException:
+        _remove_partial_file(dest_path)
+        raise
+    except Exception as e:
+        logging.error(f"Error writing asset {archive_url} to {dest_path}: {e}")
+        _remove_partial_file(dest_path)
+        return None
+
+    if not written:
+        logging.warning(f"Fetched empty asset content from {archive_url}. Skipping.")
+        _remove_partial_file(dest_path)
+        return None
+
+    logging.debug("Successfully fetched asset: %s from %s", asset_url, archive_url)
+    logging.info(f"Successfully saved asset: {dest_path}")
+    return dest_path
+
+def _remove_partial_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
 @retry_request(non_retryable_status=[404])
-def fetch_asset(asset_url, original_page_timestamp, config):
+def fetch_asset(asset_url, original_page_timestamp, config, dest_path=None):
     """
     Fetches the raw content of a specific archived asset snapshot using retry decorator.
     Returns asset content as bytes or None on failure.
+    If `dest_path` is given, the body is streamed to that file in
+    'asset_chunk_size' chunks instead (never held in memory as a whole),
+    and `dest_path` is returned on success.
     """
     user_agent = config['user_agent']
     request_timeout = config.get('request_timeout_seconds', 60) # Use a configurable timeout
     
     # Construct the Wayback Machine URL for raw asset content (using id_ flag)
-    archive_url = f"https://web.archive.org/web/{original_page_timestamp}id_/{asset_url}"
-    headers = {'User-Agent': user_agent}
+    archive_url = _ARCHIVE_PREFIX + original_page_timestamp + _RAW_MARKER + asset_url
 
-    logging.debug(f"Attempting to fetch asset: {archive_url}")
+    logging.debug("Attempting to fetch asset: %s", archive_url)
 
     # Decorator handles try/except for RequestException/Timeout and retry loop/delay
-    # Use stream=True for potentially large assets
-    response = requests.get(archive_url, headers=headers, timeout=request_timeout, stream=True) 
-
+    # Use stream=True for potentially large assets; the shared session reuses keep-alive connections
     content = None # Initialize content to None
-    try:
+    with get_session(user_agent).get(archive_url, timeout=request_timeout, stream=True) as response:
         if response.status_code == 200:
+            if dest_path:
+                # Success - stream the body straight to disk
+                chunk_size = config.get('asset_chunk_size', constants.DOWNLOAD_CHUNK_SIZE)
+                return _stream_to_file(response, dest_path, asset_url, archive_url, chunk_size)
+
             # Success - return raw bytes
             try:
                 asset_content = response.content # Read raw bytes
                 if asset_content:
-                    logging.debug(f"Successfully fetched asset: {asset_url} from {archive_url}")
+                    logging.debug("Successfully fetched asset: %s from %s", asset_url, archive_url)
                     content = asset_content
                 else:
                     logging.warning(f"Fetched empty asset content from {archive_url}. Skipping.")
                     # content remains None
-            except Exception as e:
+            # A connection dropped while reading the body raises on to the decorator, which retries
+            except requests.exceptions.ContentDecodingError as e: # e.g. a corrupt gzip body; retrying won't help
                 logging.error(f"Error reading content bytes from {archive_url}: {e}")
                 # content remains None
 
@@ -51,15 +104,16 @@ def fetch_asset(asset_url, original_page_timestamp, config):
         else: # Other client errors (4xx not in non_retryable_status list)
             logging.error(f"Wayback Machine asset request failed with unhandled client error {response.status_code}. Skipping. URL: {response.url}")
             # content remains None
-    finally:
-         # Ensure the response is always closed
-         if 'response' in locals() and response:
-              response.close()
 
     return content # Return the processed content or None
 
 
 # --- Page Fetching --- 
+def _has_html_content_type(response):
+    """True unless the response declares a Content-Type that is not (X)HTML."""
+    content_type = response.headers.get('Content-Type')
+    return not content_type or 'html' in content_type.lower()
+
 @retry_request(non_retryable_status=[404])
 def fetch_page_content(original_url, timestamp, config):
     """
@@ -69,30 +123,32 @@ def fetch_page_content(original_url, timestamp, config):
     user_agent = config['user_agent']
     request_timeout = config.get('request_timeout_seconds', 60) # Use a configurable timeout
 
-    archive_url = f"https://web.archive.org/web/{timestamp}id_/{original_url}"
-    headers = {'User-Agent': user_agent}
+    archive_url = _ARCHIVE_PREFIX + timestamp + _RAW_MARKER + original_url
 
-    logging.debug(f"Attempting to fetch: {archive_url}")
+    logging.debug("Attempting to fetch: %s", archive_url)
     
     # Decorator handles try/except for RequestException/Timeout and retry loop/delay
-    response = requests.get(archive_url, headers=headers, timeout=request_timeout)
-    
+    # The shared session reuses keep-alive connections to web.archive.org.
+    # stream=True returns once the headers arrive, so a non-HTML body is never downloaded.
     content = None # Initialize content to None
-    try:
-        if response.status_code == 200:
+    with get_session(user_agent).get(archive_url, timeout=request_timeout, stream=True) as response:
+        if response.status_code == 200 and not _has_html_content_type(response):
+            logging.warning(f"Skipping non-HTML content ({response.headers.get('Content-Type')}) from {archive_url}.")
+            # content remains None
+        elif response.status_code == 200:
             # Success - attempt to decode content
             try:
-                # Try decoding with UTF-8 first, then let requests guess
-                response.encoding = 'utf-8' # Assume UTF-8 initially
-                content_text = response.text
-                # Basic validation: Check if content seems non-empty/valid HTML
-                if content_text and "<html" in content_text.lower():
-                    logging.debug(f"Successfully fetched content for: {original_url}")
-                    content = content_text # Assign to content variable
+                raw = response.content
+                # Basic validation on the raw bytes: Check if content seems non-empty/valid HTML.
+                # The search stops at the first match, which sits near the top of a real page.
+                if raw and _HTML_TAG_RE.search(raw):
+                    logging.debug("Successfully fetched content for: %s", original_url)
+                    content = raw.decode('utf-8', errors='replace') # Decode once, as UTF-8
                 else:
                     logging.warning(f"Fetched empty or non-HTML content from {archive_url}. Skipping.")
                     # content remains None
-            except Exception as e:
+            # A connection dropped while reading the body raises on to the decorator, which retries
+            except requests.exceptions.ContentDecodingError as e: # e.g. a corrupt gzip body; retrying won't help
                 logging.error(f"Error decoding content from {archive_url}: {e}")
                 # content remains None
 
@@ -106,9 +162,43 @@ def fetch_page_content(original_url, timestamp, config):
         else: # Other client errors (4xx not in non_retryable_status list)
             logging.error(f"Wayback Machine request failed with unhandled client error {response.status_code}. Skipping. URL: {response.url}")
             # content remains None
-    finally:
-         # Ensure the response is always closed
-         if 'response' in locals() and response:
-              response.close()
 
     return content # Return the processed content or None
+
+
+def fetch_assets_batch(assets, original_page_timestamp, config):
+    """
+    Downloads many assets of one page concurrently using a bounded thread pool.
+    Each asset is streamed to its destination path via fetch_asset; workers share
+    the pooled HTTP session, so the pool size is capped at the session's per-host
+    connection limit.
+
+    Args:
+        assets (dict): Maps asset URLs to the file paths they should be saved to.
+        original_page_timestamp (str): Wayback timestamp of the page referencing the assets.
+        config (dict): Configuration dictionary.
+
+    Returns:
+        dict: Maps each asset URL (in input order) to its saved path, or None if the download failed.
+    """
+    if not assets:
+        return {}
+
+    max_workers = min(config.get('asset_workers', constants.DEFAULT_ASSET_WORKERS), constants.HTTP_POOL_MAXSIZE, len(assets))
+    logging.debug("Downloading %d assets using %d workers...", len(assets), max_workers)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_url = {
+            executor.submit(fetch_asset, asset_url, original_page_timestamp, config=config, dest_path=dest_path): asset_url
+            for asset_url, dest_path in assets.items()
+        }
+        for future in as_completed(future_to_url):
+            asset_url = future_to_url[future]
+            try:
+                results[asset_url] = future.result()
+            except Exception as e: # The decorator normally swallows errors; guard anyway
+                logging.error(f"Unexpected error downloading asset {asset_url}: {e}")
+                results[asset_url] = None
+
+    return {asset_url: results.get(asset_url) for asset_url in assets}
@@ -2,36 +2,46 @@
 import json
 import sys
 import os 
+import soupsieve # CSS selector engine used by BeautifulSoup
+from bs4.builder import builder_registry # Tree builders whose parser library is installed
 import constants # Import constants
+from api_clients import json_codec # orjson when available
+
+# Define required keys (consider adding timeouts as required?)
+# For now, keep timeouts optional via .get() below
+_REQUIRED_KEYS = (
+    "target_domain", "output_dir", "content_selectors", 
+    "request_delay_seconds", "max_retries", "user_agent", 
+    "checkpoint_file", "log_file", "cdx_api_url"
+) # A tuple keeps the order of the "missing keys" message stable
+_VALID_ASSET_SAVE_STRUCTURES = frozenset({'per_page'}) # Add 'central' if implemented later
+_VALID_HTML_PARSERS = (None, 'lxml', 'html.parser', 'html5lib') # BeautifulSoup tree builders
 
 def load_config(config_path="config.json"): # Keep default path simple
     """Loads configuration from a JSON file, validates, and sets defaults."""
     try:
-        with open(config_path, 'r') as f:
-            config = json.load(f)
+        with open(config_path, 'rb') as f:
+            config = json_codec.loads(f.read()) # Parse the raw bytes; no text-mode decode pass
             
         # --- Validation ---
-        # Define required keys (consider adding timeouts as required?)
-        # For now, keep timeouts optional via .get() below
-        required_keys = [
-            "target_domain", "output_dir", "content_selectors", 
-            "request_delay_seconds", "max_retries", "user_agent", 
-            "checkpoint_file", "log_file", "cdx_api_url"
-        ]
-        if not all(key in config for key in required_keys):
-            # Find missing keys for a better error message
-            missing_keys = [key for key in required_keys if key not in config]
+        missing_keys = [key for key in _REQUIRED_KEYS if key not in config] # Single pass; also used for the error message
+        if missing_keys:
             raise ValueError(f"Config file '{config_path}' is missing required keys: {', '.join(missing_keys)}")
 
         # --- Set Defaults for Optional Keys ---
         # Use constants for default values
         config['request_delay_seconds'] = config.get('request_delay_seconds', constants.DEFAULT_REQUEST_DELAY)
         config['max_retries'] = config.get('max_retries', constants.DEFAULT_MAX_RETRIES)
+        config['max_retry_delay_seconds'] = config.get('max_retry_delay_seconds', constants.DEFAULT_MAX_RETRY_DELAY)
+        config['circuit_breaker_threshold'] = config.get('circuit_breaker_threshold', constants.DEFAULT_CIRCUIT_BREAKER_THRESHOLD)
+        config['circuit_breaker_cooldown_seconds'] = config.get('circuit_breaker_cooldown_seconds', constants.DEFAULT_CIRCUIT_BREAKER_COOLDOWN)
+        config['max_requests_per_second'] = config.get('max_requests_per_second', constants.DEFAULT_MAX_REQUESTS_PER_SECOND)
         config['user_agent'] = config.get('user_agent', constants.DEFAULT_USER_AGENT)
         config['checkpoint_file'] = config.get('checkpoint_file', constants.DEFAULT_CHECKPOINT_FILE)
         config['log_file'] = config.get('log_file', constants.DEFAULT_LOG_FILE)
         config['output_dir'] = config.get('output_dir', constants.DEFAULT_OUTPUT_DIR)
         config['cdx_api_url'] = config.get('cdx_api_url', constants.CDX_API_URL)
+        config['cdx_cache_file'] = config.get('cdx_cache_file', constants.DEFAULT_CDX_CACHE_FILE) # None disables the cache
         
         config['request_timeout_api'] = config.get('request_timeout_api', constants.DEFAULT_TIMEOUT_API)
         config['request_timeout_content'] = config.get('request_timeout_content', constants.DEFAULT_TIMEOUT_CONTENT)
@@ -42,6 +52,13 @@ def load_config(config_path="config.json"): # Keep default path simple
         config['save_original_html'] = config.get('save_original_html', False) # Default False based on original? Let's keep True
         config['rewrite_asset_links'] = config.get('rewrite_asset_links', True) 
         config['asset_save_structure'] = config.get('asset_save_structure', 'per_page')
+        config['memento_workers'] = config.get('memento_workers', constants.DEFAULT_MEMENTO_WORKERS)
+        config['page_workers'] = config.get('page_workers', constants.DEFAULT_PAGE_WORKERS)
+        config['parse_workers'] = config.get('parse_workers', constants.DEFAULT_PARSE_WORKERS)
+        config['asset_workers'] = config.get('asset_workers', constants.DEFAULT_ASSET_WORKERS)
+        config['asset_chunk_size'] = config.get('asset_chunk_size', constants.DOWNLOAD_CHUNK_SIZE)
+        config['reuse_downloaded_assets'] = config.get('reuse_downloaded_assets', True)
+        config['html_parser'] = config.get('html_parser') # None picks lxml when installed, else html.parser
 
         # --- Further Validation (Optional but Recommended) ---
         # Example: Validate numeric types/ranges
@@ -49,10 +66,41 @@ def load_config(config_path="config.json"): # Keep default path simple
              raise ValueError("Config 'request_delay_seconds' must be a non-negative number.")
         if not isinstance(config['max_retries'], int) or config['max_retries'] < 0:
              raise ValueError("Config 'max_retries' must be a non-negative integer.")
+        if not isinstance(config['max_retry_delay_seconds'], (int, float)) or config['max_retry_delay_seconds'] < 0:
+             raise ValueError("Config 'max_retry_delay_seconds' must be a non-negative number.")
+        if not isinstance(config['circuit_breaker_threshold'], int) or config['circuit_breaker_threshold'] < 0:
+             raise ValueError("Config 'circuit_breaker_threshold' must be a non-negative integer (0 disables it).")
+        if not isinstance(config['circuit_breaker_cooldown_seconds'], (int, float)) or config['circuit_breaker_cooldown_seconds'] < 0:
+             raise ValueError("Config 'circuit_breaker_cooldown_seconds' must be a non-negative number.")
+        if not isinstance(config['max_requests_per_second'], (int, float)) or config['max_requests_per_second'] < 0:
+             raise ValueError("Config 'max_requests_per_second' must be a non-negative number (0 disables it).")
+        if not isinstance(config['memento_workers'], int) or config['memento_workers'] < 1:
+             raise ValueError("Config 'memento_workers' must be a positive integer.")
+        if not isinstance(config['page_workers'], int) or config['page_workers'] < 1:
+             raise ValueError("Config 'page_workers' must be a positive integer.")
+        if not isinstance(config['parse_workers'], int) or config['parse_workers'] < 0:
+             raise ValueError("Config 'parse_workers' must be a non-negative integer (0 parses in the page workers).")
+        if not isinstance(config['asset_workers'], int) or config['asset_workers'] < 1:
+             raise ValueError("Config 'asset_workers' must be a positive integer.")
+        if not isinstance(config['asset_chunk_size'], int) or config['asset_chunk_size'] < 1:
+             raise ValueError("Config 'asset_chunk_size' must be a positive integer.")
         # Add more type/value validations as needed...
 
+        if config['html_parser'] not in _VALID_HTML_PARSERS:
+             raise ValueError(f"Config 'html_parser' must be one of: {', '.join(p for p in _VALID_HTML_PARSERS if p)} (or null for automatic).")
+        if config['html_parser'] and builder_registry.lookup(config['html_parser']) is None:
+             # Otherwise every page would fail to parse with bs4's FeatureNotFound
+             raise ValueError(f"Config 'html_parser' is '{config['html_parser']}', but that parser is not installed (pip install {config['html_parser']}).")
+        if not isinstance(config['content_selectors'], list) or not all(isinstance(selector, str) for selector in config['content_selectors']):
+             raise ValueError("Config 'content_selectors' must be a list of CSS selector strings.")
+        # Compile the selectors once here instead of resolving them on every page
+        try:
+            config['content_selectors_compiled'] = tuple(soupsieve.compile(selector) for selector in config['content_selectors'])
+        except soupsieve.SelectorSyntaxError as e:
+             raise ValueError(f"Config 'content_selectors' contains an invalid CSS selector: {e}") from e
+
         # Validate asset_save_structure
-        if config['asset_save_structure'] not in ['per_page']: # Add 'central' if implemented later
+        if config['asset_save_structure'] not in _VALID_ASSET_SAVE_STRUCTURES:
             # Use print here as logging might not be configured yet
             print(f"Warning: Invalid asset_save_structure '{config['asset_save_structure']}' in config. Defaulting to 'per_page'.", file=sys.stderr)
             config['asset_save_structure'] = 'per_page'
@@ -8,6 +8,9 @@ MEMENTO_API_BASE_URL = "http://timetravel.mementoweb.org/api/json/"
 # --- File/Directory Names ---
 DEFAULT_OUTPUT_DIR = "output"
 DEFAULT_CHECKPOINT_FILE = "processed_urls.json"
+CHECKPOINT_LOG_SUFFIX = ".log" # Append-only log of URLs processed since the checkpoint file was last written
+CHECKPOINT_FSYNC_EVERY = 100 # fsync the checkpoint log after this many appended URLs
+DEFAULT_CDX_CACHE_FILE = "cdx_cache.json" # Sidecar storing the last CDX response and its ETag/Last-Modified
 DEFAULT_LOG_FILE = "scraping.log"
 INDEX_FILENAME_BASE = "index" # Base name for root path files (.md, .html)
 UNTITLED_FILENAME = "untitled" # Fallback for sanitized filenames
@@ -30,8 +33,26 @@ FILENAME_COLLISION_LIMIT = 100 # Max attempts for finding unique filename with c
 DEFAULT_USER_AGENT = "StromFetcher/1.0 (+https://github.com/your-repo/)" # TODO: Update repo URL
 DEFAULT_REQUEST_DELAY = 1.0 # Default seconds between requests
 DEFAULT_MAX_RETRIES = 3 # Default max retries for requests
+DEFAULT_MAX_RETRY_DELAY = 30 # Default cap (seconds) on the backoff between retries
+DEFAULT_CIRCUIT_BREAKER_THRESHOLD = 10 # Consecutive 429/5xx/timeouts before failing fast (0 disables)
+DEFAULT_CIRCUIT_BREAKER_COOLDOWN = 60 # Seconds to fail fast before probing the service again
 DEFAULT_TIMEOUT_API = 30 # Default timeout for API calls (CDX, Memento lookup)
 DEFAULT_TIMEOUT_CONTENT = 60 # Default timeout for content/asset downloads
+DEFAULT_MAX_REQUESTS_PER_SECOND = 0 # Default per-host request rate limit (0 = unlimited)
+RATE_LIMIT_BURST = 4 # Requests a host may receive back-to-back before the rate limit applies
+
+DOWNLOAD_CHUNK_SIZE = 1 << 16 # Default bytes per chunk when streaming asset downloads to disk (64 KiB: few loop iterations for typical 10 KB-1 MB assets)
+
+# --- HTTP Connection Pooling ---
+HTTP_POOL_CONNECTIONS = 16 # Number of per-host connection pools to cache
+HTTP_POOL_MAXSIZE = 32 # Max keep-alive connections kept per host
+
+# --- Concurrency ---
+DEFAULT_MEMENTO_WORKERS = 8 # Default number of concurrent Memento API lookups
+DEFAULT_ASSET_WORKERS = 8 # Default number of concurrent asset downloads per page
+DEFAULT_PAGE_WORKERS = 4 # Default number of pages processed concurrently
+DEFAULT_PARSE_WORKERS = 0 # Default number of processes for HTML parsing/conversion (0 = parse in the page workers)
+ASSET_REUSE_TIMESTAMP_DIGITS = 8 # Snapshot timestamp prefix (YYYYMMDD) an asset copy may be reused within
 
 # --- CDX Parameters ---
 CDX_FIELDS = "original,timestamp,mimetype"
@@ -2,21 +2,43 @@
 
 import os
 import json
+import hashlib
 import logging
 import re
-from datetime import datetime
+import threading
+from functools import lru_cache
 from urllib.parse import urlparse, unquote
 import constants # Import constants
+from api_clients import json_codec # orjson when available
 
 
 # --- Checkpointing ---
+_checkpoint_lock = threading.Lock()
+_checkpoint_unsynced = 0 # URLs appended to the checkpoint log since the last fsync
+_checkpoint_log = None # Append handle kept open between saves (guarded by _checkpoint_lock)
+
+def _read_checkpoint_log(log_file):
+    """Reads the URLs appended to the checkpoint log (one JSON string per line)."""
+    urls = set()
+    if not os.path.exists(log_file):
+        return urls
+    with open(log_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                url = json.loads(line)
+            except json.JSONDecodeError:
+                continue # E.g. a last line truncated by an interrupted run
+            if isinstance(url, str):
+                urls.add(url)
+    return urls
+
 def load_checkpoint(checkpoint_file):
-    """Loads the set of processed URLs from the checkpoint file."""
+    """Loads the set of processed URLs from the checkpoint file and its append log."""
     processed_urls = set()
     try:
         if os.path.exists(checkpoint_file):
-            with open(checkpoint_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            with open(checkpoint_file, 'rb') as f:
+                data = json_codec.loads(f.read())
                 if isinstance(data, list):
                     processed_urls = set(data)
                     logging.info(f"Loaded {len(processed_urls)} processed URLs from checkpoint file: {checkpoint_file}")
@@ -26,24 +48,93 @@ def load_checkpoint(checkpoint_file):
         logging.warning(f"Could not decode JSON from checkpoint file {checkpoint_file}. Starting fresh.")
     except Exception as e:
         logging.error(f"Error loading checkpoint file {checkpoint_file}: {e}. Starting fresh.")
+
+    log_file = checkpoint_file + constants.CHECKPOINT_LOG_SUFFIX
+    try:
+        logged_urls = _read_checkpoint_log(log_file)
+        if logged_urls:
+            processed_urls |= logged_urls
+            logging.info(f"Loaded {len(logged_urls)} processed URLs from checkpoint log: {log_file}")
+    except Exception as e:
+        logging.error(f"Error loading checkpoint log {log_file}: {e}")
     return processed_urls
 
+def _close_checkpoint_log():
+    """Closes the open checkpoint log handle, if any. Caller holds _checkpoint_lock."""
+    global _checkpoint_log
+    if _checkpoint_log is not None:
+        try:
+            _checkpoint_log.close()
+        finally:
+            _checkpoint_log = None
+
 def save_checkpoint(original_url, processed_urls_set, checkpoint_file):
-    """Adds a URL to the processed set and saves the updated set to the checkpoint file."""
+    """
+    Adds a URL to the processed set and appends it to the checkpoint log.
+    Only the new URL is written (instead of the whole set), so saving stays O(1)
+    per URL; the log is fsynced every CHECKPOINT_FSYNC_EVERY entries.
+    The log is opened on the first save and kept open until compact_checkpoint.
+    """
+    global _checkpoint_unsynced, _checkpoint_log
     processed_urls_set.add(original_url)
+    log_file = checkpoint_file + constants.CHECKPOINT_LOG_SUFFIX
+    try:
+        with _checkpoint_lock: # Callers may run in worker threads
+            if _checkpoint_log is None or _checkpoint_log.name != log_file:
+                _close_checkpoint_log()
+                _checkpoint_log = open(log_file, 'a', encoding='utf-8')
+            f = _checkpoint_log
+            try:
+                f.write(json.dumps(original_url) + '\n')
+                f.flush() # Hand the line to the OS so a crash of this process cannot lose it
+                _checkpoint_unsynced += 1
+                if _checkpoint_unsynced >= constants.CHECKPOINT_FSYNC_EVERY:
+                    os.fsync(f.fileno())
+                    _checkpoint_unsynced = 0
+            except Exception:
+                _close_checkpoint_log() # Reopen on the next save
+                raise
+    except Exception as e:
+        logging.error(f"Error saving checkpoint file {log_file}: {e}")
+
+def compact_checkpoint(processed_urls_set, checkpoint_file):
+    """
+    Folds the checkpoint log back into the checkpoint file: the whole set is written
+    once (to a temp file that then replaces the checkpoint), after which the log is
+    removed. Does nothing if there is no log. Returns False on failure.
+    """
+    global _checkpoint_unsynced
+    log_file = checkpoint_file + constants.CHECKPOINT_LOG_SUFFIX
     try:
-        # Write the entire set back on each update.
-        with open(checkpoint_file, 'w', encoding='utf-8') as f:
-            json.dump(list(processed_urls_set), f, indent=2) # Save as a list
+        with _checkpoint_lock:
+            _close_checkpoint_log()
+            if not os.path.exists(log_file):
+                return True
+            tmp_file = f"{checkpoint_file}.tmp"
+            with open(tmp_file, 'wb') as f:
+                f.write(json_codec.dumps(list(processed_urls_set))) # Save as a compact list; no pretty-printing
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, checkpoint_file)
+            # A crash before this point only leaves URLs listed twice; load_checkpoint unions them
+            os.remove(log_file)
+            _checkpoint_unsynced = 0
+        logging.info(f"Compacted checkpoint log into {checkpoint_file} ({len(processed_urls_set)} URLs).")
+        return True
     except Exception as e:
-        logging.error(f"Error saving checkpoint file {checkpoint_file}: {e}")
+        logging.error(f"Error compacting checkpoint file {checkpoint_file}: {e}")
+        return False
 
 
 # --- File Saving ---
+_INVALID_FILENAME_CHARS_RE = re.compile(r'[\\/*?:\'"<>|]') # Keep single quote removal
+_COLLISION_COUNTER_RE = re.compile(r'-\d+$')
+
+@lru_cache(maxsize=4096) # Directory segments like 'blog' or 'en' recur on every page of a section
 def sanitize_filename(name):
     """Sanitizes a string to be used as a valid filename."""
     # Remove invalid characters
-    name = re.sub(r'[\\/*?:\'"<>|]', '', name) # Keep single quote removal
+    name = _INVALID_FILENAME_CHARS_RE.sub('', name)
     # Remove leading/trailing whitespace/periods FIRST
     name = name.strip(' .')
     # Replace remaining spaces with underscores
@@ -59,6 +150,20 @@ def sanitize_filename(name):
 
 
 # --- Internal Utilities ---
+@lru_cache(maxsize=4096) # Every save of a page (HTML, Markdown, its directory) needs these
+def _url_path_parts(original_url):
+    """Returns the non-empty, unquoted path segments of a URL as a tuple."""
+    return tuple(part for part in unquote(urlparse(original_url).path).strip('/').split('/') if part)
+
+_created_dirs = set() # Directories known to exist, so repeated saves skip the makedirs syscalls
+_page_dirs = {} # (original_url, output_dir) -> page directory, since every save of a page asks for it
+
+def _ensure_dir(path):
+    """os.makedirs(path, exist_ok=True), skipped for directories this process already created."""
+    if path not in _created_dirs:
+        os.makedirs(path, exist_ok=True)
+        _created_dirs.add(path)
+
 def _ensure_page_directory(original_url, output_dir):
     """
     Creates the necessary directory structure based on the original URL's path
@@ -66,15 +171,16 @@ def _ensure_page_directory(original_url, output_dir):
     Handles sanitization of path components.
     Returns the path to the page's parent directory or None on error.
     """
+    page_dir = _page_dirs.get((original_url, output_dir))
+    if page_dir:
+        return page_dir
     try:
-        parsed_url = urlparse(original_url)
-        full_path = unquote(parsed_url.path).strip('/')
-        path_segments = full_path.split('/') if full_path else []
+        path_segments = _url_path_parts(original_url)
 
         # Determine which parts represent directories to create
         # If the original URL ends with '/' or the path is empty/root, all segments are directories
         # Otherwise, the last segment is assumed to be the page/file name, so we exclude it
-        if original_url.endswith('/') or not full_path:
+        if original_url.endswith('/') or not path_segments:
             dir_parts = path_segments
         else:
             dir_parts = path_segments[:-1] # Exclude the last part
@@ -84,15 +190,12 @@ def _ensure_page_directory(original_url, output_dir):
         # Filter out any parts that became empty after sanitization
         dir_parts = [part for part in dir_parts if part]
 
-        current_path = output_dir
-        os.makedirs(current_path, exist_ok=True) # Ensure base output dir exists
-
-        # Create directories for the parts determined to be directories
-        for safe_part in dir_parts:
-            current_path = os.path.join(current_path, safe_part)
-            os.makedirs(current_path, exist_ok=True)
+        # A single makedirs creates the base output dir and every missing parent
+        current_path = os.path.join(output_dir, *dir_parts)
+        _ensure_dir(current_path)
 
         # Return the path to the directory where the page/asset itself would be saved
+        _page_dirs[(original_url, output_dir)] = current_path
         return current_path
     except OSError as e:
         logging.error(f"Error creating directory structure for {original_url} in {output_dir}: {e}")
@@ -102,6 +205,43 @@ def _ensure_page_directory(original_url, output_dir):
         return None
 
 
+def _open_unique(save_dir, base_filename, ext, **open_kwargs):
+    """
+    Creates and opens (for writing) the first free name among base_filename + ext,
+    base_filename-1 + ext, ... in save_dir. Mode 'x' fails if the file exists, so the
+    existence check and the creation are one atomic step (no stat per candidate, and no
+    race between concurrent workers picking the same name).
+    Returns (file, path); file is None if FILENAME_COLLISION_LIMIT names are all taken.
+    """
+    full_path = os.path.join(save_dir, f"{base_filename}{ext}")
+    for counter in range(1, constants.FILENAME_COLLISION_LIMIT + 1):
+        try:
+            return open(full_path, 'x', **open_kwargs), full_path
+        except FileExistsError:
+            full_path = os.path.join(save_dir, f"{base_filename}-{counter}{ext}")
+    return None, full_path
+
+
+def _format_archive_timestamp(timestamp):
+    """
+    Formats a 14-digit archive timestamp (YYYYMMDDhhmmss) as 'YYYY-MM-DD hh:mm:ss'.
+    Plain slicing is an order of magnitude cheaper than datetime.strptime/strftime.
+    Raises ValueError for anything that is not 14 digits.
+    """
+    if not (isinstance(timestamp, str) and len(timestamp) == 14 and timestamp.isdigit()):
+        raise ValueError(f"Invalid archive timestamp: {timestamp!r}")
+    return f"{timestamp[0:4]}-{timestamp[4:6]}-{timestamp[6:8]} {timestamp[8:10]}:{timestamp[10:12]}:{timestamp[12:14]}"
+
+
+def get_page_save_dir(original_url, config):
+    """
+    Returns (creating it if needed) the directory a page's files and assets are saved in,
+    or None on error. Compute it once per page and pass it to get_asset_save_path /
+    extract_and_convert_content instead of re-deriving it for every asset.
+    """
+    return _ensure_page_directory(original_url, config.get('output_dir', constants.DEFAULT_OUTPUT_DIR))
+
+
 def save_markdown(title, markdown_content, original_url, timestamp, config):
     """Saves the markdown content to the appropriate file path."""
     if not title or not markdown_content:
@@ -109,8 +249,7 @@ def save_markdown(title, markdown_content, original_url, timestamp, config):
         return False
 
     output_dir = config.get('output_dir', constants.DEFAULT_OUTPUT_DIR)
-    parsed_url = urlparse(original_url)
-    path_parts = [part for part in unquote(parsed_url.path).strip('/').split('/') if part]
+    path_parts = _url_path_parts(original_url)
 
     page_save_dir = _ensure_page_directory(original_url, output_dir)
     if not page_save_dir:
@@ -122,27 +261,26 @@ def save_markdown(title, markdown_content, original_url, timestamp, config):
     else:
          base_filename = sanitize_filename(title)
 
-    filename = f"{base_filename}.md"
-    full_path = os.path.join(page_save_dir, filename)
-
-    # Handle filename collisions
-    counter = 1
+    full_path = os.path.join(page_save_dir, f"{base_filename}.md")
     original_full_path = full_path
-    while os.path.exists(full_path):
-        filename = f"{base_filename}-{counter}.md"
-        full_path = os.path.join(page_save_dir, filename)
-        counter += 1
-        if counter > constants.FILENAME_COLLISION_LIMIT: # Use constant
-             logging.error(f"Could not find unique filename for {original_url} after {constants.FILENAME_COLLISION_LIMIT} attempts. Base path: {original_full_path}")
-             return False
 
     # Write the file
     try:
-        with open(full_path, 'w', encoding='utf-8') as f:
-            f.write(f"# {title}\\n\\n")
-            f.write(f"_Source URL: {original_url}_\\n")
-            f.write(f"_Archived Timestamp: {datetime.strptime(timestamp, '%Y%m%d%H%M%S').strftime('%Y-%m-%d %H:%M:%S')}_\\n\\n")
-            f.write(markdown_content)
+        archived_at = _format_archive_timestamp(timestamp)
+        # Assemble the whole document first so it goes through the encoder in a single write
+        document = (
+            f"# {title}\n\n"
+            f"_Source URL: {original_url}_\n"
+            f"_Archived Timestamp: {archived_at}_\n\n"
+            f"{markdown_content}"
+        )
+        # Handle filename collisions while creating the file
+        f, full_path = _open_unique(page_save_dir, base_filename, ".md", encoding='utf-8')
+        if f is None:
+             logging.error(f"Could not find unique filename for {original_url} after {constants.FILENAME_COLLISION_LIMIT} attempts. Base path: {original_full_path}")
+             return False
+        with f:
+            f.write(document)
         logging.info(f"Successfully saved: {full_path}")
         return True
     except OSError as e:
@@ -160,8 +298,7 @@ def save_html(html_content, title, original_url, config):
         return False
 
     output_dir = config.get('output_dir', constants.DEFAULT_OUTPUT_DIR)
-    parsed_url = urlparse(original_url)
-    path_parts = [part for part in unquote(parsed_url.path).strip('/').split('/') if part]
+    path_parts = _url_path_parts(original_url)
 
     page_save_dir = _ensure_page_directory(original_url, output_dir)
     if not page_save_dir:
@@ -173,23 +310,17 @@ def save_html(html_content, title, original_url, config):
     else:
         base_filename = sanitize_filename(title)
 
-    filename = f"{base_filename}.html"
-    full_path = os.path.join(page_save_dir, filename)
-
-    # Handle filename collisions
-    counter = 1
+    full_path = os.path.join(page_save_dir, f"{base_filename}.html")
     original_full_path = full_path
-    while os.path.exists(full_path):
-        filename = f"{base_filename}-{counter}.html"
-        full_path = os.path.join(page_save_dir, filename)
-        counter += 1
-        if counter > constants.FILENAME_COLLISION_LIMIT: # Use constant
-            logging.error(f"Could not find unique HTML filename for {original_url} after {constants.FILENAME_COLLISION_LIMIT} attempts. Base path: {original_full_path}")
-            return False
 
     # Write the HTML file (text mode)
     try:
-        with open(full_path, 'w', encoding='utf-8') as f:
+        # Handle filename collisions while creating the file
+        f, full_path = _open_unique(page_save_dir, base_filename, ".html", encoding='utf-8')
+        if f is None:
+            logging.error(f"Could not find unique HTML filename for {original_url} after {constants.FILENAME_COLLISION_LIMIT} attempts. Base path: {original_full_path}")
+            return False
+        with f:
             f.write(html_content)
         logging.info(f"Successfully saved original HTML: {full_path}")
         return True
@@ -202,15 +333,17 @@ def save_html(html_content, title, original_url, config):
 
 
 # --- Asset Saving ---
-def save_asset(asset_content, asset_url, original_page_url, config, asset_type):
-    """Saves the downloaded asset content to the appropriate file path."""
-    if not asset_content:
-        logging.warning(f"Skipping save for asset {asset_url} due to empty content.")
-        return None
-
-    output_dir = config.get('output_dir', constants.DEFAULT_OUTPUT_DIR)
-
-    page_save_dir = _ensure_page_directory(original_page_url, output_dir)
+def get_asset_save_path(asset_url, original_page_url, config, asset_type, reserved_paths=None, page_save_dir=None):
+    """
+    Determines (and creates the directory for) the file path an asset should be saved to,
+    resolving filename collisions. Returns the path, or None on failure.
+    `reserved_paths` is an optional set of paths already handed out but not yet
+    written (e.g. by concurrent downloads); they count as taken, and the chosen
+    path is added to it.
+    `page_save_dir` is the page's directory from get_page_save_dir, if already known.
+    """
+    if not page_save_dir:
+        page_save_dir = get_page_save_dir(original_page_url, config)
     if not page_save_dir:
         return None
 
@@ -229,7 +362,7 @@ def save_asset(asset_content, asset_url, original_page_url, config, asset_type):
     try:
         # _ensure_page_directory already created page_save_dir
         asset_save_dir = os.path.join(page_save_dir, constants.ASSETS_DIR_NAME, asset_type_dir)
-        os.makedirs(asset_save_dir, exist_ok=True)
+        _ensure_dir(asset_save_dir)
     except OSError as e:
         logging.error(f"Error creating asset directory structure for {asset_url} in {page_save_dir}: {e}")
         return None
@@ -238,7 +371,9 @@ def save_asset(asset_content, asset_url, original_page_url, config, asset_type):
     parsed_asset_url = urlparse(asset_url)
     asset_filename_raw = os.path.basename(unquote(parsed_asset_url.path))
     if not asset_filename_raw:
-        asset_filename_raw = f"{constants.ASSET_FALLBACK_FILENAME_BASE}_{hash(asset_url)}.bin" # Use constant
+        # A stable digest (unlike hash(), which is salted per process) gives the same name on every run
+        url_digest = hashlib.blake2b(asset_url.encode('utf-8'), digest_size=8).hexdigest()
+        asset_filename_raw = f"{constants.ASSET_FALLBACK_FILENAME_BASE}_{url_digest}.bin" # Use constant
         logging.warning(f"Could not derive filename from asset URL path: {asset_url}. Using fallback: {asset_filename_raw}")
 
     base_filename, ext = os.path.splitext(asset_filename_raw)
@@ -252,9 +387,9 @@ def save_asset(asset_content, asset_url, original_page_url, config, asset_type):
     # Handle filename collisions
     counter = 1
     original_full_path = full_path
-    while os.path.exists(full_path):
-        base, ext = os.path.splitext(filename)
-        base = re.sub(r'-\d+$', '', base) # Remove previous counter
+    base, ext = os.path.splitext(filename)
+    base = _COLLISION_COUNTER_RE.sub('', base) # Remove previous counter
+    while os.path.exists(full_path) or (reserved_paths is not None and full_path in reserved_paths):
         new_filename = f"{base}-{counter}{ext}"
         full_path = os.path.join(asset_save_dir, new_filename)
         counter += 1
@@ -262,15 +397,30 @@ def save_asset(asset_content, asset_url, original_page_url, config, asset_type):
             logging.error(f"Could not find unique filename for asset {asset_url} after {constants.FILENAME_COLLISION_LIMIT} attempts. Base path: {original_full_path}")
             return None
 
-    # Write the asset file (binary mode)
+    if reserved_paths is not None:
+        reserved_paths.add(full_path)
+    return full_path
+
+def link_saved_asset(existing_path, asset_url, original_page_url, config, asset_type, reserved_paths=None, page_save_dir=None):
+    """
+    Makes an asset already saved for another page available in this page's asset directory
+    through a hard link (no download, no copy). Returns the linked path, or `existing_path`
+    when the asset already sits in this page's directory or linking is not possible
+    (e.g. a filesystem without hard links), so the caller can point at that copy instead.
+    """
+    if not page_save_dir:
+        page_save_dir = get_page_save_dir(original_page_url, config)
+    # Asset paths are <page_save_dir>/<ASSETS_DIR_NAME>/<type dir>/<file>
+    if not page_save_dir or os.path.dirname(os.path.dirname(os.path.dirname(existing_path))) == page_save_dir:
+        return existing_path
+
+    full_path = get_asset_save_path(asset_url, original_page_url, config, asset_type, reserved_paths=reserved_paths, page_save_dir=page_save_dir)
+    if not full_path:
+        return existing_path
     try:
-        with open(full_path, 'wb') as f:
-            f.write(asset_content)
-        logging.info(f"Successfully saved asset: {full_path}")
-        return full_path # Return the absolute path of the saved file
+        os.link(existing_path, full_path)
     except OSError as e:
-        logging.error(f"Error writing asset file {full_path}: {e}")
-        return None
-    except Exception as e:
-        logging.error(f"Unexpected error saving asset file {full_path}: {e}")
-        return None
+        logging.debug("Could not hard link %s to %s (%s); linking to the existing copy.", existing_path, full_path, e)
+        return existing_path
+    logging.debug("Linked already downloaded asset %s to %s", asset_url, full_path)
+    return full_path
@@ -3,62 +3,104 @@
 import logging
 import os
 import re
+from functools import lru_cache
 
 # Set up a specific logger for this module
 logger = logging.getLogger(__name__) # Corrected: use logging.getLogger
-from urllib.parse import urljoin, urlparse, unquote
+from urllib.parse import urljoin, urlparse, urlsplit, unquote
 
 import html2text
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import constants # Import constants
 
 # Import the authoritative version from file_handler
 # Also import the directory utility function
 from file_handler import sanitize_filename, _ensure_page_directory 
 
+try:
+    import lxml # noqa: F401 - only needed as BeautifulSoup's C-backed parser
+    DEFAULT_HTML_PARSER = 'lxml'
+except ImportError: # lxml is optional; fall back to the pure-Python parser
+    DEFAULT_HTML_PARSER = 'html.parser'
+
+
+def _make_soup(html_content, parser=None, parse_only=None):
+    """
+    Parses HTML given as str or raw bytes. Bytes are decoded once, inside the parser
+    (as UTF-8, which the fetchers assume), so callers need not keep a decoded copy.
+    `parser` is a BeautifulSoup tree builder name; defaults to lxml when it is installed.
+    `parse_only` is an optional SoupStrainer limiting which tags are built.
+    """
+    parser = parser or DEFAULT_HTML_PARSER
+    if parser == 'html5lib': # html5lib always builds the full tree and warns about parse_only
+        parse_only = None
+    if isinstance(html_content, bytes):
+        return BeautifulSoup(html_content, parser, from_encoding='utf-8', parse_only=parse_only)
+    return BeautifulSoup(html_content, parser, parse_only=parse_only)
+
+
+def parse_html(html_content, config):
+    """
+    Parses a page with the configured parser. The result can be passed to find_assets
+    and then extract_and_convert_content in place of the HTML, so the page is parsed once.
+    """
+    return _make_soup(html_content, config.get('html_parser'))
+
+
+@lru_cache(maxsize=4096) # find_assets and _rewrite_asset_links resolve the same src values per page
+def _join_url(base_url, src):
+    """Resolves an asset src/href against the page URL."""
+    return urljoin(base_url, src)
+
 
 # --- Asset Discovery ---
+_ASSET_TAGS = ['script', 'link', 'img']
+_ABSOLUTE_URL_PREFIXES = ('http://', 'https://', '//')
+# Only asset-carrying tags are built when parsing for asset discovery
+_ASSET_STRAINER = SoupStrainer(_ASSET_TAGS)
+
 def find_assets(html_content, original_page_url, config):
-    """Finds JS, CSS, and Image assets within HTML content from the target domain."""
+    """
+    Finds JS, CSS, and Image assets within HTML content from the target domain.
+    `html_content` may also be a tree from parse_html, which is then searched as is.
+    """
     found_assets = {'js': set(), 'css': set(), 'img': set()}
     target_domain = config.get('target_domain', urlparse(original_page_url).netloc) # Get domain from config or URL
 
     if not html_content:
         return {k: list(v) for k, v in found_assets.items()} # Return empty lists
 
+    # Absolute URLs on other hosts can be rejected with a prefix check, before urljoin/urlparse.
+    # Anything passing it (or relative) still gets the exact netloc comparison below.
+    target_prefixes = tuple(prefix + target_domain for prefix in _ABSOLUTE_URL_PREFIXES)
+
     try:
-        soup = BeautifulSoup(html_content, 'html.parser')
-
-        # Find JS files
-        for script_tag in soup.find_all('script', src=True):
-            src = script_tag['src']
-            if src:
-                abs_url = urljoin(original_page_url, src)
-                parsed_url = urlparse(abs_url)
-                # Ensure asset is from the target domain
-                if parsed_url.netloc == target_domain:
-                    found_assets['js'].add(abs_url)
-
-        # Find CSS files
-        for link_tag in soup.find_all('link', rel='stylesheet', href=True):
-            href = link_tag['href']
-            if href:
-                abs_url = urljoin(original_page_url, href)
-                parsed_url = urlparse(abs_url)
-                # Ensure asset is from the target domain
-                if parsed_url.netloc == target_domain:
-                    found_assets['css'].add(abs_url)
-
-        # Find Image files
-        for img_tag in soup.find_all('img', src=True):
-            src = img_tag['src']
-            # Basic check to ignore inline data URIs
-            if src and not src.startswith('data:'):
-                abs_url = urljoin(original_page_url, src)
-                parsed_url = urlparse(abs_url)
-                # Ensure asset is from the target domain
-                if parsed_url.netloc == target_domain:
-                    found_assets['img'].add(abs_url)
+        if not isinstance(html_content, (str, bytes)):
+            soup = html_content # Already parsed by the caller (parse_html)
+        else:
+            soup = _make_soup(html_content, config.get('html_parser'), parse_only=_ASSET_STRAINER)
+
+        # One traversal for JS, CSS and Image files
+        for tag in soup.find_all(_ASSET_TAGS):
+            if tag.name == 'script':
+                asset_type, src = 'js', tag.get('src')
+            elif tag.name == 'link':
+                if 'stylesheet' not in tag.get('rel', ()):
+                    continue
+                asset_type, src = 'css', tag.get('href')
+            else:
+                asset_type, src = 'img', tag.get('src')
+                # Basic check to ignore inline data URIs
+                if src and src.startswith('data:'):
+                    continue
+            if not src:
+                continue
+            if src.startswith(_ABSOLUTE_URL_PREFIXES) and not src.startswith(target_prefixes):
+                continue # Absolute URL on another host
+            abs_url = _join_url(original_page_url, src)
+            # Ensure asset is from the target domain (urlsplit: same netloc, without urlparse's params pass)
+            if urlsplit(abs_url).netloc == target_domain:
+                found_assets[asset_type].add(abs_url)
         
         # TODO: Consider adding srcset handling for images if needed
 
@@ -100,39 +142,47 @@ def _extract_title(soup, original_url):
     return title
 
 def _find_main_content_soup(soup, selectors, original_url):
-    """Finds the main content area using selectors and returns its soup object."""
+    """
+    Finds the main content area using selectors and returns its soup object.
+    Selectors may be CSS strings or soupsieve patterns precompiled by load_config.
+    """
     content_area_soup = None
     for selector in selectors:
-        content_area = soup.select_one(selector)
+        if isinstance(selector, str):
+            content_area = soup.select_one(selector)
+        else: # Precompiled pattern
+            content_area = selector.select_one(soup)
         if content_area:
             # Optional: Remove known unwanted elements within the content area
             # Example: 
             # for unwanted in content_area.select('nav, footer, .ads'):
             #     unwanted.decompose()
             content_area_soup = content_area # Store the soup object
-            logger.debug(f"Found content using selector '{selector}' for {original_url}")
+            logger.debug(f"Found content using selector '{getattr(selector, 'pattern', selector)}' for {original_url}")
             break # Stop after finding the first matching selector
     
     if not content_area_soup:
-         logger.warning(f"Could not find main content using selectors {selectors} for {original_url}. Skipping content extraction.")
+         selector_texts = [getattr(selector, 'pattern', selector) for selector in selectors]
+         logger.warning(f"Could not find main content using selectors {selector_texts} for {original_url}. Skipping content extraction.")
          
     return content_area_soup
 
 def _rewrite_asset_links(content_soup, original_url, page_save_dir, saved_assets_map):
     """
-    Rewrites asset links within a *copy* of the content soup to point to local paths.
+    Rewrites asset links within the content soup, in place, to point to local paths.
     Requires the target page save directory to calculate relative paths.
+    Returns the same (edited) soup.
     """
     # Check if rewriting is enabled and if there are assets/directory info
     if not page_save_dir or not saved_assets_map: 
         return content_soup 
 
     logger.debug(f"Rewriting asset links for {original_url} relative to {page_save_dir}...")
-    # Modify the content_soup directly, no need for copy if caller handles it
-    # content_copy_soup = BeautifulSoup(str(content_soup), 'html.parser') # REMOVE THIS
+    # Modify the content_soup directly; it is serialized right after, so no copy or reparse is needed
 
-    tags_to_rewrite = content_soup.find_all(['script', 'link', 'img']) # Find tags within the original content soup
+    tags_to_rewrite = content_soup.find_all(['script', 'link', 'img'])
     rewrite_count = 0
+    relative_paths = {} # abs_asset_url -> POSIX relative path (None if it can't be made relative), one relpath per asset
     for tag in tags_to_rewrite:
         attr = None
         if tag.name == 'script' and tag.has_attr('src'):
@@ -146,30 +196,30 @@ def _rewrite_asset_links(content_soup, original_url, page_save_dir, saved_assets
         if attr and tag.get(attr): # Use .get() for safety
             original_asset_src = tag[attr]
             # Resolve original src/href relative to the page URL to get absolute
-            abs_asset_url = urljoin(original_url, original_asset_src)
+            abs_asset_url = _join_url(original_url, original_asset_src)
 
             # Check if this absolute URL was successfully downloaded
             if abs_asset_url in saved_assets_map:
-                local_asset_path_abs = saved_assets_map[abs_asset_url]
-                try:
-                    # Calculate relative path from the MD file's dir to the asset file
-                    relative_path = os.path.relpath(local_asset_path_abs, start=page_save_dir)
-                    # Ensure POSIX-style separators for web/markdown compatibility
-                    relative_path = relative_path.replace(os.sep, '/')
-                    # Revert to direct assignment
+                if abs_asset_url not in relative_paths:
+                    local_asset_path_abs = saved_assets_map[abs_asset_url]
+                    try:
+                        # Calculate relative path from the MD file's dir to the asset file
+                        relative_path = os.path.relpath(local_asset_path_abs, start=page_save_dir)
+                        # Ensure POSIX-style separators for web/markdown compatibility
+                        relative_paths[abs_asset_url] = relative_path.replace(os.sep, '/')
+                    except ValueError as e:
+                         relative_paths[abs_asset_url] = None
+                         logger.warning(f"Could not calculate relative path for {abs_asset_url} from {page_save_dir} to {local_asset_path_abs}: {e}")
+                relative_path = relative_paths[abs_asset_url]
+                if relative_path is not None:
+                    # Point the tag at the local copy
                     tag[attr] = relative_path
                     rewrite_count += 1
                     logger.debug(f"Rewrote {original_asset_src} -> {relative_path}")
-                except ValueError as e:
-                     logger.warning(f"Could not calculate relative path for {abs_asset_url} from {page_save_dir} to {local_asset_path_abs}: {e}")
             # else: Asset not found in map, leave original link
 
-    # The function now modifies content_soup in place.
-    # The return value isn't strictly necessary if modified in place,
-    # but returning it is fine too. Let's keep returning it for clarity.
     if rewrite_count > 0:
          logger.info(f"Rewrote {rewrite_count} asset links in content for {original_url}")
-    # Always return the (potentially modified) original content_soup
     return content_soup
 
 def _convert_html_to_markdown(html_string):
@@ -195,10 +245,12 @@ def _convert_html_to_markdown(html_string):
 
 
 # --- Main Content Extraction and Conversion ---
-def extract_and_convert_content(html_content, original_url, config, saved_assets_map):
+def extract_and_convert_content(html_content, original_url, config, saved_assets_map, page_save_dir=None):
     """
     Extracts title, main content, optionally rewrites asset links, 
     and converts the main content to Markdown.
+    `page_save_dir` is the page's directory, if the caller already determined it.
+    `html_content` may also be a tree from parse_html; link rewriting edits it in place.
     
     Returns:
         tuple: (title, markdown_content) or (None, None) on error.
@@ -207,24 +259,29 @@ def extract_and_convert_content(html_content, original_url, config, saved_assets
         return None, None
 
     try:
-        soup = BeautifulSoup(html_content, 'html.parser')
+        if not isinstance(html_content, (str, bytes)):
+            soup = html_content # Already parsed by the caller (parse_html)
+        else:
+            soup = _make_soup(html_content, config.get('html_parser'))
 
         # 1. Extract Title
         title = _extract_title(soup, original_url)
         
         # 2. Extract Main Content Soup
-        content_area_soup = _find_main_content_soup(soup, config.get('content_selectors', []), original_url)
+        selectors = config.get('content_selectors_compiled') or config.get('content_selectors', [])
+        content_area_soup = _find_main_content_soup(soup, selectors, original_url)
         
         if not content_area_soup:
             # Title might still be valid even if content isn't found
             return title, None 
 
-        # 3. Optionally Rewrite Links (operates on a copy if changes are made)
+        # 3. Optionally Rewrite Links (edits the content subtree in place)
         processed_content_soup = content_area_soup # Default to original soup
         if config.get('rewrite_asset_links', True) and saved_assets_map:
-             # Determine the target save directory first
-             output_dir = config.get('output_dir', constants.DEFAULT_OUTPUT_DIR)
-             page_save_dir = _ensure_page_directory(original_url, output_dir)
+             # Determine the target save directory first (unless the caller passed it in)
+             if not page_save_dir:
+                 output_dir = config.get('output_dir', constants.DEFAULT_OUTPUT_DIR)
+                 page_save_dir = _ensure_page_directory(original_url, output_dir)
              if page_save_dir:
                  processed_content_soup = _rewrite_asset_links(content_area_soup, original_url, page_save_dir, saved_assets_map)
              else:
@@ -1,22 +1,184 @@
 # Main script to orchestrate the archive fetching process
 import sys
+import atexit
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 # Removed unused: os, unquote, BeautifulSoup, sanitize_filename
 from urllib.parse import urlparse # Still needed for prelim title fallback in html_processor
 
 # Import functions from refactored modules
+import constants
 from config_loader import load_config
 from logger_setup import setup_logging
+from api_clients.http_session import configure_rate_limit
 from api_clients.cdx_client import fetch_cdx_index, process_cdx_data
-from api_clients.wayback_client import fetch_page_content, fetch_asset
-from api_clients.memento_client import fetch_memento_snapshot, fetch_and_process_memento_content
-from html_processor import find_assets, extract_and_convert_content
+from api_clients.wayback_client import fetch_page_content, fetch_assets_batch
+from api_clients.memento_client import fetch_mementos_batch, fetch_and_process_memento_content
+from html_processor import parse_html, find_assets, extract_and_convert_content
 from file_handler import (
-    load_checkpoint, save_checkpoint, save_html, 
-    save_markdown, save_asset 
+    load_checkpoint, save_checkpoint, compact_checkpoint, save_html, 
+    save_markdown, get_asset_save_path, get_page_save_dir, link_saved_asset 
     # sanitize_filename is used internally by file_handler and html_processor
 )
 
+# Outcomes of process_page
+PAGE_SAVED = 'saved'
+PAGE_FAILED = 'failed'
+PAGE_NOT_FETCHED = 'not_fetched' # Wayback did not serve the page; try the Memento fallback
+
+# Pages are processed concurrently; asset paths are picked before their files are written,
+# so the choice is serialized (page and HTML files are created atomically by file_handler)
+_asset_paths_lock = threading.Lock()
+_reserved_asset_paths = set() # Asset paths handed out this run, possibly not written yet
+_pending_assets = {} # Reuse key of an asset being downloaded -> Event set once the download has finished
+
+def process_page(original_url, timestamp, position, total_urls, config, processed_urls, downloaded_assets, parse_executor=None):
+    """
+    Fetches one page from the Wayback Machine, downloads its assets and saves it as Markdown
+    (and optionally HTML). Safe to run in worker threads.
+    If `parse_executor` (a ProcessPoolExecutor) is given, the CPU-bound parsing and
+    Markdown conversion run there instead of in the calling thread.
+    Returns PAGE_SAVED, PAGE_FAILED or PAGE_NOT_FETCHED.
+    """
+    logging.info(f"Processing URL {position}/{total_urls} ({position / total_urls * 100:.1f}%): {original_url} @ {timestamp}")
+
+    # Fetch content from Wayback Machine
+    html_content = fetch_page_content(original_url, timestamp, config=config)
+    
+    if not html_content:
+        logging.warning(f"Failed to fetch content for {original_url} from Wayback Machine. Queued for Memento fallback.")
+        return PAGE_NOT_FETCHED
+
+    # --- Start Asset/HTML Processing (Only for Wayback Machine content) ---
+    
+    # Initialize map for saved assets for this page
+    saved_assets_map = {} 
+    page_save_dir = None # Derived once below if assets are processed
+
+    # Parse the page once for both asset discovery and extraction. When extraction runs
+    # in parse_executor the tree can't follow it there, so each side parses for itself.
+    page = html_content if parse_executor is not None else parse_html(html_content, config)
+
+    # 2. Asset Discovery (Run before extraction to know what might be downloadable)
+    assets_to_download = find_assets(page, original_url, config)
+
+    # 3. & 4. Fetch and Save Assets (Optional)
+    asset_types_to_process = []
+    if config.get('download_js', False): asset_types_to_process.append('js')
+    if config.get('download_css', False): asset_types_to_process.append('css')
+    if config.get('download_images', False): asset_types_to_process.append('img')
+
+    if asset_types_to_process:
+        logging.info(f"Processing assets ({', '.join(asset_types_to_process)}) for {original_url}...")
+        total_assets_found = sum(len(assets_to_download.get(t, [])) for t in asset_types_to_process)
+        asset_processed_count = 0
+        asset_success_count = 0
+        asset_fail_count = 0
+
+        # Pick every destination up front (sequentially, so collision handling stays
+        # deterministic), then download the page's assets concurrently straight to disk
+        assets_to_fetch = {}
+        assets_to_link = {} # asset_url -> asset type, for assets another page saved (or is saving)
+        reuse_timestamp = timestamp[:constants.ASSET_REUSE_TIMESTAMP_DIGITS] # Copies are only shared within one snapshot day
+        page_save_dir = get_page_save_dir(original_url, config)
+        for asset_type in asset_types_to_process:
+            urls_to_fetch = assets_to_download.get(asset_type, [])
+            if not urls_to_fetch:
+                continue
+            
+            logging.debug(f"Found {len(urls_to_fetch)} '{asset_type}' assets to potentially download.")
+            for asset_url in urls_to_fetch:
+                if asset_url in assets_to_fetch or asset_url in assets_to_link:
+                    continue
+                asset_processed_count += 1
+                reuse_key = (asset_url, reuse_timestamp)
+                with _asset_paths_lock: # Pages sharing a directory must not pick the same free name
+                    if config['reuse_downloaded_assets'] and reuse_key in downloaded_assets:
+                        # Saved (or being saved) for an earlier page of the same day's snapshot; link it below
+                        assets_to_link[asset_url] = asset_type
+                        continue
+                    local_path = get_asset_save_path(asset_url, original_url, config, asset_type, reserved_paths=_reserved_asset_paths, page_save_dir=page_save_dir)
+                    if local_path and config['reuse_downloaded_assets']:
+                        # Claim the asset so other pages wait for this download instead of starting their own
+                        downloaded_assets[reuse_key] = local_path
+                        _pending_assets[reuse_key] = threading.Event()
+                if local_path:
+                    assets_to_fetch[asset_url] = local_path
+                else:
+                    asset_fail_count += 1
+                    logging.error(f"Failed to save asset: {asset_url}")
+
+        fetched_assets = {}
+        try:
+            fetched_assets = fetch_assets_batch(assets_to_fetch, timestamp, config)
+        finally:
+            with _asset_paths_lock:
+                for asset_url in assets_to_fetch:
+                    reuse_key = (asset_url, reuse_timestamp)
+                    pending = _pending_assets.pop(reuse_key, None)
+                    if pending is None:
+                        continue
+                    if not fetched_assets.get(asset_url):
+                        downloaded_assets.pop(reuse_key, None) # Let a later page try again
+                    pending.set()
+        for asset_url, local_path in fetched_assets.items():
+            if local_path:
+                saved_assets_map[asset_url] = local_path # Store mapping on success
+                asset_success_count += 1
+            else:
+                asset_fail_count += 1
+                logging.warning(f"Failed to fetch asset: {asset_url}")
+
+        for asset_url, asset_type in assets_to_link.items():
+            reuse_key = (asset_url, reuse_timestamp)
+            with _asset_paths_lock:
+                pending = _pending_assets.get(reuse_key)
+            if pending:
+                pending.wait() # Another page is still downloading it
+            with _asset_paths_lock:
+                existing_path = downloaded_assets.get(reuse_key)
+                if existing_path:
+                    # Hard link the earlier page's copy into this page's directory
+                    saved_assets_map[asset_url] = link_saved_asset(existing_path, asset_url, original_url, config, asset_type, reserved_paths=_reserved_asset_paths, page_save_dir=page_save_dir)
+            if existing_path:
+                asset_success_count += 1
+            else:
+                asset_fail_count += 1
+                logging.warning(f"Failed to fetch asset: {asset_url}")
+        
+        logging.info(f"Asset processing summary for {original_url}: Found={total_assets_found}, Attempted={asset_processed_count}, Saved={asset_success_count}, Failed={asset_fail_count}")
+
+    # --- End Asset Fetch/Save ---
+
+    # 6. Extract Content, Optionally Rewrite Links, Convert to Markdown
+    # Pass the populated map of successfully saved assets
+    if parse_executor is not None: # Parse in another process, off this process's GIL
+        title, markdown_content = parse_executor.submit(extract_and_convert_content, html_content, original_url, config, saved_assets_map, page_save_dir=page_save_dir).result()
+    else:
+        title, markdown_content = extract_and_convert_content(page, original_url, config, saved_assets_map, page_save_dir=page_save_dir)
+    
+    # 5. Save Original HTML (Optional) - Use title extracted above
+    if config.get('save_original_html', False):
+        if title: # Only save if we have a title (even a fallback one)
+             save_html(html_content, title, original_url, config)
+        else:
+             logging.warning(f"Skipping HTML save for {original_url} due to missing title from extraction.")
+             
+    # Check if content extraction/conversion was successful before saving markdown
+    if not title or not markdown_content:
+        logging.warning(f"Failed to extract/convert content for {original_url}. Skipping Markdown save.")
+        return PAGE_FAILED
+
+    # Save markdown
+    save_success = save_markdown(title, markdown_content, original_url, timestamp, config)
+    if save_success:
+        save_checkpoint(original_url, processed_urls, config['checkpoint_file'])
+        return PAGE_SAVED
+    logging.error(f"Failed to save markdown for {original_url}.")
+    return PAGE_FAILED
+
+
 # --- Main Execution ---
 def main():
     """Main function to orchestrate the scraping process."""
@@ -24,6 +186,7 @@ def main():
     setup_logging(config['log_file']) 
     logging.info("--- Starting Archive Fetcher ---")
     logging.info(f"Configuration loaded for domain: {config['target_domain']}")
+    configure_rate_limit(config['max_requests_per_second'], max_pause=config['max_retry_delay_seconds'])
 
     # 1. Fetch CDX Index
     cdx_data = fetch_cdx_index(config=config)
@@ -45,35 +208,74 @@ def main():
         
     # 3. Load Checkpoint
     processed_urls = load_checkpoint(config['checkpoint_file'])
+    compact_checkpoint(processed_urls, config['checkpoint_file']) # Start this run with an empty log
+    # Fold this run's log back in on any exit (normal end, sys.exit, Ctrl+C)
+    atexit.register(compact_checkpoint, processed_urls, config['checkpoint_file'])
     
     # 4. Iterate and Process Pages
     total_urls = len(latest_snapshots)
-    processed_count = 0
     success_count = 0
     fail_count = 0
     skipped_count = len(processed_urls) 
 
+    memento_fallback_urls = {} # original_url -> Wayback timestamp, for pages Wayback failed to serve
+    downloaded_assets = {} # (asset_url, snapshot day) -> local path, so site-wide assets are fetched once per snapshot day
+
     logging.info(f"Starting processing for {total_urls} unique URLs. ({skipped_count} already processed).")
 
-    for original_url, timestamp in latest_snapshots.items():
-        processed_count += 1
-        progress_percent = (processed_count / total_urls) * 100
-        
+    # Work through the URLs in sorted order: pages of one directory are processed (and written)
+    # together, and requests for neighbouring paths go out back to back on warm connections
+    pending_snapshots = {}
+    for position, (original_url, timestamp) in enumerate(sorted(latest_snapshots.items()), start=1):
         if original_url in processed_urls:
-            logging.debug(f"Skipping already processed URL: {original_url}")
-            continue 
+            logging.debug("Skipping already processed URL: %s", original_url) # Lazy: runs once per already-processed URL
+            continue
+        pending_snapshots[original_url] = (position, timestamp)
 
-        logging.info(f"Processing URL {processed_count}/{total_urls} ({progress_percent:.1f}%): {original_url} @ {timestamp}")
+    # Pages are independent and their time is spent waiting on the network, so several
+    # are processed at once; each page's assets are still fetched by fetch_assets_batch
+    page_workers = max(1, min(config['page_workers'], len(pending_snapshots)))
+    if pending_snapshots:
+        logging.info(f"Processing {len(pending_snapshots)} pages using {page_workers} workers...")
+    # Parsing and conversion are CPU-bound; with parse_workers they scale across cores
+    parse_executor = ProcessPoolExecutor(max_workers=config['parse_workers']) if config['parse_workers'] and pending_snapshots else None
+    executor = ThreadPoolExecutor(max_workers=page_workers)
+    try:
+        future_to_url = {
+            executor.submit(process_page, original_url, timestamp, position, total_urls, config, processed_urls, downloaded_assets, parse_executor): original_url
+            for original_url, (position, timestamp) in pending_snapshots.items()
+        }
+        for future in as_completed(future_to_url):
+            original_url = future_to_url[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error(f"Unexpected error processing {original_url}: {e}", exc_info=True)
+                result = PAGE_FAILED
+            if result == PAGE_SAVED:
+                success_count += 1
+            elif result == PAGE_NOT_FETCHED:
+                # Memento lookups are batched after the main loop so they can run concurrently
+                memento_fallback_urls[original_url] = pending_snapshots[original_url][1]
+            else:
+                fail_count += 1
+    except KeyboardInterrupt:
+        # Drop the queued pages instead of fetching every one of them before exiting;
+        # pages already in progress still finish and are checkpointed for the next run
+        logging.warning("Interrupted. Cancelling pages not started yet; re-run to resume from the checkpoint.")
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    else:
+        executor.shutdown()
+    finally:
+        if parse_executor is not None:
+            parse_executor.shutdown(cancel_futures=True)
 
-        # Fetch content from Wayback Machine
-        html_content = fetch_page_content(original_url, timestamp, config=config)
-        
-        memento_success = False 
-        if not html_content:
-            logging.warning(f"Failed to fetch content for {original_url} from Wayback Machine. Attempting Memento fallback...")
-            
-            # --- Memento Fallback ---
-            memento_uri = fetch_memento_snapshot(original_url, config=config, wayback_timestamp=timestamp)
+    # --- Memento Fallback ---
+    if memento_fallback_urls:
+        logging.info(f"Attempting Memento fallback for {len(memento_fallback_urls)} URLs...")
+        memento_uris = fetch_mementos_batch(memento_fallback_urls, config)
+        for original_url, memento_uri in memento_uris.items():
             if memento_uri:
                 # Pass the processed_urls set for checkpointing within the function
                 memento_success = fetch_and_process_memento_content(memento_uri, original_url, config=config, processed_urls_set=processed_urls)
@@ -85,91 +287,15 @@ def main():
                     logging.warning(f"Memento fallback failed to fetch/process content from {memento_uri} for {original_url}.")
             else:
                 logging.warning(f"No suitable Memento snapshot found for {original_url}.")
-            # --- End Memento Fallback ---
-            
-            if not memento_success:
-                logging.error(f"Failed to fetch content for {original_url} from both Wayback Machine and Memento.")
-                fail_count += 1
-                continue
-
-        # --- Start Asset/HTML Processing (Only for Wayback Machine content) ---
-        
-        # Initialize map for saved assets for this page
-        saved_assets_map = {} 
-
-        # 2. Asset Discovery (Run before extraction to know what might be downloadable)
-        assets_to_download = find_assets(html_content, original_url, config)
-
-        # 3. & 4. Fetch and Save Assets (Optional)
-        asset_types_to_process = []
-        if config.get('download_js', False): asset_types_to_process.append('js')
-        if config.get('download_css', False): asset_types_to_process.append('css')
-        if config.get('download_images', False): asset_types_to_process.append('img')
-
-        if asset_types_to_process:
-            logging.info(f"Processing assets ({', '.join(asset_types_to_process)}) for {original_url}...")
-            total_assets_found = sum(len(assets_to_download.get(t, [])) for t in asset_types_to_process)
-            asset_processed_count = 0
-            asset_success_count = 0
-            asset_fail_count = 0
-
-            for asset_type in asset_types_to_process:
-                urls_to_fetch = assets_to_download.get(asset_type, [])
-                if not urls_to_fetch:
-                    continue
-                
-                logging.debug(f"Found {len(urls_to_fetch)} '{asset_type}' assets to potentially download.")
-                for asset_url in urls_to_fetch:
-                    asset_processed_count += 1
-                    logging.debug(f"Processing asset {asset_processed_count}/{total_assets_found}: {asset_url}")
-                    
-                    asset_content = fetch_asset(asset_url, timestamp, config=config)
-                    if asset_content:
-                        local_path = save_asset(asset_content, asset_url, original_url, config, asset_type)
-                        if local_path:
-                            saved_assets_map[asset_url] = local_path # Store mapping on success
-                            asset_success_count += 1
-                        else:
-                            asset_fail_count += 1
-                            logging.error(f"Failed to save asset: {asset_url}")
-                    else:
-                        asset_fail_count += 1
-                        logging.warning(f"Failed to fetch asset: {asset_url}")
-            
-            logging.info(f"Asset processing summary for {original_url}: Found={total_assets_found}, Attempted={asset_processed_count}, Saved={asset_success_count}, Failed={asset_fail_count}")
-
-        # --- End Asset Fetch/Save ---
 
-        # 6. Extract Content, Optionally Rewrite Links, Convert to Markdown
-        # Pass the populated map of successfully saved assets
-        title, markdown_content = extract_and_convert_content(html_content, original_url, config, saved_assets_map)
-        
-        # 5. Save Original HTML (Optional) - Use title extracted above
-        if config.get('save_original_html', False):
-            if title: # Only save if we have a title (even a fallback one)
-                 save_html(html_content, title, original_url, config)
-            else:
-                 logging.warning(f"Skipping HTML save for {original_url} due to missing title from extraction.")
-                 
-        # Check if content extraction/conversion was successful before saving markdown
-        if not title or not markdown_content:
-            logging.warning(f"Failed to extract/convert content for {original_url}. Skipping Markdown save.")
-            fail_count += 1
-            continue
-
-        # Save markdown
-        save_success = save_markdown(title, markdown_content, original_url, timestamp, config)
-        if save_success:
-            success_count += 1
-            save_checkpoint(original_url, processed_urls, config['checkpoint_file'])
-        else:
+            logging.error(f"Failed to fetch content for {original_url} from both Wayback Machine and Memento.")
             fail_count += 1
-            logging.error(f"Failed to save markdown for {original_url}.")
+    # --- End Memento Fallback ---
 
     logging.info("--- Processing Summary ---")
     logging.info(f"Total unique URLs found: {total_urls}")
     logging.info(f"URLs skipped (already processed): {skipped_count}")
-    logging.info(f"URLs processed in this run: {processed_count - skipped_count}")
+    logging.info(f"URLs processed in this run: {len(pending_snapshots)}")
     logging.info(f"Successfully saved: {success_count}")
     logging.info(f"Failed/Skipped during processing: {fail_count}")
     logging.info("--- Archive Fetcher Finished ---")
@@ -2,6 +2,8 @@ import pytest
 import sys
 import os
 import logging; logging.basicConfig(level=logging.DEBUG) 
+import requests
+from unittest.mock import MagicMock
 
 # Ensure the project root is in the Python path for imports in tests
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -31,4 +33,51 @@ def configure_logging(caplog):
     """Ensure logging is configured to capture DEBUG level messages for all tests."""
     caplog.set_level(logging.DEBUG, logger="root") # Set root logger level
     # You can also set levels for specific loggers if needed:
-    # caplog.set_level(logging.DEBUG, logger="api_clients.decorators")
\ No newline at end of file
+    # caplog.set_level(logging.DEBUG, logger="api_clients.decorators")
+
+@pytest.fixture(autouse=True)
+def no_retry_sleep(mocker):
+    """Skip real backoff sleeps in the retry decorator so retry tests run instantly."""
+    return mocker.patch('api_clients.decorators.time.sleep')
+
+@pytest.fixture(autouse=True)
+def close_checkpoint_log():
+    """Don't carry an open (or mocked) checkpoint log handle over to the next test."""
+    import file_handler
+    yield
+    with file_handler._checkpoint_lock:
+        file_handler._close_checkpoint_log()
+
+@pytest.fixture(autouse=True)
+def reset_created_dirs():
+    """Forget directories created (or mocked as created) by earlier tests."""
+    import file_handler
+    file_handler._created_dirs.clear()
+    file_handler._page_dirs.clear()
+
+@pytest.fixture(autouse=True)
+def reset_circuit_breakers():
+    """Start every test with closed circuit breakers so failures don't leak between tests."""
+    from api_clients.decorators import reset_circuit_breakers as reset
+    reset()
+    yield
+    reset()
+
+@pytest.fixture
+def make_mock_response():
+    """
+    Returns a factory for mocked requests.Response objects. They work as context managers
+    (exiting closes them, like requests.Response); `http_error` makes raise_for_status raise.
+    """
+    def make(status_code=200, url="http://mocked.url", http_error=None):
+        response = MagicMock(spec=requests.Response)
+        response.status_code = status_code
+        response.url = url
+        response.close = MagicMock(return_value=None)
+        response.__enter__.return_value = response
+        response.__exit__.side_effect = lambda *exc: response.close()
+        response.raise_for_status = MagicMock()
+        if http_error:
+            response.raise_for_status.side_effect = requests.exceptions.HTTPError(http_error, response=response)
+        return response
+    return make
@@ -0,0 +1,261 @@
+# tests/test_cdx_client.py
+
+import pytest
+import requests
+import logging
+import os
+from unittest.mock import patch, MagicMock
+
+# Module to test
+from api_clients import cdx_client
+
+# --- Fixtures ---
+
+@pytest.fixture
+def cdx_config(tmp_path):
+    """Provides a basic config dictionary for CDX tests."""
+    return {
+        "target_domain": "example.com",
+        "cdx_cache_file": str(tmp_path / "cdx_cache.json"),
+        "user_agent": "TestAgent/1.0",
+        "request_timeout_api": 10,
+        "max_retries": 1,
+        "request_delay_seconds": 0.01,
+    }
+
+
+def _streamed_response(lines, status_code=200, headers=None):
+    """Builds a mock streamed response yielding the given raw lines."""
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.close.return_value = None
+    response.__enter__.return_value = response # Used as a context manager; exiting closes it
+    response.__exit__.side_effect = lambda *exc: response.close()
+    response.iter_lines.return_value = iter(lines)
+    return response
+
+
+# --- Tests for fetch_cdx_index ---
+
+@patch('api_clients.cdx_client.get_session')
+def test_fetch_cdx_index_streams_rows(mock_get_session, cdx_config):
+    """Test that a multi-line CDX body is parsed row by row and the header is dropped."""
+    mock_get = mock_get_session.return_value.get
+    mock_get.return_value = _streamed_response([
+        b'[["original","timestamp","mimetype"],',
+        b'["http://example.com/a","20200101000000","text/html"],',
+        b'["http://example.com/b","20210101000000","text/html"]]',
+    ])
+
+    result = cdx_client.fetch_cdx_index(config=cdx_config)
+
+    assert result == [
+        ["http://example.com/a", "20200101000000", "text/html"],
+        ["http://example.com/b", "20210101000000", "text/html"],
+    ]
+    assert mock_get.call_args.kwargs['stream'] is True
+    assert result[0][2] is result[1][2] # Repeated mimetypes share one str object
+    mock_get.return_value.close.assert_called_once()
+
+
+@patch('api_clients.cdx_client.get_session')
+def test_fetch_cdx_index_single_line_body(mock_get_session, cdx_config):
+    """Test that a body with the whole array on one line is also handled."""
+    mock_get_session.return_value.get.return_value = _streamed_response([
+        b'[["original","timestamp","mimetype"],["http://example.com/a","20200101000000","text/html"]]',
+    ])
+
+    result = cdx_client.fetch_cdx_index(config=cdx_config)
+
+    assert result == [["http://example.com/a", "20200101000000", "text/html"]]
+
+
+@patch('api_clients.cdx_client.get_session')
+def test_fetch_cdx_index_without_header_keeps_first_row(mock_get_session, cdx_config):
+    """Test that the first row is kept when the body has no header row."""
+    mock_get_session.return_value.get.return_value = _streamed_response([
+        b'[["http://example.com/a","20200101000000","text/html"],',
+        b'["http://example.com/b","20210101000000","text/html"]]',
+    ])
+
+    result = cdx_client.fetch_cdx_index(config=cdx_config)
+
+    assert [row[0] for row in result] == ["http://example.com/a", "http://example.com/b"]
+
+
+@patch('api_clients.cdx_client.get_session')
+def test_fetch_cdx_index_keeps_only_newest_row_per_url(mock_get_session, cdx_config):
+    """Test that older snapshots are dropped while streaming and malformed rows are passed through."""
+    mock_get_session.return_value.get.return_value = _streamed_response([
+        b'[["original","timestamp","mimetype"],',
+        b'["http://example.com/a","20200101000000","text/html"],',
+        b'["http://example.com/b","20190101000000","text/html"],',
+        b'["http://example.com/a","20220101000000","text/html"],',
+        b'["http://example.com/a","bad-timestamp","text/html"],',
+        b'["http://example.com/a","20210101000000","text/html"]]',
+    ])
+
+    result = cdx_client.fetch_cdx_index(config=cdx_config)
+
+    assert result == [
+        ["http://example.com/a", "20220101000000", "text/html"],
+        ["http://example.com/b", "20190101000000", "text/html"],
+        ["http://example.com/a", "bad-timestamp", "text/html"], # Left for process_cdx_data to report
+    ]
+    assert cdx_client.process_cdx_data(result) == {
+        "http://example.com/a": "20220101000000",
+        "http://example.com/b": "20190101000000",
+    }
+
+
+@pytest.mark.parametrize("lines", [[b'[]'], [], [b'[["original","timestamp","mimetype"]]']])
+@patch('api_clients.cdx_client.get_session')
+def test_fetch_cdx_index_empty(mock_get_session, lines, cdx_config):
+    """Test that an empty index (with or without header) yields an empty list."""
+    mock_get_session.return_value.get.return_value = _streamed_response(lines)
+
+    assert cdx_client.fetch_cdx_index(config=cdx_config) == []
+
+
+@patch('api_clients.cdx_client.get_session')
+def test_fetch_cdx_index_invalid_json(mock_get_session, cdx_config, caplog):
+    """Test that an undecodable row fails the fetch."""
+    mock_get_session.return_value.get.return_value = _streamed_response([
+        b'[["original","timestamp","mimetype"],',
+        b'["http://example.com/a","2020',
+    ])
+
+    with caplog.at_level(logging.ERROR):
+        result = cdx_client.fetch_cdx_index(config=cdx_config)
+
+    assert result is None
+    assert "Failed to decode JSON response from CDX API" in caplog.text
+
+
+@patch('api_clients.cdx_client.get_session')
+def test_fetch_cdx_index_404(mock_get_session, cdx_config):
+    """Test that a 404 is treated as no results."""
+    mock_get_session.return_value.get.return_value = _streamed_response([], status_code=404)
+
+    assert cdx_client.fetch_cdx_index(config=cdx_config) == []
+
+
+@patch('api_clients.cdx_client.get_session')
+def test_fetch_cdx_index_revalidates_cached_index(mock_get_session, cdx_config):
+    """Test that a cached index is revalidated with its ETag and reused on 304."""
+    mock_get = mock_get_session.return_value.get
+    rows = [b'[["original","timestamp","mimetype"],', b'["http://example.com/a","20200101000000","text/html"]]']
+    mock_get.return_value = _streamed_response(rows, headers={"ETag": '"abc"', "Last-Modified": "Wed, 01 Jan 2020 00:00:00 GMT"})
+
+    first = cdx_client.fetch_cdx_index(config=cdx_config)
+    assert mock_get.call_args.kwargs['headers'] is None # Nothing cached yet
+
+    mock_get.return_value = _streamed_response([], status_code=304)
+    second = cdx_client.fetch_cdx_index(config=cdx_config)
+
+    assert second == first == [["http://example.com/a", "20200101000000", "text/html"]]
+    assert mock_get.call_args.kwargs['headers'] == {
+        "If-None-Match": '"abc"',
+        "If-Modified-Since": "Wed, 01 Jan 2020 00:00:00 GMT",
+    }
+
+
+@patch('api_clients.cdx_client.get_session')
+def test_fetch_cdx_index_interrupted_stream_is_retried(mock_get_session, cdx_config):
+    """Test that a connection drop partway through the CDX stream retries the whole query."""
+    def broken_lines():
+        yield b'[["original","timestamp","mimetype"],'
+        yield b'["http://example.com/a","20200101000000","text/html"],'
+        raise requests.exceptions.ChunkedEncodingError("Connection broken: IncompleteRead")
+
+    broken_response = _streamed_response([])
+    broken_response.iter_lines.return_value = broken_lines()
+    mock_get = mock_get_session.return_value.get
+    mock_get.side_effect = [broken_response, _streamed_response([
+        b'[["original","timestamp","mimetype"],',
+        b'["http://example.com/a","20200101000000","text/html"],',
+        b'["http://example.com/b","20210101000000","text/html"]]',
+    ])]
+
+    result = cdx_client.fetch_cdx_index(config=cdx_config)
+
+    assert result == [
+        ["http://example.com/a", "20200101000000", "text/html"],
+        ["http://example.com/b", "20210101000000", "text/html"],
+    ]
+    assert mock_get.call_count == 2
+    broken_response.close.assert_called_once()
+
+
+@patch('api_clients.cdx_client.get_session')
+def test_fetch_cdx_index_not_cached_without_validators(mock_get_session, cdx_config):
+    """Test that responses without ETag/Last-Modified are not cached."""
+    mock_get_session.return_value.get.return_value = _streamed_response(
+        [b'[["http://example.com/a","20200101000000","text/html"]]'])
+
+    cdx_client.fetch_cdx_index(config=cdx_config)
+
+    assert not os.path.exists(cdx_config["cdx_cache_file"])
+
+
+# --- Tests for process_cdx_data ---
+
+def test_process_cdx_data_keeps_latest_timestamp():
+    """Test that only the newest snapshot per URL is kept."""
+    cdx_data = [
+        ["http://example.com/a", "20200101000000", "text/html"],
+        ["http://example.com/b", "20210101000000", "text/html"],
+        ["http://example.com/a", "20220101000000", "text/html"],
+        ["http://example.com/a", "20190101000000", "text/html"],
+    ]
+
+    result = cdx_client.process_cdx_data(cdx_data)
+
+    assert result == {
+        "http://example.com/a": "20220101000000",
+        "http://example.com/b": "20210101000000",
+    }
+
+
+@pytest.mark.parametrize("record, expected_log", [
+    (["http://example.com/short"], "Skipping invalid CDX record"),
+    ("not a list", "Skipping invalid CDX record"),
+    (["", "20200101000000", "text/html"], "Skipping CDX record with missing URL or timestamp"),
+    (["http://example.com/x", "", "text/html"], "Skipping CDX record with missing URL or timestamp"),
+    (["http://example.com/x", "2020", "text/html"], "Skipping CDX record with invalid timestamp format '2020'"),
+    (["http://example.com/x", "2020010100000x", "text/html"], "Skipping CDX record with invalid timestamp format"),
+])
+def test_process_cdx_data_skips_invalid_records(record, expected_log, caplog):
+    """Test that malformed records are skipped and logged with the reason."""
+    cdx_data = [record, ["http://example.com/ok", "20200101000000", "text/html"]]
+
+    with caplog.at_level(logging.WARNING):
+        result = cdx_client.process_cdx_data(cdx_data)
+
+    assert result == {"http://example.com/ok": "20200101000000"}
+    assert expected_log in caplog.text
+    assert "Skipped 1 invalid CDX records during processing." in caplog.text
+
+
+@pytest.mark.parametrize("cdx_data", [None, "not a list"])
+def test_process_cdx_data_invalid_input(cdx_data, caplog):
+    """Test that non-list input is rejected."""
+    with caplog.at_level(logging.ERROR):
+        assert cdx_client.process_cdx_data(cdx_data) is None
+    assert "Cannot process CDX data" in caplog.text
+
+
+def test_process_cdx_data_accepts_generator():
+    """Test that records can be consumed lazily from a generator."""
+    records = (row for row in [
+        ["http://example.com/a", "20200101000000", "text/html"],
+        ["http://example.com/a", "20220101000000", "text/html"],
+    ])
+
+    assert cdx_client.process_cdx_data(records) == {"http://example.com/a": "20220101000000"}
+
+
+def test_process_cdx_data_empty():
+    """Test that an empty index yields no snapshots."""
+    assert cdx_client.process_cdx_data([]) == {}
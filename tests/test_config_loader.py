@@ -120,12 +120,25 @@ def test_load_config_defaults(tmp_path):
     # Assert defaults were applied for missing optional keys
     assert loaded_config['request_timeout_api'] == constants.DEFAULT_TIMEOUT_API
     assert loaded_config['request_timeout_content'] == constants.DEFAULT_TIMEOUT_CONTENT
+    assert loaded_config['max_retry_delay_seconds'] == constants.DEFAULT_MAX_RETRY_DELAY
+    assert loaded_config['circuit_breaker_threshold'] == constants.DEFAULT_CIRCUIT_BREAKER_THRESHOLD
+    assert loaded_config['circuit_breaker_cooldown_seconds'] == constants.DEFAULT_CIRCUIT_BREAKER_COOLDOWN
+    assert loaded_config['max_requests_per_second'] == constants.DEFAULT_MAX_REQUESTS_PER_SECOND
     assert loaded_config['download_js'] is False # Default
     assert loaded_config['download_css'] is False # Default
     assert loaded_config['download_images'] is False # Default
     assert loaded_config['save_original_html'] is False # Default
     assert loaded_config['rewrite_asset_links'] is True # Default
     assert loaded_config['asset_save_structure'] == 'per_page' # Default
+    assert loaded_config['memento_workers'] == constants.DEFAULT_MEMENTO_WORKERS
+    assert loaded_config['page_workers'] == constants.DEFAULT_PAGE_WORKERS
+    assert loaded_config['parse_workers'] == constants.DEFAULT_PARSE_WORKERS
+    assert loaded_config['asset_workers'] == constants.DEFAULT_ASSET_WORKERS
+    assert loaded_config['asset_chunk_size'] == constants.DOWNLOAD_CHUNK_SIZE
+    assert loaded_config['reuse_downloaded_assets'] is True
+    assert [selector.pattern for selector in loaded_config['content_selectors_compiled']] == ["main"]
+    assert loaded_config['html_parser'] is None # Automatic
+    assert loaded_config['cdx_cache_file'] == constants.DEFAULT_CDX_CACHE_FILE
 
 
 # Expect ValueError for invalid value type
@@ -153,6 +166,59 @@ def test_load_config_invalid_value_type(tmp_path):
     assert "Config 'request_delay_seconds' must be a non-negative number." in str(e.value)
 
 
+def test_load_config_invalid_content_selector(tmp_path):
+    """Tests that an unparsable CSS selector is rejected at load time."""
+    config_data = {
+        "target_domain": "example.com",
+        "output_dir": "test_output",
+        "content_selectors": ["main", "div[class="],
+        "request_delay_seconds": 1,
+        "max_retries": 5,
+        "user_agent": "TestAgent/1.0",
+        "checkpoint_file": "test_checkpoint.json",
+        "log_file": "test_scraping.log",
+        "cdx_api_url": "http://test-cdx-server.com/cdx"
+    }
+    config_file = tmp_path / "invalid_selector_config.json"
+    config_file.write_text(json.dumps(config_data))
+
+    with pytest.raises(ValueError) as e:
+        config_loader.load_config(str(config_file))
+
+    assert "Config 'content_selectors' contains an invalid CSS selector" in str(e.value)
+
+
+@pytest.mark.parametrize("html_parser, installed", [
+    ('html.parser', True), # Standard library, always available
+    ('html5lib', False),
+    ('lxml', False),
+])
+def test_load_config_html_parser_must_be_installed(tmp_path, html_parser, installed):
+    """Tests that an explicitly chosen parser is only accepted when its library is installed."""
+    config_data = {
+        "target_domain": "example.com",
+        "output_dir": "test_output",
+        "content_selectors": ["main"],
+        "request_delay_seconds": 1,
+        "max_retries": 5,
+        "user_agent": "TestAgent/1.0",
+        "checkpoint_file": "test_checkpoint.json",
+        "log_file": "test_scraping.log",
+        "cdx_api_url": "http://test-cdx-server.com/cdx",
+        "html_parser": html_parser,
+    }
+    config_file = tmp_path / "parser_config.json"
+    config_file.write_text(json.dumps(config_data))
+    lookup = config_loader.builder_registry.lookup
+    with patch('config_loader.builder_registry.lookup', side_effect=lambda name: lookup(name) if installed else None):
+        if installed:
+            assert config_loader.load_config(str(config_file))['html_parser'] == html_parser
+        else:
+            with pytest.raises(ValueError) as e:
+                config_loader.load_config(str(config_file))
+            assert f"Config 'html_parser' is '{html_parser}', but that parser is not installed" in str(e.value)
+
+
 # Expect FileNotFoundError
 def test_load_config_file_not_found():
     """Tests loading a non-existent config file raises FileNotFoundError."""
@@ -0,0 +1,195 @@
+# tests/test_decorators.py
+
+import pytest
+import requests
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest.mock import MagicMock, patch
+
+# Module to test
+from api_clients.decorators import retry_request, parse_retry_after, _LazyUrlSnippet
+
+
+def _http_error(status_code):
+    """Builds an HTTPError carrying a mock response with the given status code."""
+    response = MagicMock(spec=requests.Response)
+    response.status_code = status_code
+    response.headers = {}
+    return requests.exceptions.HTTPError(f"{status_code} Error", response=response)
+
+
+# --- Tests for backoff jitter ---
+
+def test_retry_backoff_uses_decorrelated_jitter(no_retry_sleep):
+    """Test that each wait is drawn from [delay, previous_wait * 3] and capped."""
+    config = {'max_retries': 3, 'request_delay_seconds': 2, 'max_retry_delay_seconds': 10}
+    func = MagicMock(side_effect=[_http_error(503)] * 3 + ["ok"])
+    func.__name__ = "func"
+    wrapped = retry_request()(func)
+
+    with patch('api_clients.decorators.random.uniform', side_effect=lambda low, high: high) as mock_uniform:
+        result = wrapped("http://example.com/page", config=config)
+
+    assert result == "ok"
+    assert func.call_count == 4
+    # Upper bound grows from the previous wait: 2*3=6, then 6*3=18 (capped at 10), then 10*3=30 (capped)
+    assert [c.args for c in mock_uniform.call_args_list] == [(2, 6), (2, 18), (2, 30)]
+    assert [c.args[0] for c in no_retry_sleep.call_args_list] == [6, 10, 10]
+
+
+def test_retry_backoff_default_cap(no_retry_sleep):
+    """Test that the wait is capped by the default max delay when not configured."""
+    import constants
+    config = {'max_retries': 1, 'request_delay_seconds': 100}
+    func = MagicMock(side_effect=[_http_error(500), "ok"])
+    func.__name__ = "func"
+    wrapped = retry_request()(func)
+
+    assert wrapped("http://example.com/page", config=config) == "ok"
+    no_retry_sleep.assert_called_once_with(constants.DEFAULT_MAX_RETRY_DELAY)
+
+
+# --- Tests for the circuit breaker ---
+
+def _failing_func(name="breaker_func"):
+    func = MagicMock(side_effect=_http_error(503))
+    func.__name__ = name
+    return func
+
+
+def test_circuit_breaker_opens_and_fails_fast():
+    """Test that after `threshold` consecutive failures further calls skip the request."""
+    config = {'max_retries': 1, 'request_delay_seconds': 0, 'circuit_breaker_threshold': 4,
+              'circuit_breaker_cooldown_seconds': 60}
+    func = _failing_func()
+    wrapped = retry_request(return_on_failure="failed")(func)
+
+    assert wrapped("http://example.com/1", config=config) == "failed" # 2 failures
+    assert wrapped("http://example.com/2", config=config) == "failed" # 4 failures -> opens
+    assert func.call_count == 4
+
+    assert wrapped("http://example.com/3", config=config) == "failed"
+    assert func.call_count == 4 # Failed fast, no request made
+
+
+def test_circuit_breaker_half_open_probe_closes_on_success():
+    """Test that after the cooldown one probe is let through and success closes the breaker."""
+    config = {'max_retries': 0, 'request_delay_seconds': 0, 'circuit_breaker_threshold': 1,
+              'circuit_breaker_cooldown_seconds': 30}
+    func = MagicMock(side_effect=[_http_error(503), "ok", "ok again"])
+    func.__name__ = "probe_func"
+    wrapped = retry_request()(func)
+
+    with patch('api_clients.decorators.time.monotonic', return_value=1000):
+        assert wrapped("http://example.com/a", config=config) is None # Opens the breaker
+        assert wrapped("http://example.com/b", config=config) is None # Fails fast
+    assert func.call_count == 1
+
+    with patch('api_clients.decorators.time.monotonic', return_value=1031):
+        assert wrapped("http://example.com/c", config=config) == "ok" # Probe succeeds
+        assert wrapped("http://example.com/d", config=config) == "ok again" # Closed again
+    assert func.call_count == 3
+
+
+def test_circuit_breaker_interrupted_probe_lets_next_call_probe():
+    """Test that a probe ended by KeyboardInterrupt does not leave the breaker half-open for good."""
+    config = {'max_retries': 0, 'request_delay_seconds': 0, 'circuit_breaker_threshold': 1,
+              'circuit_breaker_cooldown_seconds': 30}
+    func = MagicMock(side_effect=[_http_error(503), KeyboardInterrupt, "ok"])
+    func.__name__ = "interrupted_probe_func"
+    wrapped = retry_request()(func)
+
+    with patch('api_clients.decorators.time.monotonic', return_value=1000):
+        assert wrapped("http://example.com/a", config=config) is None # Opens the breaker
+
+    with patch('api_clients.decorators.time.monotonic', return_value=1031):
+        with pytest.raises(KeyboardInterrupt):
+            wrapped("http://example.com/b", config=config) # Probe interrupted
+        assert wrapped("http://example.com/c", config=config) == "ok" # Next call probes again
+    assert func.call_count == 3
+
+
+def test_circuit_breaker_success_resets_failure_count():
+    """Test that only consecutive failures count towards opening the breaker."""
+    config = {'max_retries': 0, 'request_delay_seconds': 0, 'circuit_breaker_threshold': 2}
+    func = MagicMock(side_effect=[_http_error(503), "ok", _http_error(503), "ok"])
+    func.__name__ = "flaky_func"
+    wrapped = retry_request()(func)
+
+    results = [wrapped("http://example.com/", config=config) for _ in range(4)]
+
+    assert results == [None, "ok", None, "ok"]
+    assert func.call_count == 4
+
+
+def test_circuit_breaker_disabled_with_zero_threshold():
+    """Test that a threshold of 0 disables the breaker."""
+    config = {'max_retries': 0, 'request_delay_seconds': 0, 'circuit_breaker_threshold': 0}
+    func = _failing_func("disabled_func")
+    wrapped = retry_request()(func)
+
+    for _ in range(15):
+        wrapped("http://example.com/", config=config)
+
+    assert func.call_count == 15
+
+
+# --- Tests for Retry-After ---
+
+@pytest.mark.parametrize("value, expected", [
+    ("120", 120),
+    (" 5 ", 5),
+    ("", None),
+    (None, None),
+    ("soon", None),
+    ("-3", None),
+])
+def test_parse_retry_after_seconds(value, expected):
+    """Test parsing delay-seconds values (and rejecting junk)."""
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    """Test parsing an HTTP-date relative to now; past dates mean no wait."""
+    future = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=90), usegmt=True)
+    assert 85 <= parse_retry_after(future) <= 90
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+
+
+def test_retry_honours_retry_after_header(no_retry_sleep):
+    """Test that a Retry-After header is a floor for the jittered wait, capped at max delay."""
+    config = {'max_retries': 4, 'request_delay_seconds': 1, 'max_retry_delay_seconds': 30}
+    rate_limited = _http_error(429)
+    rate_limited.response.headers = {'Retry-After': '7'}
+    too_long = _http_error(503)
+    too_long.response.headers = {'Retry-After': '3600'}
+    immediate = _http_error(429)
+    immediate.response.headers = {'Retry-After': '0'}
+    func = MagicMock(side_effect=[rate_limited, too_long, immediate, _http_error(503), "ok"])
+    func.__name__ = "func"
+    wrapped = retry_request()(func)
+
+    with patch('api_clients.decorators.random.uniform', return_value=2.5):
+        result = wrapped("http://example.com/page", config=config)
+
+    assert result == "ok"
+    # Server-advertised 7s, then 3600s capped to 30s, then "0" doesn't undercut the jitter, then jitter without a header
+    assert [c.args[0] for c in no_retry_sleep.call_args_list] == [7, 30, 2.5, 2.5]
+
+
+# --- Tests for the lazy URL snippet ---
+
+@pytest.mark.parametrize("args, kwargs, expected", [
+    (("http://example.com/page",), {}, "for http://example.com/page..."),
+    (("not a url", "https://example.com/second"), {}, "for https://example.com/second..."),
+    ((), {"url": "http://example.com/kw"}, "for http://example.com/kw..."),
+    ((), {"config": {}, "memento_uri": "http://memento.example.org/x"}, "for http://memento.example.org/x..."),
+    (("no url",), {"config": {}}, "for function func"),
+    (("http://example.com/" + "a" * 100,), {}, "for http://example.com/" + "a" * 61 + "..."),
+])
+def test_lazy_url_snippet(args, kwargs, expected):
+    """Test that the snippet finds the logged URL the same way as before, on first use."""
+    snippet = _LazyUrlSnippet("func", args, kwargs)
+    assert snippet._text is None # Nothing searched until formatted
+    assert f"{snippet}" == expected
+    assert str(snippet) == expected
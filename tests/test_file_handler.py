@@ -2,6 +2,7 @@ import pytest
 import os
 import sys
 import json
+import hashlib
 import logging
 from unittest.mock import patch, mock_open, MagicMock
 import re # Import re
@@ -42,7 +43,7 @@ def test_load_checkpoint_file_not_exist(mock_log_info, mock_exists):
     checkpoint_file = "non_existent_checkpoint.json"
     processed_urls = file_handler.load_checkpoint(checkpoint_file)
     assert processed_urls == set()
-    mock_exists.assert_called_once_with(checkpoint_file)
+    mock_exists.assert_any_call(checkpoint_file)
     # No specific log message expected here by default, maybe info if implemented
 
 @patch('os.path.exists', return_value=True)
@@ -54,8 +55,8 @@ def test_load_checkpoint_valid_file(mock_log_info, mock_file_open, mock_exists):
     expected_urls = {"http://example.com/page1", "http://example.com/page2"}
     processed_urls = file_handler.load_checkpoint(checkpoint_file)
     assert processed_urls == expected_urls
-    mock_exists.assert_called_once_with(checkpoint_file)
-    mock_file_open.assert_called_once_with(checkpoint_file, 'r', encoding='utf-8')
+    mock_exists.assert_any_call(checkpoint_file)
+    mock_file_open.assert_any_call(checkpoint_file, 'rb')
     mock_log_info.assert_called_once_with(f"Loaded {len(expected_urls)} processed URLs from checkpoint file: {checkpoint_file}")
 
 @patch('os.path.exists', return_value=True)
@@ -66,8 +67,8 @@ def test_load_checkpoint_empty_file(mock_log_warning, mock_file_open, mock_exist
     checkpoint_file = "empty_checkpoint.json"
     processed_urls = file_handler.load_checkpoint(checkpoint_file)
     assert processed_urls == set()
-    mock_exists.assert_called_once_with(checkpoint_file)
-    mock_file_open.assert_called_once_with(checkpoint_file, 'r', encoding='utf-8')
+    mock_exists.assert_any_call(checkpoint_file)
+    mock_file_open.assert_any_call(checkpoint_file, 'rb')
     mock_log_warning.assert_called_once_with(f"Could not decode JSON from checkpoint file {checkpoint_file}. Starting fresh.")
 
 @patch('os.path.exists', return_value=True)
@@ -78,8 +79,8 @@ def test_load_checkpoint_invalid_format(mock_log_warning, mock_file_open, mock_e
     checkpoint_file = "invalid_format_checkpoint.json"
     processed_urls = file_handler.load_checkpoint(checkpoint_file)
     assert processed_urls == set()
-    mock_exists.assert_called_once_with(checkpoint_file)
-    mock_file_open.assert_called_once_with(checkpoint_file, 'r', encoding='utf-8')
+    mock_exists.assert_any_call(checkpoint_file)
+    mock_file_open.assert_any_call(checkpoint_file, 'rb')
     mock_log_warning.assert_called_once_with(f"Checkpoint file {checkpoint_file} does not contain a valid list. Starting fresh.")
 
 
@@ -94,12 +95,11 @@ def test_save_checkpoint_new(mock_log_error, mock_file_open):
     file_handler.save_checkpoint(new_url, processed_urls, checkpoint_file)
 
     assert new_url in processed_urls # Check the set is updated in memory
-    mock_file_open.assert_called_once_with(checkpoint_file, 'w', encoding='utf-8')
+    mock_file_open.assert_called_once_with(checkpoint_file + constants.CHECKPOINT_LOG_SUFFIX, 'a', encoding='utf-8')
     handle = mock_file_open()
-    # Check that json.dump was called with the correct data (a list containing the new URL)
-    # json.dump writes multiple times, we check the final content structure
+    # Only the new URL is appended, as one JSON string per line
     written_content = "".join(call[0][0] for call in handle.write.call_args_list)
-    assert json.loads(written_content) == [new_url]
+    assert written_content == json.dumps(new_url) + "\n"
     mock_log_error.assert_not_called()
 
 
@@ -110,18 +110,16 @@ def test_save_checkpoint_append(mock_log_error, mock_file_open):
     checkpoint_file = "append_checkpoint.json"
     processed_urls = {"http://example.com/existing_page"}
     new_url = "http://example.com/another_page"
-    expected_saved_list = ["http://example.com/existing_page", "http://example.com/another_page"]
 
     file_handler.save_checkpoint(new_url, processed_urls, checkpoint_file)
 
     assert new_url in processed_urls
     assert "http://example.com/existing_page" in processed_urls
-    mock_file_open.assert_called_once_with(checkpoint_file, 'w', encoding='utf-8')
+    mock_file_open.assert_called_once_with(checkpoint_file + constants.CHECKPOINT_LOG_SUFFIX, 'a', encoding='utf-8')
     handle = mock_file_open()
     written_content = "".join(call[0][0] for call in handle.write.call_args_list)
-    # Order doesn't matter in the set, but json.dump(list(set)) might have arbitrary order
-    # So, we load the written JSON and compare sets
-    assert set(json.loads(written_content)) == set(expected_saved_list)
+    # The existing URL is not rewritten
+    assert written_content == json.dumps(new_url) + "\n"
     mock_log_error.assert_not_called()
 
 
@@ -136,8 +134,82 @@ def test_save_checkpoint_error(mock_log_error, mock_file_open):
 
     file_handler.save_checkpoint(new_url, processed_urls, checkpoint_file)
 
-    mock_file_open.assert_called_once_with(checkpoint_file, 'w', encoding='utf-8')
-    mock_log_error.assert_called_once_with(f"Error saving checkpoint file {checkpoint_file}: Disk full")
+    log_file = checkpoint_file + constants.CHECKPOINT_LOG_SUFFIX
+    mock_file_open.assert_called_once_with(log_file, 'a', encoding='utf-8')
+    mock_log_error.assert_called_once_with(f"Error saving checkpoint file {log_file}: Disk full")
+
+
+def test_checkpoint_round_trip(tmp_path):
+    """Tests that URLs appended to the log are loaded back together with the checkpoint file."""
+    checkpoint_file = str(tmp_path / "checkpoint.json")
+    with open(checkpoint_file, 'w', encoding='utf-8') as f:
+        json.dump(["http://example.com/old"], f)
+
+    processed_urls = file_handler.load_checkpoint(checkpoint_file)
+    file_handler.save_checkpoint("http://example.com/new", processed_urls, checkpoint_file)
+    file_handler.save_checkpoint("http://example.com/newer", processed_urls, checkpoint_file)
+    # Simulate a line truncated by an interrupted run
+    with open(checkpoint_file + constants.CHECKPOINT_LOG_SUFFIX, 'a', encoding='utf-8') as f:
+        f.write('"http://exa')
+
+    assert file_handler.load_checkpoint(checkpoint_file) == {
+        "http://example.com/old", "http://example.com/new", "http://example.com/newer"
+    }
+
+
+@patch('file_handler.os.fsync')
+def test_save_checkpoint_fsyncs_periodically(mock_fsync, tmp_path, monkeypatch):
+    """Tests that the checkpoint log is fsynced once per CHECKPOINT_FSYNC_EVERY appends."""
+    monkeypatch.setattr(constants, "CHECKPOINT_FSYNC_EVERY", 3)
+    monkeypatch.setattr(file_handler, "_checkpoint_unsynced", 0)
+    checkpoint_file = str(tmp_path / "checkpoint.json")
+    processed_urls = set()
+
+    for i in range(7):
+        file_handler.save_checkpoint(f"http://example.com/{i}", processed_urls, checkpoint_file)
+
+    assert mock_fsync.call_count == 2
+
+
+def test_save_checkpoint_keeps_log_open(tmp_path):
+    """Tests that the checkpoint log is opened once for many saves and closed by compaction."""
+    checkpoint_file = str(tmp_path / "checkpoint.json")
+    processed_urls = set()
+
+    with patch('builtins.open', wraps=open) as mock_file_open:
+        for i in range(3):
+            file_handler.save_checkpoint(f"http://example.com/{i}", processed_urls, checkpoint_file)
+    mock_file_open.assert_called_once_with(checkpoint_file + constants.CHECKPOINT_LOG_SUFFIX, 'a', encoding='utf-8')
+    # Every line is already visible to readers of the log
+    assert file_handler.load_checkpoint(checkpoint_file) == processed_urls
+
+    file_handler.compact_checkpoint(processed_urls, checkpoint_file)
+    assert file_handler._checkpoint_log is None
+
+
+def test_compact_checkpoint_folds_log_into_file(tmp_path):
+    """Tests that compaction rewrites the checkpoint file once and removes the log."""
+    checkpoint_file = str(tmp_path / "checkpoint.json")
+    log_file = checkpoint_file + constants.CHECKPOINT_LOG_SUFFIX
+    processed_urls = set()
+    file_handler.save_checkpoint("http://example.com/a", processed_urls, checkpoint_file)
+    file_handler.save_checkpoint("http://example.com/b", processed_urls, checkpoint_file)
+
+    assert file_handler.compact_checkpoint(processed_urls, checkpoint_file) is True
+
+    assert not os.path.exists(log_file)
+    assert not os.path.exists(checkpoint_file + ".tmp")
+    with open(checkpoint_file, 'r', encoding='utf-8') as f:
+        assert set(json.load(f)) == {"http://example.com/a", "http://example.com/b"}
+    assert file_handler.load_checkpoint(checkpoint_file) == processed_urls
+
+
+def test_compact_checkpoint_without_log_is_noop(tmp_path):
+    """Tests that nothing is rewritten when no URLs were appended since the last compaction."""
+    checkpoint_file = str(tmp_path / "checkpoint.json")
+
+    assert file_handler.compact_checkpoint({"http://example.com/a"}, checkpoint_file) is True
+    assert not os.path.exists(checkpoint_file)
 
 
 # --- Tests for _ensure_page_directory ---
@@ -153,11 +225,8 @@ def test_ensure_page_directory_root(mock_log_error, mock_makedirs, tmp_path):
     result_path = file_handler._ensure_page_directory(url, output_dir)
 
     assert result_path == expected_path
-    # Check that makedirs was called for the base output directory
-    mock_makedirs.assert_any_call(output_dir, exist_ok=True)
-    # It might be called multiple times depending on implementation details,
-    # ensure it was called at least for the final expected path.
-    assert any(call == ((expected_path,), {'exist_ok': True}) for call in mock_makedirs.call_args_list)
+    # The final path is created in one call (makedirs creates the parents)
+    mock_makedirs.assert_called_once_with(expected_path, exist_ok=True)
     mock_log_error.assert_not_called()
 
 
@@ -173,9 +242,8 @@ def test_ensure_page_directory_simple_path(mock_log_error, mock_makedirs, tmp_pa
     result_path = file_handler._ensure_page_directory(url, output_dir)
 
     assert result_path == expected_path # Function returns parent path
-    mock_makedirs.assert_any_call(output_dir, exist_ok=True)
     # Ensure the parent dir was created
-    mock_makedirs.assert_any_call(expected_path, exist_ok=True)
+    mock_makedirs.assert_called_once_with(expected_path, exist_ok=True)
     mock_log_error.assert_not_called()
 
 
@@ -193,10 +261,8 @@ def test_ensure_page_directory_nested_path(mock_log_error, mock_makedirs, tmp_pa
     result_path = file_handler._ensure_page_directory(url, output_dir)
 
     assert result_path == expected_path # Check it returns the parent directory path
-    mock_makedirs.assert_any_call(output_dir, exist_ok=True)
-    mock_makedirs.assert_any_call(path1, exist_ok=True)
-    # Ensure the parent dir was created by the loop
-    mock_makedirs.assert_any_call(expected_path, exist_ok=True)
+    # Ensure the parent dir (and with it output_dir and dir1) was created in one call
+    mock_makedirs.assert_called_once_with(expected_path, exist_ok=True)
     mock_log_error.assert_not_called()
 
 
@@ -216,10 +282,8 @@ def test_ensure_page_directory_sanitization(mock_log_error, mock_makedirs, tmp_p
     result_path = file_handler._ensure_page_directory(url, output_dir)
 
     assert result_path == expected_path # Function returns parent path
-    mock_makedirs.assert_any_call(output_dir, exist_ok=True)
-    mock_makedirs.assert_any_call(path1, exist_ok=True)
     # Ensure the parent dir was created
-    mock_makedirs.assert_any_call(expected_path, exist_ok=True)
+    mock_makedirs.assert_called_once_with(expected_path, exist_ok=True)
     mock_log_error.assert_not_called()
 
 
@@ -233,14 +297,45 @@ def test_ensure_page_directory_os_error(mock_log_error, mock_makedirs, tmp_path)
     result_path = file_handler._ensure_page_directory(url, output_dir)
 
     assert result_path is None
-    mock_makedirs.assert_any_call(output_dir, exist_ok=True) # First call might succeed
+    mock_makedirs.assert_called_once_with(output_dir, exist_ok=True)
     # Check that error was logged (the exact message might vary slightly)
     assert mock_log_error.call_count > 0
     assert "Error creating directory structure" in mock_log_error.call_args[0][0]
 
 
+@patch('os.makedirs')
+def test_ensure_page_directory_creates_each_directory_once(mock_makedirs, tmp_path):
+    """Tests that directories already created in this process are not created again."""
+    output_dir = str(tmp_path / "output")
+
+    file_handler._ensure_page_directory("http://example.com/docs/a", output_dir)
+    file_handler._ensure_page_directory("http://example.com/docs/b", output_dir)
+
+    mock_makedirs.assert_called_once_with(os.path.join(output_dir, "docs"), exist_ok=True)
+
+
+def test_ensure_page_directory_remembers_page(tmp_path):
+    """Tests that a page's directory is derived once and then looked up."""
+    output_dir = str(tmp_path / "output")
+    first = file_handler._ensure_page_directory("http://example.com/docs/a", output_dir)
+
+    with patch('file_handler.urlparse') as mock_urlparse:
+        second = file_handler._ensure_page_directory("http://example.com/docs/a", output_dir)
+
+    assert second == first == os.path.join(output_dir, "docs")
+    mock_urlparse.assert_not_called()
+
+
 # --- Tests for save_markdown ---
 
+def _fail_if_exists(existing_paths, mock_file_open):
+    """open() side effect for mode 'x': raise FileExistsError for paths that already exist."""
+    def side_effect(path, *args, **kwargs):
+        if path in existing_paths:
+            raise FileExistsError(path)
+        return mock_file_open.return_value
+    return side_effect
+
 # Helper fixture for common config
 @pytest.fixture
 def mock_config(tmp_path):
@@ -248,11 +343,10 @@ def mock_config(tmp_path):
 
 @patch('file_handler._ensure_page_directory')
 @patch('builtins.open', new_callable=mock_open)
-@patch('os.path.exists', return_value=False) # Assume no collision initially
 @patch('logging.info')
 @patch('logging.warning')
 @patch('logging.error')
-def test_save_markdown_success(mock_log_error, mock_log_warning, mock_log_info, mock_exists, mock_file_open, mock_ensure_dir, mock_config, tmp_path):
+def test_save_markdown_success(mock_log_error, mock_log_warning, mock_log_info, mock_file_open, mock_ensure_dir, mock_config, tmp_path):
     """Tests successful saving of a markdown file."""
     title = "Test Page Title"
     markdown_content = "This is the markdown content."
@@ -269,15 +363,17 @@ def test_save_markdown_success(mock_log_error, mock_log_warning, mock_log_info,
 
     assert result is True
     mock_ensure_dir.assert_called_once_with(original_url, mock_config['output_dir'])
-    mock_exists.assert_called_once_with(expected_full_path)
-    mock_file_open.assert_called_once_with(expected_full_path, 'w', encoding='utf-8')
+    mock_file_open.assert_called_once_with(expected_full_path, 'x', encoding='utf-8')
     handle = mock_file_open()
-    # Check content structure (basic check)
-    written_content = "".join(call[0][0] for call in handle.write.call_args_list)
-    assert f"# {title}" in written_content
-    assert f"_Source URL: {original_url}_" in written_content
-    assert f"_Archived Timestamp: 2023-01-01 12:00:00_" in written_content # Check formatted timestamp
-    assert markdown_content in written_content
+    # The whole document is written at once, header lines separated by real newlines
+    handle.write.assert_called_once()
+    written_content = handle.write.call_args[0][0]
+    assert written_content == (
+        f"# {title}\n\n"
+        f"_Source URL: {original_url}_\n"
+        f"_Archived Timestamp: 2023-01-01 12:00:00_\n\n" # Check formatted timestamp
+        f"{markdown_content}"
+    )
     mock_log_info.assert_called_once_with(f"Successfully saved: {expected_full_path}")
     mock_log_warning.assert_not_called()
     mock_log_error.assert_not_called()
@@ -308,9 +404,8 @@ def test_save_markdown_dir_creation_fails(mock_log_error, mock_log_warning, mock
 
 @patch('file_handler._ensure_page_directory')
 @patch('builtins.open', new_callable=mock_open)
-@patch('os.path.exists') # Need to control multiple calls
 @patch('logging.info')
-def test_save_markdown_filename_collision(mock_log_info, mock_exists, mock_file_open, mock_ensure_dir, mock_config, tmp_path):
+def test_save_markdown_filename_collision(mock_log_info, mock_file_open, mock_ensure_dir, mock_config, tmp_path):
     """Tests handling filename collisions."""
     title = "Collision Title"
     original_url = "http://example.com/collision"
@@ -322,25 +417,21 @@ def test_save_markdown_filename_collision(mock_log_info, mock_exists, mock_file_
     path3 = os.path.join(page_save_dir, f"{base_filename}-2.md")
 
     # Simulate first two exist, third one doesn't
-    mock_exists.side_effect = lambda p: p in [path1, path2]
+    mock_file_open.side_effect = _fail_if_exists([path1, path2], mock_file_open)
     valid_timestamp = "20240101000000" # Use a valid timestamp
 
     result = file_handler.save_markdown(title, "content", original_url, valid_timestamp, mock_config)
 
     assert result is True
-    assert mock_exists.call_count == 3 # Called for path1, path2, path3
-    mock_exists.assert_any_call(path1)
-    mock_exists.assert_any_call(path2)
-    mock_exists.assert_any_call(path3)
-    mock_file_open.assert_called_once_with(path3, 'w', encoding='utf-8') # Saved with -2 suffix
+    assert [c[0][0] for c in mock_file_open.call_args_list] == [path1, path2, path3]
+    mock_file_open.assert_called_with(path3, 'x', encoding='utf-8') # Saved with -2 suffix
     mock_log_info.assert_called_once_with(f"Successfully saved: {path3}")
 
 
 @patch('file_handler._ensure_page_directory')
 @patch('builtins.open', new_callable=mock_open)
-@patch('os.path.exists', return_value=False)
 @patch('logging.error')
-def test_save_markdown_write_error(mock_log_error, mock_exists, mock_file_open, mock_ensure_dir, mock_config, tmp_path):
+def test_save_markdown_write_error(mock_log_error, mock_file_open, mock_ensure_dir, mock_config, tmp_path):
     """Tests error handling during file writing."""
     title = "Write Error Page"
     original_url = "http://example.com/write_error"
@@ -358,17 +449,15 @@ def test_save_markdown_write_error(mock_log_error, mock_exists, mock_file_open,
 
     assert result is False
     mock_ensure_dir.assert_called_once()
-    mock_exists.assert_called_once_with(expected_full_path)
-    mock_file_open.assert_called_once_with(expected_full_path, 'w', encoding='utf-8')
+    mock_file_open.assert_called_once_with(expected_full_path, 'x', encoding='utf-8')
     mock_log_error.assert_called_once()
     assert f"Error writing file {expected_full_path}" in mock_log_error.call_args[0][0]
 
 
 @patch('file_handler._ensure_page_directory')
 @patch('builtins.open', new_callable=mock_open)
-@patch('os.path.exists', return_value=False)
 @patch('logging.info')
-def test_save_markdown_root_url(mock_log_info, mock_exists, mock_file_open, mock_ensure_dir, mock_config, tmp_path):
+def test_save_markdown_root_url(mock_log_info, mock_file_open, mock_ensure_dir, mock_config, tmp_path):
     """Tests saving markdown for a root URL (should use index filename)."""
     title = "Root Page" # Title is ignored for filename at root
     original_url = "http://example.com/"
@@ -382,20 +471,41 @@ def test_save_markdown_root_url(mock_log_info, mock_exists, mock_file_open, mock
 
     assert result is True
     mock_ensure_dir.assert_called_once_with(original_url, mock_config['output_dir'])
-    mock_exists.assert_called_once_with(expected_full_path)
-    mock_file_open.assert_called_once_with(expected_full_path, 'w', encoding='utf-8')
+    mock_file_open.assert_called_once_with(expected_full_path, 'x', encoding='utf-8')
     mock_log_info.assert_called_once_with(f"Successfully saved: {expected_full_path}")
 
 
+def test_save_markdown_same_title_twice(mock_config):
+    """Tests that a second page with the same title gets the next free name on disk."""
+    first_url, second_url = "http://example.com/docs/a", "http://example.com/docs/b"
+
+    assert file_handler.save_markdown("Same", "first", first_url, "20240101000000", mock_config) is True
+    assert file_handler.save_markdown("Same", "second", second_url, "20240101000000", mock_config) is True
+
+    docs_dir = os.path.join(mock_config['output_dir'], "docs")
+    assert sorted(os.listdir(docs_dir)) == ["Same-1.md", "Same.md"]
+    with open(os.path.join(docs_dir, "Same.md"), encoding='utf-8') as f:
+        assert f.read().endswith("first") # The existing file was not overwritten
+
+
+@patch('logging.error')
+def test_save_markdown_invalid_timestamp(mock_log_error, mock_config):
+    """Tests that an unparsable timestamp fails the save without leaving a file behind."""
+    result = file_handler.save_markdown("Bad Timestamp", "content", "http://example.com/bad", "2024-01-01", mock_config)
+
+    assert result is False
+    mock_log_error.assert_called_once()
+    assert not os.path.exists(os.path.join(mock_config['output_dir'], "Bad_Timestamp.md"))
+
+
 # --- Tests for save_html ---
 
 @patch('file_handler._ensure_page_directory')
 @patch('builtins.open', new_callable=mock_open)
-@patch('os.path.exists', return_value=False) # Assume no collision initially
 @patch('logging.info')
 @patch('logging.warning')
 @patch('logging.error')
-def test_save_html_success(mock_log_error, mock_log_warning, mock_log_info, mock_exists, mock_file_open, mock_ensure_dir, mock_config, tmp_path):
+def test_save_html_success(mock_log_error, mock_log_warning, mock_log_info, mock_file_open, mock_ensure_dir, mock_config, tmp_path):
     """Tests successful saving of an HTML file."""
     title = "Test HTML Page"
     html_content = "<html><body><h1>Test</h1></body></html>"
@@ -409,8 +519,7 @@ def test_save_html_success(mock_log_error, mock_log_warning, mock_log_info, mock
 
     assert result is True
     mock_ensure_dir.assert_called_once_with(original_url, mock_config['output_dir'])
-    mock_exists.assert_called_once_with(expected_full_path)
-    mock_file_open.assert_called_once_with(expected_full_path, 'w', encoding='utf-8')
+    mock_file_open.assert_called_once_with(expected_full_path, 'x', encoding='utf-8')
     handle = mock_file_open()
     handle.write.assert_called_once_with(html_content)
     mock_log_info.assert_called_once_with(f"Successfully saved original HTML: {expected_full_path}")
@@ -442,9 +551,8 @@ def test_save_html_dir_creation_fails(mock_log_error, mock_log_warning, mock_ens
 
 @patch('file_handler._ensure_page_directory')
 @patch('builtins.open', new_callable=mock_open)
-@patch('os.path.exists') # Need to control multiple calls
 @patch('logging.info')
-def test_save_html_filename_collision(mock_log_info, mock_exists, mock_file_open, mock_ensure_dir, mock_config, tmp_path):
+def test_save_html_filename_collision(mock_log_info, mock_file_open, mock_ensure_dir, mock_config, tmp_path):
     """Tests handling HTML filename collisions."""
     title = "HTML Collision"
     original_url = "http://example.com/collision.html"
@@ -455,24 +563,20 @@ def test_save_html_filename_collision(mock_log_info, mock_exists, mock_file_open
     path2 = os.path.join(page_save_dir, f"{base_filename}-1.html")
     path3 = os.path.join(page_save_dir, f"{base_filename}-2.html")
 
-    mock_exists.side_effect = lambda p: p in [path1, path2]
+    mock_file_open.side_effect = _fail_if_exists([path1, path2], mock_file_open)
 
     result = file_handler.save_html("content", title, original_url, mock_config)
 
     assert result is True
-    assert mock_exists.call_count == 3
-    mock_exists.assert_any_call(path1)
-    mock_exists.assert_any_call(path2)
-    mock_exists.assert_any_call(path3)
-    mock_file_open.assert_called_once_with(path3, 'w', encoding='utf-8')
+    assert [c[0][0] for c in mock_file_open.call_args_list] == [path1, path2, path3]
+    mock_file_open.assert_called_with(path3, 'x', encoding='utf-8')
     mock_log_info.assert_called_once_with(f"Successfully saved original HTML: {path3}")
 
 
 @patch('file_handler._ensure_page_directory')
 @patch('builtins.open', new_callable=mock_open)
-@patch('os.path.exists', return_value=False)
 @patch('logging.error')
-def test_save_html_write_error(mock_log_error, mock_exists, mock_file_open, mock_ensure_dir, mock_config, tmp_path):
+def test_save_html_write_error(mock_log_error, mock_file_open, mock_ensure_dir, mock_config, tmp_path):
     """Tests error handling during HTML file writing."""
     title = "HTML Write Error"
     original_url = "http://example.com/html_write_error"
@@ -487,17 +591,15 @@ def test_save_html_write_error(mock_log_error, mock_exists, mock_file_open, mock
 
     assert result is False
     mock_ensure_dir.assert_called_once()
-    mock_exists.assert_called_once_with(expected_full_path)
-    mock_file_open.assert_called_once_with(expected_full_path, 'w', encoding='utf-8')
+    mock_file_open.assert_called_once_with(expected_full_path, 'x', encoding='utf-8')
     mock_log_error.assert_called_once()
     assert f"Error writing HTML file {expected_full_path}" in mock_log_error.call_args[0][0]
 
 
 @patch('file_handler._ensure_page_directory')
 @patch('builtins.open', new_callable=mock_open)
-@patch('os.path.exists', return_value=False)
 @patch('logging.info')
-def test_save_html_root_url(mock_log_info, mock_exists, mock_file_open, mock_ensure_dir, mock_config, tmp_path):
+def test_save_html_root_url(mock_log_info, mock_file_open, mock_ensure_dir, mock_config, tmp_path):
     """Tests saving HTML for a root URL (should use index filename)."""
     title = "HTML Root Page" # Title ignored for filename
     original_url = "http://example.com/"
@@ -510,12 +612,11 @@ def test_save_html_root_url(mock_log_info, mock_exists, mock_file_open, mock_ens
 
     assert result is True
     mock_ensure_dir.assert_called_once_with(original_url, mock_config['output_dir'])
-    mock_exists.assert_called_once_with(expected_full_path)
-    mock_file_open.assert_called_once_with(expected_full_path, 'w', encoding='utf-8')
+    mock_file_open.assert_called_once_with(expected_full_path, 'x', encoding='utf-8')
     mock_log_info.assert_called_once_with(f"Successfully saved original HTML: {expected_full_path}")
 
 
-# --- Tests for save_asset ---
+# --- Tests for get_asset_save_path ---
 
 @pytest.mark.parametrize("asset_type, expected_subdir", [
     ('js', constants.JS_DIR_NAME),
@@ -525,15 +626,12 @@ def test_save_html_root_url(mock_log_info, mock_exists, mock_file_open, mock_ens
     ('font', constants.UNKNOWN_ASSET_DIR_NAME), # Example of another unknown type
 ])
 @patch('file_handler._ensure_page_directory')
-@patch('os.makedirs') # Mock makedirs called within save_asset
-@patch('builtins.open', new_callable=mock_open)
+@patch('os.makedirs') # Mock makedirs called for the asset subdirectory
 @patch('os.path.exists', return_value=False) # Assume no collision initially
-@patch('logging.info')
 @patch('logging.warning')
 @patch('logging.error')
-def test_save_asset_success(mock_log_error, mock_log_warning, mock_log_info, mock_exists, mock_file_open, mock_os_makedirs, mock_ensure_page_dir, asset_type, expected_subdir, mock_config, tmp_path):
-    """Tests successful saving of different asset types."""
-    asset_content = b"binary asset content"
+def test_get_asset_save_path_success(mock_log_error, mock_log_warning, mock_exists, mock_os_makedirs, mock_ensure_page_dir, asset_type, expected_subdir, mock_config, tmp_path):
+    """Tests the save path chosen for different asset types."""
     asset_url = f"http://example.com/assets/style.{asset_type if asset_type in ['js', 'css', 'img'] else 'bin'}" # Give a plausible extension
     original_page_url = "http://example.com/page"
     page_save_dir = str(tmp_path / "output" / "page") # Parent dir
@@ -543,17 +641,13 @@ def test_save_asset_success(mock_log_error, mock_log_warning, mock_log_info, moc
     expected_filename = f"style.{asset_type if asset_type in ['js', 'css', 'img'] else 'bin'}"
     expected_full_path = os.path.join(expected_asset_dir, expected_filename)
 
-    result_path = file_handler.save_asset(asset_content, asset_url, original_page_url, mock_config, asset_type)
+    result_path = file_handler.get_asset_save_path(asset_url, original_page_url, mock_config, asset_type)
 
     assert result_path == expected_full_path
     mock_ensure_page_dir.assert_called_once_with(original_page_url, mock_config['output_dir'])
     # Check that makedirs was called for the specific asset subdirectory
     mock_os_makedirs.assert_called_with(expected_asset_dir, exist_ok=True)
     mock_exists.assert_called_once_with(expected_full_path)
-    mock_file_open.assert_called_once_with(expected_full_path, 'wb') # Binary mode
-    handle = mock_file_open()
-    handle.write.assert_called_once_with(asset_content)
-    mock_log_info.assert_called_once_with(f"Successfully saved asset: {expected_full_path}")
     if asset_type not in ['js', 'css', 'img']:
          mock_log_warning.assert_called_once_with(f"Unknown asset type '{asset_type}' for {asset_url}. Saving in '{constants.UNKNOWN_ASSET_DIR_NAME}'.")
     else:
@@ -561,30 +655,19 @@ def test_save_asset_success(mock_log_error, mock_log_warning, mock_log_info, moc
     mock_log_error.assert_not_called()
 
 
-@patch('logging.warning')
-def test_save_asset_empty_content(mock_log_warning, mock_config):
-    """Tests skipping save when asset content is empty."""
-    result = file_handler.save_asset(b"", "http://example.com/asset.js", "page_url", mock_config, "js")
-    assert result is None
-    mock_log_warning.assert_called_once()
-    assert "Skipping save for asset" in mock_log_warning.call_args[0][0]
-
-
 @patch('file_handler._ensure_page_directory', return_value=None)
-@patch('logging.warning')
 @patch('logging.error') # _ensure_page_directory logs error
-def test_save_asset_page_dir_fails(mock_log_error, mock_log_warning, mock_ensure_page_dir, mock_config):
+def test_get_asset_save_path_page_dir_fails(mock_log_error, mock_ensure_page_dir, mock_config):
     """Tests failure when the page directory cannot be ensured."""
-    result = file_handler.save_asset(b"content", "asset_url", "page_url", mock_config, "css")
+    result = file_handler.get_asset_save_path("asset_url", "page_url", mock_config, "css")
     assert result is None
     mock_ensure_page_dir.assert_called_once()
-    mock_log_warning.assert_not_called() # Warning is for empty content
 
 
 @patch('file_handler._ensure_page_directory')
 @patch('os.makedirs', side_effect=OSError("Cannot create asset dir"))
 @patch('logging.error')
-def test_save_asset_asset_dir_fails(mock_log_error, mock_os_makedirs, mock_ensure_page_dir, mock_config, tmp_path):
+def test_get_asset_save_path_asset_dir_fails(mock_log_error, mock_os_makedirs, mock_ensure_page_dir, mock_config, tmp_path):
     """Tests failure when the asset type subdirectory cannot be created."""
     asset_url = "http://example.com/assets/image.png"
     original_page_url = "http://example.com/gallery"
@@ -592,7 +675,7 @@ def test_save_asset_asset_dir_fails(mock_log_error, mock_os_makedirs, mock_ensur
     mock_ensure_page_dir.return_value = page_save_dir
     expected_asset_dir = os.path.join(page_save_dir, constants.ASSETS_DIR_NAME, constants.IMG_DIR_NAME)
 
-    result = file_handler.save_asset(b"content", asset_url, original_page_url, mock_config, "img")
+    result = file_handler.get_asset_save_path(asset_url, original_page_url, mock_config, "img")
 
     assert result is None
     mock_ensure_page_dir.assert_called_once()
@@ -603,18 +686,14 @@ def test_save_asset_asset_dir_fails(mock_log_error, mock_os_makedirs, mock_ensur
 
 @patch('file_handler._ensure_page_directory')
 @patch('os.makedirs')
-@patch('builtins.open', new_callable=mock_open)
 @patch('os.path.exists')
-@patch('logging.info')
-def test_save_asset_collision(mock_log_info, mock_exists, mock_file_open, mock_os_makedirs, mock_ensure_page_dir, mock_config, tmp_path):
+def test_get_asset_save_path_collision(mock_exists, mock_os_makedirs, mock_ensure_page_dir, mock_config, tmp_path):
     """Tests asset filename collision handling."""
-    asset_content = b"collision content"
     asset_url = "http://example.com/assets/script.js"
     original_page_url = "http://example.com/page"
     page_save_dir = str(tmp_path / "output" / "page")
     mock_ensure_page_dir.return_value = page_save_dir
     asset_save_dir = os.path.join(page_save_dir, constants.ASSETS_DIR_NAME, constants.JS_DIR_NAME)
-    mock_os_makedirs.return_value = None # Simulate successful creation
 
     base_filename = "script"
     ext = ".js"
@@ -624,82 +703,95 @@ def test_save_asset_collision(mock_log_info, mock_exists, mock_file_open, mock_o
 
     mock_exists.side_effect = lambda p: p in [path1, path2]
 
-    result_path = file_handler.save_asset(asset_content, asset_url, original_page_url, mock_config, "js")
+    result_path = file_handler.get_asset_save_path(asset_url, original_page_url, mock_config, "js")
 
     assert result_path == path3
     assert mock_exists.call_count == 3
     mock_exists.assert_any_call(path1)
     mock_exists.assert_any_call(path2)
     mock_exists.assert_any_call(path3)
-    mock_file_open.assert_called_once_with(path3, 'wb')
-    mock_log_info.assert_called_once_with(f"Successfully saved asset: {path3}")
-
-
-@patch('file_handler._ensure_page_directory')
-@patch('os.makedirs')
-@patch('builtins.open', new_callable=mock_open)
-@patch('os.path.exists', return_value=False)
-@patch('logging.error')
-def test_save_asset_write_error(mock_log_error, mock_exists, mock_file_open, mock_os_makedirs, mock_ensure_page_dir, mock_config, tmp_path):
-    """Tests error handling during asset file writing."""
-    asset_url = "http://example.com/assets/data.bin"
-    original_page_url = "http://example.com/data_page"
-    page_save_dir = str(tmp_path / "output" / "data_page")
-    mock_ensure_page_dir.return_value = page_save_dir
-    asset_save_dir = os.path.join(page_save_dir, constants.ASSETS_DIR_NAME, constants.UNKNOWN_ASSET_DIR_NAME)
-    mock_os_makedirs.return_value = None
-    expected_filename = "data.bin"
-    expected_full_path = os.path.join(asset_save_dir, expected_filename)
-
-    mock_file_open.side_effect = OSError("Permission denied")
-
-    result = file_handler.save_asset(b"content", asset_url, original_page_url, mock_config, "bin")
-
-    assert result is None
-    mock_ensure_page_dir.assert_called_once()
-    mock_os_makedirs.assert_called_once_with(asset_save_dir, exist_ok=True)
-    mock_exists.assert_called_once_with(expected_full_path)
-    mock_file_open.assert_called_once_with(expected_full_path, 'wb')
-    mock_log_error.assert_called_once()
-    assert f"Error writing asset file {expected_full_path}" in mock_log_error.call_args[0][0]
 
 
 @patch('file_handler._ensure_page_directory')
 @patch('os.makedirs')
-@patch('builtins.open', new_callable=mock_open)
 @patch('os.path.exists', return_value=False)
-@patch('logging.info')
 @patch('logging.warning')
-def test_save_asset_no_filename_in_url(mock_log_warning, mock_log_info, mock_exists, mock_file_open, mock_os_makedirs, mock_ensure_page_dir, mock_config, tmp_path):
-    """Tests asset saving when the URL path doesn't provide a filename."""
-    asset_content = b"content"
+def test_get_asset_save_path_no_filename_in_url(mock_log_warning, mock_exists, mock_os_makedirs, mock_ensure_page_dir, mock_config, tmp_path):
+    """Tests the save path when the asset URL path doesn't provide a filename."""
     asset_url = "http://example.com/assets/generated/" # No filename part
     original_page_url = "http://example.com/page"
     page_save_dir = str(tmp_path / "output" / "page")
     mock_ensure_page_dir.return_value = page_save_dir
     asset_save_dir = os.path.join(page_save_dir, constants.ASSETS_DIR_NAME, constants.CSS_DIR_NAME)
-    mock_os_makedirs.return_value = None
 
-    # Expecting fallback filename structure
-    expected_fallback_base = constants.ASSET_FALLBACK_FILENAME_BASE
-    # The exact hash is hard to predict, so we check the structure
-    # Allow digits, hyphen (for negative hash), and potentially other word chars
-    expected_filename_pattern = rf"{expected_fallback_base}_-?\d+\.bin"
+    # Expecting fallback filename derived from a stable digest of the URL
+    expected_digest = hashlib.blake2b(asset_url.encode('utf-8'), digest_size=8).hexdigest()
+    expected_filename = f"{constants.ASSET_FALLBACK_FILENAME_BASE}_{expected_digest}.bin"
 
-    result_path = file_handler.save_asset(asset_content, asset_url, original_page_url, mock_config, "css")
-
-    assert result_path is not None
-    saved_filename = os.path.basename(result_path)
-    assert re.match(expected_filename_pattern, saved_filename), f"Filename '{saved_filename}' did not match pattern '{expected_filename_pattern}'"
-    assert result_path.startswith(asset_save_dir)
+    result_path = file_handler.get_asset_save_path(asset_url, original_page_url, mock_config, "css")
 
+    assert result_path == os.path.join(asset_save_dir, expected_filename)
     mock_ensure_page_dir.assert_called_once()
     mock_os_makedirs.assert_called_once_with(asset_save_dir, exist_ok=True)
     mock_exists.assert_called_once_with(result_path) # Check existence of the generated path
-    mock_file_open.assert_called_once_with(result_path, 'wb')
     mock_log_warning.assert_called_once() # Warning about fallback filename
     assert f"Could not derive filename from asset URL path: {asset_url}" in mock_log_warning.call_args[0][0]
-    mock_log_info.assert_called_once_with(f"Successfully saved asset: {result_path}")
+
+
+def test_get_asset_save_path_skips_reserved_paths(mock_config, tmp_path):
+    """Tests that paths handed out for pending downloads count as collisions."""
+    reserved_paths = set()
+
+    first = file_handler.get_asset_save_path("http://example.com/a/logo.png", "http://example.com/page", mock_config, "img", reserved_paths=reserved_paths)
+    second = file_handler.get_asset_save_path("http://example.com/b/logo.png", "http://example.com/page", mock_config, "img", reserved_paths=reserved_paths)
+
+    assert os.path.basename(first) == "logo.png"
+    assert os.path.basename(second) == "logo-1.png"
+    assert reserved_paths == {first, second}
+    assert not os.path.exists(first) # Only reserved, nothing written yet
+
+
+def test_link_saved_asset_hard_links_into_page_dir(mock_config):
+    """Tests that an asset saved for one page is hard linked into another page's asset directory."""
+    asset_url = "http://example.com/static/site.css"
+    existing_path = file_handler.get_asset_save_path(asset_url, "http://example.com/a/page", mock_config, "css")
+    with open(existing_path, 'wb') as f:
+        f.write(b"body{}")
+
+    linked_path = file_handler.link_saved_asset(existing_path, asset_url, "http://example.com/b/page", mock_config, "css")
+
+    assert linked_path != existing_path
+    assert linked_path.startswith(file_handler.get_page_save_dir("http://example.com/b/page", mock_config))
+    assert os.path.samefile(linked_path, existing_path)
+
+
+def test_link_saved_asset_same_page_dir_reuses_path(mock_config):
+    """Tests that no link is made when the asset already sits in the page's directory."""
+    asset_url = "http://example.com/static/site.css"
+    existing_path = file_handler.get_asset_save_path(asset_url, "http://example.com/a/one", mock_config, "css")
+
+    assert file_handler.link_saved_asset(existing_path, asset_url, "http://example.com/a/two", mock_config, "css") == existing_path
+
+
+@patch('file_handler.os.link', side_effect=OSError("Operation not permitted"))
+def test_link_saved_asset_falls_back_to_existing_copy(mock_link, mock_config):
+    """Tests that the existing copy is used when hard links are not supported."""
+    asset_url = "http://example.com/static/site.css"
+    existing_path = file_handler.get_asset_save_path(asset_url, "http://example.com/a/page", mock_config, "css")
+
+    assert file_handler.link_saved_asset(existing_path, asset_url, "http://example.com/b/page", mock_config, "css") == existing_path
+    mock_link.assert_called_once()
+
+
+def test_get_asset_save_path_uses_given_page_dir(mock_config, tmp_path):
+    """Tests that a precomputed page directory is used without re-deriving it from the URL."""
+    page_save_dir = file_handler.get_page_save_dir("http://example.com/docs/page", mock_config)
+
+    with patch('file_handler._ensure_page_directory') as mock_ensure_page_dir:
+        path = file_handler.get_asset_save_path("http://example.com/logo.png", "http://example.com/docs/page", mock_config, "img", page_save_dir=page_save_dir)
+
+    mock_ensure_page_dir.assert_not_called()
+    assert path == os.path.join(page_save_dir, constants.ASSETS_DIR_NAME, constants.IMG_DIR_NAME, "logo.png")
 
 # Need to import re for the last test
 # import re # Already imported at top
\ No newline at end of file
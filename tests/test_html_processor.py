@@ -3,6 +3,7 @@ import os
 import sys
 from unittest.mock import patch, MagicMock
 from bs4 import BeautifulSoup
+import soupsieve
 import logging # Import logging for patching getLogger
 
 # Add project root to sys.path to allow importing project modules
@@ -79,6 +80,18 @@ def test_find_main_content_soup(mock_log_warning, mock_log_debug, html_content,
         mock_log_debug.assert_not_called()
 
 
+@patch('html_processor.logger.warning') # Patch named logger
+def test_find_main_content_soup_precompiled_selectors(mock_log_warning):
+    """Tests that selectors precompiled by load_config are matched like their strings."""
+    soup = BeautifulSoup('<div><header>H</header><div class="post-body"><p>Body</p></div></div>', 'html.parser')
+
+    content_soup = html_processor._find_main_content_soup(soup, (soupsieve.compile('main'), soupsieve.compile('.post-body')), "http://example.com/test")
+    assert content_soup is not None and content_soup.get('class') == ['post-body']
+
+    assert html_processor._find_main_content_soup(soup, (soupsieve.compile('article'),), "http://example.com/test") is None
+    assert "Could not find main content using selectors ['article']" in mock_log_warning.call_args[0][0]
+
+
 # --- Tests for _convert_html_to_markdown ---
 
 @pytest.mark.parametrize("html_input, expected_markdown_contains", [
@@ -156,6 +169,17 @@ MOCK_CONFIG_ASSETS = {"target_domain": TARGET_DOMAIN}
      """,
      {'js': [], 'css': ["http://test.com/abs_style.css"], 'img': []}
     ),
+    # Scheme-relative and lookalike hosts, non-stylesheet links
+    ("""
+     <script src="//test.com/cdn.js"></script>
+     <script src="https://test.com.evil.org/x.js"></script>
+     <img src="//other.com/pixel.gif">
+     <img src="https://test.com:8080/port.png">
+     <link rel="icon" href="/favicon.ico">
+     <link rel="alternate stylesheet" href="/alt.css">
+     """,
+     {'js': ["http://test.com/cdn.js"], 'css': ["http://test.com/alt.css"], 'img': []}
+    ),
     # No assets
     ("<html><body><p>No assets here</p></body></html>", {'js': [], 'css': [], 'img': []}),
     # Empty HTML
@@ -306,6 +330,24 @@ def test_rewrite_asset_links_relpath_error(mock_log_info, mock_log_warning, mock
     mock_log_info.assert_not_called()
 
 
+@patch('os.path.relpath', wraps=os.path.relpath)
+def test_rewrite_asset_links_relpath_once_per_asset(mock_relpath):
+    """Tests that an asset referenced by several tags has its relative path computed once."""
+    html = '<div><img src="logo.png"><img src="/page/logo.png"><script src="app.js"></script></div>'
+    parent_soup = BeautifulSoup(html, 'html.parser').div
+    page_save_dir = os.path.join(os.sep, "output", "page")
+    saved_assets_map = {
+        "http://test.com/page/logo.png": os.path.join(page_save_dir, "assets", "img", "logo.png"),
+        "http://test.com/page/app.js": os.path.join(page_save_dir, "assets", "js", "app.js"),
+    }
+
+    html_processor._rewrite_asset_links(parent_soup, "http://test.com/page/", page_save_dir, saved_assets_map)
+
+    assert [img['src'] for img in parent_soup.find_all('img')] == ["assets/img/logo.png", "assets/img/logo.png"]
+    assert parent_soup.script['src'] == "assets/js/app.js"
+    assert mock_relpath.call_count == 2
+
+
 def test_rewrite_asset_links_no_map_or_dir():
     """Tests that the function returns original soup if map or dir is missing."""
     html = '<script src="script.js"></script>'
@@ -440,4 +482,70 @@ def test_extract_and_convert_empty_html():
     assert markdown is None
 
 # Need to import re for the last test in file_handler tests (already present)
-# import re # No longer needed here as it's imported in test_file_handler.py
\ No newline at end of file
+# import re # No longer needed here as it's imported in test_file_handler.py
+
+def test_extract_and_convert_content_accepts_bytes():
+    """Tests that raw UTF-8 bytes (e.g. response.content) are parsed like the decoded text."""
+    html = "<html><head><title>Příliš žluťoučký kůň</title></head><body><main><p>Úpěl ďábelské ódy</p></main></body></html>"
+    config = {'content_selectors': ['main'], 'rewrite_asset_links': False}
+
+    from_text = html_processor.extract_and_convert_content(html, "http://example.com/page", config, {})
+    from_bytes = html_processor.extract_and_convert_content(html.encode('utf-8'), "http://example.com/page", config, {})
+
+    assert from_bytes == from_text
+    assert from_bytes[0] == "Příliš žluťoučký kůň"
+
+
+@pytest.mark.parametrize("config, expected_parser", [
+    ({}, html_processor.DEFAULT_HTML_PARSER), # Automatic choice
+    ({'html_parser': 'html.parser'}, 'html.parser'), # Explicit override
+])
+def test_find_assets_uses_configured_parser(config, expected_parser):
+    """Tests that the configured BeautifulSoup parser is used for asset discovery."""
+    with patch('html_processor.BeautifulSoup', wraps=BeautifulSoup) as mock_bs:
+        html_processor.find_assets("<html><body><img src='/a.png'></body></html>", "http://example.com/", config)
+    assert mock_bs.call_args[0][1] == expected_parser
+
+
+def test_find_assets_parses_only_asset_tags():
+    """Tests that asset discovery builds only script/link/img tags."""
+    html = "<html><body><div><p>Text</p><img src='/a.png'></div><script src='/b.js'></script></body></html>"
+    with patch('html_processor.BeautifulSoup', wraps=BeautifulSoup) as mock_bs:
+        found = html_processor.find_assets(html, "http://example.com/", {})
+    assert mock_bs.call_args[1]['parse_only'] is html_processor._ASSET_STRAINER
+    assert found['img'] == ["http://example.com/a.png"]
+    assert found['js'] == ["http://example.com/b.js"]
+
+
+def test_parsed_page_is_shared_between_passes():
+    """Tests that a tree from parse_html is used by both passes without parsing again."""
+    html = "<html><head><title>Shared</title><script src='/app.js'></script></head><body><main><p>Body <img src='/a.png'></p></main></body></html>"
+    config = {'content_selectors': ['main'], 'rewrite_asset_links': True}
+    page = html_processor.parse_html(html, config)
+    saved_assets_map = {"http://example.com/a.png": os.path.join("out", "page", "_assets", "img", "a.png")}
+
+    with patch('html_processor.BeautifulSoup', wraps=BeautifulSoup) as mock_bs:
+        found = html_processor.find_assets(page, "http://example.com/page", config)
+        title, markdown = html_processor.extract_and_convert_content(page, "http://example.com/page", config, saved_assets_map, page_save_dir=os.path.join("out", "page"))
+
+    mock_bs.assert_not_called()
+    assert found['js'] == ["http://example.com/app.js"]
+    assert found['img'] == ["http://example.com/a.png"]
+    assert title == "Shared"
+    assert "_assets/img/a.png" in markdown
+
+
+def test_asset_urls_resolved_once_across_passes():
+    """Tests that link rewriting reuses the URL joins done by asset discovery."""
+    html = "<html><body><main><img src='logo.png'></main></body></html>"
+    page_url = "http://example.com/page/"
+    page_save_dir = os.path.join(os.sep, "output", "page")
+    html_processor._join_url.cache_clear()
+
+    found = html_processor.find_assets(html, page_url, {})
+    soup = BeautifulSoup(html, 'html.parser')
+    html_processor._rewrite_asset_links(soup.main, page_url, page_save_dir, {found['img'][0]: os.path.join(page_save_dir, "logo.png")})
+
+    assert soup.img['src'] == "logo.png"
+    cache_info = html_processor._join_url.cache_info()
+    assert (cache_info.misses, cache_info.hits) == (1, 1)
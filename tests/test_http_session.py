@@ -0,0 +1,68 @@
+# tests/test_http_session.py
+
+import pytest
+import requests
+from unittest.mock import MagicMock, patch
+from requests.adapters import HTTPAdapter
+
+# Module to test
+from api_clients import http_session
+import constants
+
+@pytest.fixture(autouse=True)
+def reset_session():
+    """Ensures each test starts (and ends) without a cached session."""
+    http_session.close_session()
+    yield
+    http_session.close_session()
+
+
+def test_get_session_reuses_instance():
+    """Test that repeated calls return the same pooled session."""
+    session1 = http_session.get_session()
+    session2 = http_session.get_session()
+    assert isinstance(session1, requests.Session)
+    assert session1 is session2
+
+
+def test_get_session_mounts_pooled_adapter():
+    """Test that both schemes use an HTTPAdapter sized from constants."""
+    session = http_session.get_session()
+    for prefix in ('http://', 'https://'):
+        adapter = session.get_adapter(prefix + 'web.archive.org')
+        assert isinstance(adapter, HTTPAdapter)
+        assert adapter._pool_connections == constants.HTTP_POOL_CONNECTIONS
+        assert adapter._pool_maxsize == constants.HTTP_POOL_MAXSIZE
+
+
+def test_get_session_sets_user_agent():
+    """Test that the User-Agent header is set once on the session."""
+    session = http_session.get_session('Agent/1.0')
+    assert session.headers['User-Agent'] == 'Agent/1.0'
+    # A call without a user agent keeps the existing header
+    assert http_session.get_session().headers['User-Agent'] == 'Agent/1.0'
+    # A different user agent replaces it
+    assert http_session.get_session('Agent/2.0').headers['User-Agent'] == 'Agent/2.0'
+
+
+def test_close_session_discards_instance():
+    """Test that close_session forces a fresh session on the next call."""
+    session1 = http_session.get_session()
+    http_session.close_session()
+    session2 = http_session.get_session()
+    assert session1 is not session2
+
+
+def test_rate_limited_adapter_acquires_and_pauses_on_retry_after():
+    """Test that each request takes a token for its host and a 429 Retry-After pauses the host."""
+    limiter = MagicMock()
+    adapter = http_session.RateLimitedAdapter(limiter)
+    request = requests.Request('GET', 'https://web.archive.org/web/2023id_/http://example.com/').prepare()
+    throttled = MagicMock(status_code=429, headers={'Retry-After': '12'})
+
+    with patch.object(HTTPAdapter, 'send', return_value=throttled) as mock_send:
+        assert adapter.send(request, timeout=5) is throttled
+
+    mock_send.assert_called_once_with(request, timeout=5)
+    limiter.acquire.assert_called_once_with('web.archive.org')
+    limiter.pause.assert_called_once_with('web.archive.org', 12)
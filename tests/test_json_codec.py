@@ -0,0 +1,44 @@
+# tests/test_json_codec.py
+
+import json
+import pytest
+
+# Module to test
+from api_clients import json_codec
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_loads_bytes(use_orjson, monkeypatch):
+    """Test that bytes are decoded with and without orjson available."""
+    if use_orjson and json_codec.orjson is None:
+        pytest.skip("orjson not installed")
+    if not use_orjson:
+        monkeypatch.setattr(json_codec, "orjson", None)
+
+    assert json_codec.loads(b'[["http://example.com/", "20200101000000"]]') == [["http://example.com/", "20200101000000"]]
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_loads_invalid_raises_json_decode_error(use_orjson, monkeypatch):
+    """Test that malformed input raises json.JSONDecodeError (or a subclass) either way."""
+    if use_orjson and json_codec.orjson is None:
+        pytest.skip("orjson not installed")
+    if not use_orjson:
+        monkeypatch.setattr(json_codec, "orjson", None)
+
+    with pytest.raises(json.JSONDecodeError):
+        json_codec.loads(b"This is not JSON")
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps_compact_utf8_bytes(use_orjson, monkeypatch):
+    """Test that dumps returns compact UTF-8 JSON bytes with and without orjson available."""
+    if use_orjson and json_codec.orjson is None:
+        pytest.skip("orjson not installed")
+    if not use_orjson:
+        monkeypatch.setattr(json_codec, "orjson", None)
+
+    encoded = json_codec.dumps(["http://example.com/a", "http://example.com/ž"])
+
+    assert encoded == '["http://example.com/a","http://example.com/ž"]'.encode('utf-8')
+    assert json_codec.loads(encoded) == ["http://example.com/a", "http://example.com/ž"]
@@ -0,0 +1,245 @@
+# tests/test_main.py
+
+import os
+import threading
+import pytest
+from unittest.mock import patch
+
+# Module to test
+import main
+
+PAGE_HTML = """<html><head><title>{title}</title></head><body><main>
+<p>{title} body</p>{images}
+</main></body></html>"""
+
+
+# --- Fixtures ---
+
+@pytest.fixture
+def page_config(tmp_path):
+    """Provides a config for process_page that downloads images into tmp_path."""
+    return {
+        'target_domain': 'example.com',
+        'output_dir': str(tmp_path / "output"),
+        'checkpoint_file': str(tmp_path / "checkpoint.json"),
+        'content_selectors': ['main'],
+        'download_js': False,
+        'download_css': False,
+        'download_images': True,
+        'save_original_html': False,
+        'rewrite_asset_links': True,
+        'reuse_downloaded_assets': True,
+    }
+
+@pytest.fixture(autouse=True)
+def reset_reserved_asset_paths():
+    """Don't carry asset paths reserved (or downloads claimed) by one test's pages over to the next test."""
+    main._reserved_asset_paths.clear()
+    main._pending_assets.clear()
+    yield
+    main._reserved_asset_paths.clear()
+    main._pending_assets.clear()
+
+def _page(title, *image_srcs):
+    """Builds a page whose content area references the given images."""
+    return PAGE_HTML.format(title=title, images="".join(f'<img src="{src}">' for src in image_srcs))
+
+def _write_assets(assets, timestamp, config):
+    """Stands in for fetch_assets_batch: 'downloads' every asset straight to its path."""
+    for asset_url, dest_path in assets.items():
+        with open(dest_path, 'wb') as f:
+            f.write(asset_url.encode('utf-8'))
+    return dict(assets)
+
+
+# --- Tests for process_page ---
+
+@patch('main.fetch_assets_batch', side_effect=_write_assets)
+@patch('main.fetch_page_content')
+def test_process_page_reserves_distinct_asset_paths(mock_fetch_page, mock_fetch_assets, page_config):
+    """Tests that two assets with the same file name on one page get different paths."""
+    mock_fetch_page.return_value = _page("Gallery", "/a/logo.png", "/b/logo.png")
+    downloaded_assets = {}
+
+    result = main.process_page("http://example.com/gallery", "20230101000000", 1, 1, page_config, set(), downloaded_assets)
+
+    assert result == main.PAGE_SAVED
+    assets = mock_fetch_assets.call_args[0][0]
+    assert set(assets) == {"http://example.com/a/logo.png", "http://example.com/b/logo.png"}
+    assert len(set(assets.values())) == 2 # Picked before either file existed, yet not the same path
+    assert main._reserved_asset_paths == set(assets.values())
+    assert downloaded_assets == {(asset_url, "20230101"): path for asset_url, path in assets.items()}
+    assert main._pending_assets == {} # Every claimed download was released
+
+
+@patch('main.fetch_assets_batch', side_effect=_write_assets)
+@patch('main.fetch_page_content')
+def test_process_page_hard_links_asset_downloaded_for_earlier_page(mock_fetch_page, mock_fetch_assets, page_config):
+    """Tests that an asset already saved for one page is linked, not fetched again, for the next."""
+    mock_fetch_page.side_effect = [_page("First", "/logo.png"), _page("Second", "/logo.png")]
+    downloaded_assets = {}
+
+    assert main.process_page("http://example.com/blog/first", "20230101000000", 1, 2, page_config, set(), downloaded_assets) == main.PAGE_SAVED
+    assert main.process_page("http://example.com/news/second", "20230101000000", 2, 2, page_config, set(), downloaded_assets) == main.PAGE_SAVED
+
+    assert mock_fetch_assets.call_count == 2
+    assert mock_fetch_assets.call_args_list[1][0][0] == {} # Nothing left to download for the second page
+    first_copy = downloaded_assets[("http://example.com/logo.png", "20230101")]
+    second_dir = os.path.join(page_config['output_dir'], "news") # Pages are saved in their parent path's directory
+    second_copy = [os.path.join(root, name) for root, _, names in os.walk(second_dir) for name in names if name == "logo.png"]
+    assert len(second_copy) == 1
+    assert os.path.samefile(first_copy, second_copy[0]) # Hard link to the first page's copy
+    with open(os.path.join(second_dir, "Second.md"), encoding='utf-8') as f:
+        assert "logo.png" in f.read()
+
+
+@patch('main.fetch_assets_batch')
+@patch('main.fetch_page_content')
+def test_process_page_waits_for_asset_another_page_is_downloading(mock_fetch_page, mock_fetch_assets, page_config):
+    """Tests that a page whose asset is mid-download for another page links that copy instead of fetching it too."""
+    mock_fetch_page.side_effect = lambda url, *args, **kwargs: _page(url.rsplit("/", 1)[-1].title(), "/logo.png")
+    first_started, release_first = threading.Event(), threading.Event()
+    def fetch_assets(assets, timestamp, config):
+        if assets:
+            first_started.set()
+            release_first.wait(5) # Still downloading while the second page runs
+        else:
+            release_first.set() # Second page has already decided not to fetch the logo
+        return _write_assets(assets, timestamp, config)
+    mock_fetch_assets.side_effect = fetch_assets
+    downloaded_assets = {}
+
+    first = threading.Thread(target=main.process_page, args=("http://example.com/blog/first", "20230101000000", 1, 2, page_config, set(), downloaded_assets))
+    first.start()
+    try:
+        assert first_started.wait(5)
+        second = threading.Thread(target=main.process_page, args=("http://example.com/news/second", "20230101120000", 2, 2, page_config, set(), downloaded_assets))
+        second.start()
+        second.join(5)
+    finally:
+        release_first.set()
+    first.join(5)
+
+    assert sorted(len(call[0][0]) for call in mock_fetch_assets.call_args_list) == [0, 1] # Downloaded once
+    second_dir = os.path.join(page_config['output_dir'], "news")
+    with open(os.path.join(second_dir, "Second.md"), encoding='utf-8') as f:
+        assert "logo.png" in f.read()
+
+
+@patch('main.fetch_assets_batch', side_effect=_write_assets)
+@patch('main.fetch_page_content')
+def test_process_page_downloads_asset_again_for_other_snapshot_day(mock_fetch_page, mock_fetch_assets, page_config):
+    """Tests that a copy saved for one snapshot day is not reused for a page captured on another day."""
+    mock_fetch_page.side_effect = [_page("First", "/logo.png"), _page("Second", "/logo.png")]
+    downloaded_assets = {}
+
+    assert main.process_page("http://example.com/blog/first", "20230101000000", 1, 2, page_config, set(), downloaded_assets) == main.PAGE_SAVED
+    assert main.process_page("http://example.com/news/second", "20240601000000", 2, 2, page_config, set(), downloaded_assets) == main.PAGE_SAVED
+
+    assert list(mock_fetch_assets.call_args_list[1][0][0]) == ["http://example.com/logo.png"] # Fetched again
+    assert set(downloaded_assets) == {("http://example.com/logo.png", "20230101"), ("http://example.com/logo.png", "20240601")}
+
+
+@patch('main.fetch_assets_batch')
+@patch('main.fetch_page_content')
+def test_process_page_releases_claim_on_failed_asset(mock_fetch_page, mock_fetch_assets, page_config):
+    """Tests that an asset whose download failed is not offered for reuse, so a later page tries it again."""
+    mock_fetch_page.side_effect = [_page("First", "/logo.png"), _page("Second", "/logo.png")]
+    mock_fetch_assets.side_effect = [{"http://example.com/logo.png": None}, {}]
+    downloaded_assets = {}
+
+    main.process_page("http://example.com/blog/first", "20230101000000", 1, 2, page_config, set(), downloaded_assets)
+    assert downloaded_assets == {}
+    assert main._pending_assets == {}
+
+    main.process_page("http://example.com/news/second", "20230101000000", 2, 2, page_config, set(), downloaded_assets)
+    assert list(mock_fetch_assets.call_args_list[1][0][0]) == ["http://example.com/logo.png"]
+
+
+@patch('main.fetch_assets_batch')
+@patch('main.fetch_page_content', return_value=None)
+def test_process_page_not_fetched(mock_fetch_page, mock_fetch_assets, page_config):
+    """Tests that a page Wayback did not serve is reported for the Memento fallback."""
+    processed_urls = set()
+
+    result = main.process_page("http://example.com/gone", "20230101000000", 1, 1, page_config, processed_urls, {})
+
+    assert result == main.PAGE_NOT_FETCHED
+    mock_fetch_assets.assert_not_called()
+    assert processed_urls == set()
+
+
+# --- Tests for main ---
+
+@pytest.fixture
+def main_config(tmp_path):
+    """Provides the config main() reads, with everything after the CDX fetch mocked out."""
+    return {
+        'target_domain': 'example.com',
+        'log_file': str(tmp_path / "scraping.log"),
+        'checkpoint_file': str(tmp_path / "checkpoint.json"),
+        'max_requests_per_second': 0,
+        'max_retry_delay_seconds': 30,
+        'page_workers': 1,
+        'parse_workers': 0,
+    }
+
+@pytest.fixture
+def run_main(main_config):
+    """Runs main() over the given snapshots with config, logging, CDX and checkpointing mocked."""
+    def run(snapshots):
+        with patch('main.load_config', return_value=main_config), \
+             patch('main.setup_logging'), \
+             patch('main.configure_rate_limit'), \
+             patch('main.fetch_cdx_index', return_value=[["placeholder"]]), \
+             patch('main.process_cdx_data', return_value=snapshots), \
+             patch('main.load_checkpoint', return_value=set()), \
+             patch('main.compact_checkpoint'), \
+             patch('main.atexit.register'):
+            main.main()
+    return run
+
+
+@patch('main.fetch_and_process_memento_content', return_value=True)
+@patch('main.fetch_mementos_batch')
+@patch('main.process_page')
+def test_main_batches_memento_fallback(mock_process_page, mock_fetch_mementos, mock_fetch_memento_content, run_main):
+    """Tests that pages Wayback did not serve are looked up in one Memento batch after the main loop."""
+    snapshots = {
+        "http://example.com/a": "20230101000000",
+        "http://example.com/b": "20230202000000",
+        "http://example.com/c": "20230303000000",
+    }
+    outcomes = {"http://example.com/a": main.PAGE_NOT_FETCHED, "http://example.com/b": main.PAGE_SAVED, "http://example.com/c": main.PAGE_NOT_FETCHED}
+    mock_process_page.side_effect = lambda url, *args: outcomes[url]
+    mock_fetch_mementos.return_value = {"http://example.com/a": "http://memento.example.org/a", "http://example.com/c": None}
+
+    run_main(snapshots)
+
+    mock_fetch_mementos.assert_called_once()
+    assert mock_fetch_mementos.call_args[0][0] == {"http://example.com/a": "20230101000000", "http://example.com/c": "20230303000000"}
+    mock_fetch_memento_content.assert_called_once()
+    assert mock_fetch_memento_content.call_args[0][:2] == ("http://memento.example.org/a", "http://example.com/a")
+
+
+@patch('main.fetch_mementos_batch')
+@patch('main.process_page')
+def test_main_interrupt_cancels_pending_pages(mock_process_page, mock_fetch_mementos, run_main):
+    """Tests that Ctrl+C stops queued pages from being fetched instead of draining the queue."""
+    snapshots = {f"http://example.com/p{i:02d}": "20230101000000" for i in range(20)}
+    release = threading.Event()
+    def interrupted_page(url, *args):
+        if url == "http://example.com/p00":
+            raise KeyboardInterrupt
+        release.wait(5) # Keep the worker busy until main() has reacted to the interrupt
+        return main.PAGE_SAVED
+    mock_process_page.side_effect = interrupted_page
+
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            run_main(snapshots)
+    finally:
+        release.set()
+
+    assert mock_process_page.call_count <= 2 # The interrupted page, plus at most one that had already started
+    mock_fetch_mementos.assert_not_called()
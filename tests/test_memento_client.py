@@ -4,6 +4,7 @@ import pytest
 import requests
 import logging
 import json
+import time
 from datetime import datetime
 from unittest.mock import MagicMock, patch, PropertyMock
 
@@ -32,17 +33,13 @@ def mock_config():
     }
 
 @pytest.fixture
-def mock_response():
+def mock_response(make_mock_response):
     """Creates a reusable MagicMock for requests.Response."""
-    response = MagicMock(spec=requests.Response)
-    response.status_code = 200
+    response = make_mock_response()
     response.content = b"Sample content"
     response.text = "Sample text"
     response.encoding = 'utf-8'
-    response.url = "http://mocked.url"
     response.json = MagicMock() # Mock json method
-    response.close = MagicMock()
-    response.raise_for_status = MagicMock()
     return response
 
 @pytest.fixture
@@ -52,19 +49,20 @@ def mock_processed_urls_set():
 
 # --- Tests for fetch_memento_snapshot ---
 
-@patch('api_clients.memento_client.requests.get')
-def test_fetch_memento_snapshot_success_with_wayback_ts(mock_get, mock_config, mock_response, caplog):
+@patch('api_clients.memento_client.get_session')
+def test_fetch_memento_snapshot_success_with_wayback_ts(mock_get_session, mock_config, mock_response, caplog):
     """Test successful Memento snapshot retrieval using Wayback timestamp."""
+    mock_get = mock_get_session.return_value.get
     original_url = "http://example.com/page"
     wayback_timestamp = "20230101120000"
     expected_memento_uri = "http://memento.example.org/snap/1"
-    mock_response.json.return_value = {
+    mock_response.content = json.dumps({
         "mementos": {
             "closest": {
                 "uri": [expected_memento_uri]
             }
         }
-    }
+    }).encode()
     mock_get.return_value = mock_response
     expected_api_url = f"{constants.MEMENTO_API_BASE_URL}{wayback_timestamp}/{original_url}"
 
@@ -72,32 +70,32 @@ def test_fetch_memento_snapshot_success_with_wayback_ts(mock_get, mock_config, m
         memento_uri = memento_client.fetch_memento_snapshot(original_url, config=mock_config, wayback_timestamp=wayback_timestamp)
 
     assert memento_uri == expected_memento_uri
+    mock_get_session.assert_called_once_with(mock_config['user_agent']) # User-Agent set on the shared session
     mock_get.assert_called_once_with(
         expected_api_url,
-        headers={'User-Agent': mock_config['user_agent']},
         timeout=mock_config['request_timeout_api']
     )
     assert f"Querying Memento API: {expected_api_url}" in caplog.text
     assert f"Found potential Memento URI: {expected_memento_uri}" in caplog.text
     mock_response.close.assert_called_once()
-    mock_response.json.assert_called_once()
 
-@patch('api_clients.memento_client.requests.get')
-@patch('api_clients.memento_client.datetime')
-def test_fetch_memento_snapshot_success_without_wayback_ts(mock_datetime, mock_get, mock_config, mock_response, caplog):
-    """Test successful Memento snapshot retrieval using current time."""
+@patch('api_clients.memento_client.get_session')
+@patch('api_clients.memento_client.time.gmtime')
+def test_fetch_memento_snapshot_success_without_wayback_ts(mock_gmtime, mock_get_session, mock_config, mock_response, caplog):
+    """Test successful Memento snapshot retrieval using current (UTC) time."""
+    mock_get = mock_get_session.return_value.get
     original_url = "http://example.com/another"
     current_time = datetime(2024, 4, 1, 10, 30, 0)
     current_ts_str = "20240401103000"
-    mock_datetime.now.return_value = current_time
+    mock_gmtime.return_value = current_time.timetuple()
     expected_memento_uri = "http://memento.example.org/snap/2"
-    mock_response.json.return_value = {
+    mock_response.content = json.dumps({
         "mementos": {
             "closest": {
                 "uri": [expected_memento_uri]
             }
         }
-    }
+    }).encode()
     mock_get.return_value = mock_response
     expected_api_url = f"{constants.MEMENTO_API_BASE_URL}{current_ts_str}/{original_url}"
 
@@ -107,27 +105,26 @@ def test_fetch_memento_snapshot_success_without_wayback_ts(mock_datetime, mock_g
     assert memento_uri == expected_memento_uri
     mock_get.assert_called_once_with(
         expected_api_url,
-        headers={'User-Agent': mock_config['user_agent']},
         timeout=mock_config['request_timeout_api']
     )
     assert f"Querying Memento API: {expected_api_url}" in caplog.text
     assert f"Found potential Memento URI: {expected_memento_uri}" in caplog.text
     mock_response.close.assert_called_once()
-    mock_response.json.assert_called_once()
 
-@patch('api_clients.memento_client.requests.get')
-def test_fetch_memento_snapshot_returns_archive_org_uri(mock_get, mock_config, mock_response, caplog):
+@patch('api_clients.memento_client.get_session')
+def test_fetch_memento_snapshot_returns_archive_org_uri(mock_get_session, mock_config, mock_response, caplog):
     """Test that Memento URIs pointing to web.archive.org are skipped."""
+    mock_get = mock_get_session.return_value.get
     original_url = "http://example.com/loop"
     wayback_timestamp = "20230101120000"
     archive_org_uri = "https://web.archive.org/web/20230101id_/http://example.com/loop"
-    mock_response.json.return_value = {
+    mock_response.content = json.dumps({
         "mementos": {
             "closest": {
                 "uri": [archive_org_uri]
             }
         }
-    }
+    }).encode()
     mock_get.return_value = mock_response
 
     with caplog.at_level(logging.WARNING):
@@ -137,11 +134,29 @@ def test_fetch_memento_snapshot_returns_archive_org_uri(mock_get, mock_config, m
     assert f"Memento API returned a web.archive.org URI ({archive_org_uri}). Skipping fallback to avoid loop." in caplog.text
     mock_get.assert_called_once()
     mock_response.close.assert_called_once()
-    mock_response.json.assert_called_once()
 
-@patch('api_clients.memento_client.requests.get')
-def test_fetch_memento_snapshot_not_found_404(mock_get, mock_config, mock_response, caplog):
+def test_utc_timestamp14_matches_strftime():
+    """Test that the hand-formatted timestamp equals the strftime() form of UTC now."""
+    fixed = time.gmtime(1712000000)
+    with patch('api_clients.memento_client.time.gmtime', return_value=fixed):
+        assert memento_client._utc_timestamp14() == time.strftime('%Y%m%d%H%M%S', fixed)
+
+
+@pytest.mark.parametrize("uri, expected_host", [
+    ("https://web.archive.org/web/2023/http://example.com/", "web.archive.org"),
+    ("//WEB.ARCHIVE.ORG/web/2023/http://example.com/", "web.archive.org"), # Scheme-relative, upper case
+    ("http://archive.example.org:8080", "archive.example.org:8080"), # No path
+    ("http://memento.example.org/snap//http://web.archive.org/", "memento.example.org"), # Archived URL in path
+    ("not a uri", ""),
+])
+def test_uri_host(uri, expected_host):
+    """Test the host extraction used for the web.archive.org loop check."""
+    assert memento_client._uri_host(uri) == expected_host
+
+@patch('api_clients.memento_client.get_session')
+def test_fetch_memento_snapshot_not_found_404(mock_get_session, mock_config, mock_response, caplog):
     """Test Memento snapshot retrieval when API returns 404."""
+    mock_get = mock_get_session.return_value.get
     original_url = "http://example.com/notfound"
     wayback_timestamp = "20230101120000"
     mock_response.status_code = 404
@@ -155,25 +170,21 @@ def test_fetch_memento_snapshot_not_found_404(mock_get, mock_config, mock_respon
     assert f"Memento API returned 404 for {original_url} at timestamp {wayback_timestamp}" in caplog.text
     mock_get.assert_called_once() # Decorator should not retry on 404
     mock_response.close.assert_called_once()
-    mock_response.json.assert_not_called() # No JSON processing on 404
 
-@patch('api_clients.memento_client.requests.get')
-def test_fetch_memento_snapshot_retry_success(mock_get, mock_config, mock_response, caplog):
+@patch('api_clients.memento_client.get_session')
+def test_fetch_memento_snapshot_retry_success(mock_get_session, mock_config, mock_response, caplog, make_mock_response):
     """Test Memento snapshot retrieval succeeds after a retryable error."""
+    mock_get = mock_get_session.return_value.get
     original_url = "http://example.com/retry"
     wayback_timestamp = "20230101120000"
     expected_memento_uri = "http://memento.example.org/snap/3"
 
-    fail_response = MagicMock(spec=requests.Response)
-    fail_response.status_code = 503
-    fail_response.url = "http://mocked.url/fail"
-    fail_response.close = MagicMock()
-    fail_response.raise_for_status.side_effect = requests.exceptions.HTTPError("503 Server Error", response=fail_response)
+    fail_response = make_mock_response(503, "http://mocked.url/fail", http_error="503 Server Error")
 
     success_response = mock_response
-    success_response.json.return_value = {
+    success_response.content = json.dumps({
         "mementos": {"closest": {"uri": [expected_memento_uri]}}
-    }
+    }).encode()
 
     mock_get.side_effect = [fail_response, success_response]
 
@@ -187,17 +198,14 @@ def test_fetch_memento_snapshot_retry_success(mock_get, mock_config, mock_respon
     fail_response.close.assert_called_once()
     success_response.close.assert_called_once()
 
-@patch('api_clients.memento_client.requests.get')
-def test_fetch_memento_snapshot_retry_fails(mock_get, mock_config, caplog):
+@patch('api_clients.memento_client.get_session')
+def test_fetch_memento_snapshot_retry_fails(mock_get_session, mock_config, caplog, make_mock_response):
     """Test Memento snapshot retrieval fails after exhausting retries."""
+    mock_get = mock_get_session.return_value.get
     original_url = "http://example.com/failalways"
     wayback_timestamp = "20230101120000"
 
-    fail_response = MagicMock(spec=requests.Response)
-    fail_response.status_code = 500
-    fail_response.url = "http://mocked.url/fail_always"
-    fail_response.close = MagicMock()
-    fail_response.raise_for_status.side_effect = requests.exceptions.HTTPError("500 Server Error", response=fail_response)
+    fail_response = make_mock_response(500, "http://mocked.url/fail_always", http_error="500 Server Error")
 
     max_attempts = mock_config['max_retries'] + 1
     mock_get.side_effect = [fail_response] * max_attempts
@@ -208,11 +216,12 @@ def test_fetch_memento_snapshot_retry_fails(mock_get, mock_config, caplog):
     assert memento_uri is None
     assert mock_get.call_count == max_attempts
     assert f"Request failed for http://example.com/failalways... after {mock_config['max_retries']} retries. Last exception: 500 Server Error" in caplog.text
-    assert fail_response.close.call_count == max_attempts # Called in func finally + decorator on last fail
+    assert fail_response.close.call_count == max_attempts # Closed on exiting the `with` block on every attempt
 
-@patch('api_clients.memento_client.requests.get')
-def test_fetch_memento_snapshot_request_exception(mock_get, mock_config, caplog):
+@patch('api_clients.memento_client.get_session')
+def test_fetch_memento_snapshot_request_exception(mock_get_session, mock_config, caplog):
     """Test Memento snapshot retrieval handles requests.exceptions.RequestException."""
+    mock_get = mock_get_session.return_value.get
     original_url = "http://example.com/timeout"
     wayback_timestamp = "20230101120000"
     mock_get.side_effect = requests.exceptions.Timeout("Connection timed out")
@@ -227,12 +236,13 @@ def test_fetch_memento_snapshot_request_exception(mock_get, mock_config, caplog)
     expected_api_url = f"{constants.MEMENTO_API_BASE_URL}{wayback_timestamp}/{original_url}"
     assert f"Request failed for http://example.com/timeout... after {mock_config['max_retries']} retries. Last exception: Connection timed out" in caplog.text
 
-@patch('api_clients.memento_client.requests.get')
-def test_fetch_memento_snapshot_invalid_json(mock_get, mock_config, mock_response, caplog):
+@patch('api_clients.memento_client.get_session')
+def test_fetch_memento_snapshot_invalid_json(mock_get_session, mock_config, mock_response, caplog):
     """Test Memento snapshot retrieval handles invalid JSON response."""
+    mock_get = mock_get_session.return_value.get
     original_url = "http://example.com/badjson"
     wayback_timestamp = "20230101120000"
-    mock_response.json.side_effect = json.JSONDecodeError("Expecting value", "doc", 0)
+    mock_response.content = b"This is not JSON"
     mock_response.text = "This is not JSON"
     mock_get.return_value = mock_response
 
@@ -243,11 +253,11 @@ def test_fetch_memento_snapshot_invalid_json(mock_get, mock_config, mock_respons
     assert "Failed to decode JSON response from Memento API" in caplog.text
     mock_get.assert_called_once()
     mock_response.close.assert_called_once()
-    mock_response.json.assert_called_once()
 
-@patch('api_clients.memento_client.requests.get')
-def test_fetch_memento_snapshot_missing_keys(mock_get, mock_config, mock_response, caplog):
+@patch('api_clients.memento_client.get_session')
+def test_fetch_memento_snapshot_missing_keys(mock_get_session, mock_config, mock_response, caplog):
     """Test Memento snapshot retrieval handles missing keys in JSON response."""
+    mock_get = mock_get_session.return_value.get
     original_url = "http://example.com/missingkeys"
     wayback_timestamp = "20230101120000"
     test_cases = [
@@ -260,8 +270,7 @@ def test_fetch_memento_snapshot_missing_keys(mock_get, mock_config, mock_respons
     mock_get.return_value = mock_response
 
     for invalid_data in test_cases:
-        mock_response.json.return_value = invalid_data
-        mock_response.json.reset_mock()
+        mock_response.content = json.dumps(invalid_data).encode()
         mock_response.close.reset_mock()
         caplog.clear()
 
@@ -274,11 +283,11 @@ def test_fetch_memento_snapshot_missing_keys(mock_get, mock_config, mock_respons
         assert "did not contain a usable closest memento URI" in caplog.text
         mock_get.assert_called_once()
         mock_response.close.assert_called_once()
-        mock_response.json.assert_called_once()
 
-@patch('api_clients.memento_client.requests.get')
-def test_fetch_memento_snapshot_unhandled_client_error(mock_get, mock_config, mock_response, caplog):
+@patch('api_clients.memento_client.get_session')
+def test_fetch_memento_snapshot_unhandled_client_error(mock_get_session, mock_config, mock_response, caplog):
     """Test Memento snapshot retrieval handles unhandled 4xx client errors."""
+    mock_get = mock_get_session.return_value.get
     original_url = "http://example.com/clienterror"
     wayback_timestamp = "20230101120000"
     mock_response.status_code = 401 # Unauthorized, not in non_retryable_status
@@ -292,7 +301,6 @@ def test_fetch_memento_snapshot_unhandled_client_error(mock_get, mock_config, mo
     assert "Memento API request failed with unhandled client error 401" in caplog.text
     mock_get.assert_called_once() # Should not retry
     mock_response.close.assert_called_once()
-    mock_response.json.assert_not_called()
 
 
 # --- Tests for fetch_and_process_memento_content ---
@@ -301,13 +309,14 @@ def test_fetch_memento_snapshot_unhandled_client_error(mock_get, mock_config, mo
 @patch('api_clients.memento_client.save_checkpoint')
 @patch('api_clients.memento_client.save_markdown')
 @patch('api_clients.memento_client.extract_and_convert_content')
-@patch('api_clients.memento_client.requests.get')
-def test_fetch_process_memento_success(mock_get, mock_extract, mock_save_md, mock_save_cp,
+@patch('api_clients.memento_client.get_session')
+def test_fetch_process_memento_success(mock_get_session, mock_extract, mock_save_md, mock_save_cp,
                                        mock_config, mock_response, mock_processed_urls_set, caplog):
     """Test successful fetching, processing, and saving of Memento content."""
+    mock_get = mock_get_session.return_value.get
     memento_uri = "http://memento.example.org/snap/success"
     original_url = "http://example.com/original_success"
-    mock_response.text = "<html><body>Memento Content</body></html>"
+    mock_response.content = b"<html><body>Memento Content</body></html>"
     mock_get.return_value = mock_response
     mock_extract.return_value = ("Test Title", "# Markdown Content")
     mock_save_md.return_value = True # Simulate successful save
@@ -320,10 +329,9 @@ def test_fetch_process_memento_success(mock_get, mock_extract, mock_save_md, moc
     assert success is True
     mock_get.assert_called_once_with(
         memento_uri,
-        headers={'User-Agent': mock_config['user_agent']},
         timeout=mock_config['request_timeout_content']
     )
-    mock_extract.assert_called_once_with(mock_response.text, original_url, mock_config, saved_assets_map={})
+    mock_extract.assert_called_once_with(mock_response.content, original_url, mock_config, saved_assets_map={})
     mock_save_md.assert_called_once()
     # Check args for save_markdown (title, content, url, timestamp, config) - timestamp is tricky
     args, kwargs = mock_save_md.call_args
@@ -341,10 +349,11 @@ def test_fetch_process_memento_success(mock_get, mock_extract, mock_save_md, moc
 @patch('api_clients.memento_client.save_checkpoint')
 @patch('api_clients.memento_client.save_markdown')
 @patch('api_clients.memento_client.extract_and_convert_content')
-@patch('api_clients.memento_client.requests.get')
-def test_fetch_process_memento_non_retryable_fail(mock_get, mock_extract, mock_save_md, mock_save_cp,
+@patch('api_clients.memento_client.get_session')
+def test_fetch_process_memento_non_retryable_fail(mock_get_session, mock_extract, mock_save_md, mock_save_cp,
                                                   mock_config, mock_response, mock_processed_urls_set, caplog):
     """Test failure on non-retryable status codes (404, 403)."""
+    mock_get = mock_get_session.return_value.get
     memento_uri = "http://memento.example.org/snap/forbidden"
     original_url = "http://example.com/original_forbidden"
     mock_response.status_code = 403
@@ -367,21 +376,18 @@ def test_fetch_process_memento_non_retryable_fail(mock_get, mock_extract, mock_s
 @patch('api_clients.memento_client.save_checkpoint')
 @patch('api_clients.memento_client.save_markdown')
 @patch('api_clients.memento_client.extract_and_convert_content')
-@patch('api_clients.memento_client.requests.get')
-def test_fetch_process_memento_retry_success(mock_get, mock_extract, mock_save_md, mock_save_cp,
-                                             mock_config, mock_response, mock_processed_urls_set, caplog):
+@patch('api_clients.memento_client.get_session')
+def test_fetch_process_memento_retry_success(mock_get_session, mock_extract, mock_save_md, mock_save_cp,
+                                             mock_config, mock_response, mock_processed_urls_set, caplog, make_mock_response):
     """Test successful processing after a retryable error."""
+    mock_get = mock_get_session.return_value.get
     memento_uri = "http://memento.example.org/snap/retry_content"
     original_url = "http://example.com/original_retry"
 
-    fail_response = MagicMock(spec=requests.Response)
-    fail_response.status_code = 500
-    fail_response.url = "http://mocked.url/fail_content"
-    fail_response.close = MagicMock()
-    fail_response.raise_for_status.side_effect = requests.exceptions.HTTPError("500 Server Error", response=fail_response)
+    fail_response = make_mock_response(500, "http://mocked.url/fail_content", http_error="500 Server Error")
 
     success_response = mock_response
-    success_response.text = "<html>Retry Content</html>"
+    success_response.content = b"<html>Retry Content</html>"
     mock_extract.return_value = ("Retry Title", "# Retry MD")
     mock_save_md.return_value = True
 
@@ -406,18 +412,15 @@ def test_fetch_process_memento_retry_success(mock_get, mock_extract, mock_save_m
 @patch('api_clients.memento_client.save_checkpoint')
 @patch('api_clients.memento_client.save_markdown')
 @patch('api_clients.memento_client.extract_and_convert_content')
-@patch('api_clients.memento_client.requests.get')
-def test_fetch_process_memento_retry_fails(mock_get, mock_extract, mock_save_md, mock_save_cp,
-                                           mock_config, mock_processed_urls_set, caplog):
+@patch('api_clients.memento_client.get_session')
+def test_fetch_process_memento_retry_fails(mock_get_session, mock_extract, mock_save_md, mock_save_cp,
+                                           mock_config, mock_processed_urls_set, caplog, make_mock_response):
     """Test failure after exhausting retries for content fetching."""
+    mock_get = mock_get_session.return_value.get
     memento_uri = "http://memento.example.org/snap/fail_content_always"
     original_url = "http://example.com/original_fail_always"
 
-    fail_response = MagicMock(spec=requests.Response)
-    fail_response.status_code = 502
-    fail_response.url = "http://mocked.url/fail_content_always"
-    fail_response.close = MagicMock()
-    fail_response.raise_for_status.side_effect = requests.exceptions.HTTPError("502 Server Error", response=fail_response)
+    fail_response = make_mock_response(502, "http://mocked.url/fail_content_always", http_error="502 Server Error")
 
     max_attempts = mock_config['max_retries'] + 1
     mock_get.side_effect = [fail_response] * max_attempts
@@ -430,7 +433,7 @@ def test_fetch_process_memento_retry_fails(mock_get, mock_extract, mock_save_md,
     assert success is False
     assert mock_get.call_count == max_attempts
     assert f"Request failed for http://memento.example.org/snap/fail_content_always... after {mock_config['max_retries']} retries. Last exception: 502 Server Error" in caplog.text
-    assert fail_response.close.call_count == max_attempts # Called in func finally + decorator on last fail
+    assert fail_response.close.call_count == max_attempts # Closed on exiting the `with` block on every attempt
     mock_extract.assert_not_called()
     mock_save_md.assert_not_called()
     mock_save_cp.assert_not_called()
@@ -438,10 +441,11 @@ def test_fetch_process_memento_retry_fails(mock_get, mock_extract, mock_save_md,
 @patch('api_clients.memento_client.save_checkpoint')
 @patch('api_clients.memento_client.save_markdown')
 @patch('api_clients.memento_client.extract_and_convert_content')
-@patch('api_clients.memento_client.requests.get')
-def test_fetch_process_memento_request_exception(mock_get, mock_extract, mock_save_md, mock_save_cp,
+@patch('api_clients.memento_client.get_session')
+def test_fetch_process_memento_request_exception(mock_get_session, mock_extract, mock_save_md, mock_save_cp,
                                                  mock_config, mock_processed_urls_set, caplog):
     """Test handling of requests.exceptions.RequestException during content fetch."""
+    mock_get = mock_get_session.return_value.get
     memento_uri = "http://memento.example.org/snap/timeout_content"
     original_url = "http://example.com/original_timeout"
     mock_get.side_effect = requests.exceptions.ConnectionError("Network unreachable")
@@ -463,20 +467,20 @@ def test_fetch_process_memento_request_exception(mock_get, mock_extract, mock_sa
 @patch('api_clients.memento_client.save_checkpoint')
 @patch('api_clients.memento_client.save_markdown')
 @patch('api_clients.memento_client.extract_and_convert_content')
-@patch('api_clients.memento_client.requests.get')
-def test_fetch_process_memento_empty_or_non_html(mock_get, mock_extract, mock_save_md, mock_save_cp,
+@patch('api_clients.memento_client.get_session')
+def test_fetch_process_memento_empty_or_non_html(mock_get_session, mock_extract, mock_save_md, mock_save_cp,
                                                  mock_config, mock_response, mock_processed_urls_set, caplog):
     """Test handling of empty or non-HTML content from Memento URI."""
+    mock_get = mock_get_session.return_value.get
     memento_uri = "http://memento.example.org/snap/non_html"
     original_url = "http://example.com/original_non_html"
-    test_contents = ["", "Just text", '{"json": true}']
+    test_contents = [b"", b"Just text", b'{"json": true}']
 
     mock_get.return_value = mock_response
 
     for content in test_contents:
-        # Use PropertyMock to set the text attribute for this iteration
-        with patch('requests.Response.text', new_callable=PropertyMock) as mock_text:
-            mock_text.return_value = content
+        # Set the response body for this iteration
+        with patch.object(mock_response, 'content', content):
             mock_get.reset_mock()
             mock_extract.reset_mock()
             mock_save_md.reset_mock()
@@ -501,13 +505,14 @@ def test_fetch_process_memento_empty_or_non_html(mock_get, mock_extract, mock_sa
 @patch('api_clients.memento_client.save_checkpoint')
 @patch('api_clients.memento_client.save_markdown')
 @patch('api_clients.memento_client.extract_and_convert_content')
-@patch('api_clients.memento_client.requests.get')
-def test_fetch_process_memento_extract_fail(mock_get, mock_extract, mock_save_md, mock_save_cp,
+@patch('api_clients.memento_client.get_session')
+def test_fetch_process_memento_extract_fail(mock_get_session, mock_extract, mock_save_md, mock_save_cp,
                                             mock_config, mock_response, mock_processed_urls_set, caplog):
     """Test handling when extract_and_convert_content fails."""
+    mock_get = mock_get_session.return_value.get
     memento_uri = "http://memento.example.org/snap/extract_fail"
     original_url = "http://example.com/original_extract_fail"
-    mock_response.text = "<html><body>Bad Content</body></html>"
+    mock_response.content = b"<html><body>Bad Content</body></html>"
     mock_get.return_value = mock_response
     mock_extract.return_value = (None, None) # Simulate extraction failure
 
@@ -527,13 +532,14 @@ def test_fetch_process_memento_extract_fail(mock_get, mock_extract, mock_save_md
 @patch('api_clients.memento_client.save_checkpoint')
 @patch('api_clients.memento_client.save_markdown')
 @patch('api_clients.memento_client.extract_and_convert_content')
-@patch('api_clients.memento_client.requests.get')
-def test_fetch_process_memento_save_fail(mock_get, mock_extract, mock_save_md, mock_save_cp,
+@patch('api_clients.memento_client.get_session')
+def test_fetch_process_memento_save_fail(mock_get_session, mock_extract, mock_save_md, mock_save_cp,
                                          mock_config, mock_response, mock_processed_urls_set, caplog):
     """Test handling when save_markdown fails."""
+    mock_get = mock_get_session.return_value.get
     memento_uri = "http://memento.example.org/snap/save_fail"
     original_url = "http://example.com/original_save_fail"
-    mock_response.text = "<html><body>Good Content</body></html>"
+    mock_response.content = b"<html><body>Good Content</body></html>"
     mock_get.return_value = mock_response
     mock_extract.return_value = ("Save Fail Title", "# Save Fail MD")
     mock_save_md.return_value = False # Simulate save failure
@@ -554,10 +560,11 @@ def test_fetch_process_memento_save_fail(mock_get, mock_extract, mock_save_md, m
 @patch('api_clients.memento_client.save_checkpoint')
 @patch('api_clients.memento_client.save_markdown')
 @patch('api_clients.memento_client.extract_and_convert_content')
-@patch('api_clients.memento_client.requests.get')
-def test_fetch_process_memento_unhandled_client_error(mock_get, mock_extract, mock_save_md, mock_save_cp,
+@patch('api_clients.memento_client.get_session')
+def test_fetch_process_memento_unhandled_client_error(mock_get_session, mock_extract, mock_save_md, mock_save_cp,
                                                       mock_config, mock_response, mock_processed_urls_set, caplog):
     """Test handling of unhandled client errors during content fetch."""
+    mock_get = mock_get_session.return_value.get
     memento_uri = "http://memento.example.org/snap/client_error_content"
     original_url = "http://example.com/original_client_error"
     mock_response.status_code = 418 # I'm a teapot
@@ -575,4 +582,44 @@ def test_fetch_process_memento_unhandled_client_error(mock_get, mock_extract, mo
     mock_extract.assert_not_called()
     mock_save_md.assert_not_called()
     mock_save_cp.assert_not_called()
-    mock_response.close.assert_called_once()
\ No newline at end of file
+    mock_response.close.assert_called_once()
+
+# --- Tests for fetch_mementos_batch ---
+
+@patch('api_clients.memento_client.fetch_memento_snapshot')
+def test_fetch_mementos_batch_success(mock_fetch_snapshot, mock_config):
+    """Test that the batch looks up every URL and preserves input order."""
+    snapshots = {
+        "http://example.com/a": "20230101000000",
+        "http://example.com/b": "20230202000000",
+        "http://example.com/c": None,
+    }
+    found = {"http://example.com/a": "http://memento.example.org/a", "http://example.com/c": "http://memento.example.org/c"}
+    mock_fetch_snapshot.side_effect = lambda url, config, wayback_timestamp=None: found.get(url)
+
+    results = memento_client.fetch_mementos_batch(snapshots, mock_config)
+
+    assert list(results.keys()) == list(snapshots.keys())
+    assert results == {
+        "http://example.com/a": "http://memento.example.org/a",
+        "http://example.com/b": None,
+        "http://example.com/c": "http://memento.example.org/c",
+    }
+    assert mock_fetch_snapshot.call_count == 3
+    for url, timestamp in snapshots.items():
+        mock_fetch_snapshot.assert_any_call(url, config=mock_config, wayback_timestamp=timestamp)
+
+
+@patch('api_clients.memento_client.fetch_memento_snapshot', side_effect=RuntimeError("boom"))
+def test_fetch_mementos_batch_worker_error(mock_fetch_snapshot, mock_config, caplog):
+    """Test that an unexpected worker error maps the URL to None instead of aborting the batch."""
+    with caplog.at_level(logging.ERROR):
+        results = memento_client.fetch_mementos_batch({"http://example.com/x": None}, mock_config)
+
+    assert results == {"http://example.com/x": None}
+    assert "Unexpected error looking up Memento snapshot for http://example.com/x: boom" in caplog.text
+
+
+def test_fetch_mementos_batch_empty(mock_config):
+    """Test that an empty input returns an empty result without starting workers."""
+    assert memento_client.fetch_mementos_batch({}, mock_config) == {}
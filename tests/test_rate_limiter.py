@@ -0,0 +1,104 @@
+# tests/test_rate_limiter.py
+
+import pytest
+from unittest.mock import patch
+
+# Module to test
+from api_clients.rate_limiter import TokenBucket, HostRateLimiter
+
+
+@pytest.fixture
+def clock():
+    """Controls time.monotonic() as seen by the rate limiter."""
+    with patch('api_clients.rate_limiter.time.monotonic', return_value=100.0) as mock_monotonic:
+        yield mock_monotonic
+
+
+def test_token_bucket_allows_burst_then_spaces_requests(clock):
+    """Test that `burst` requests pass at once and later ones queue at 1/rate intervals."""
+    bucket = TokenBucket(rate=2, burst=2)
+
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+
+
+def test_token_bucket_refills_over_time(clock):
+    """Test that tokens come back at `rate` per second, up to `burst`."""
+    bucket = TokenBucket(rate=2, burst=2)
+    bucket.reserve()
+    bucket.reserve()
+
+    clock.return_value = 100.5 # One token refilled
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.5
+
+    clock.return_value = 200.0 # Long idle: refill is capped at burst
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.5]
+
+
+def test_token_bucket_unlimited_rate(clock):
+    """Test that rate 0 never makes callers wait."""
+    bucket = TokenBucket(rate=0, burst=1)
+    assert all(bucket.reserve() == 0.0 for _ in range(100))
+
+
+def test_token_bucket_pause(clock):
+    """Test that a pause blocks the host even when tokens are available."""
+    bucket = TokenBucket(rate=0, burst=1)
+    bucket.pause_until(107.0)
+    assert bucket.reserve() == 7.0
+
+    clock.return_value = 108.0
+    assert bucket.reserve() == 0.0
+
+
+@patch('api_clients.rate_limiter.time.sleep')
+def test_host_rate_limiter_is_per_host(mock_sleep, clock):
+    """Test that each host has its own bucket and acquire() sleeps for the reserved wait."""
+    limiter = HostRateLimiter()
+    limiter.configure(1, 1)
+
+    limiter.acquire("web.archive.org")
+    limiter.acquire("timetravel.mementoweb.org") # Different host: its own token
+    mock_sleep.assert_not_called()
+
+    limiter.acquire("web.archive.org")
+    mock_sleep.assert_called_once_with(1.0)
+
+
+@patch('api_clients.rate_limiter.time.sleep')
+def test_host_rate_limiter_pause_only_affects_that_host(mock_sleep, clock):
+    """Test that pause() (e.g. from a Retry-After) holds back only the given host."""
+    limiter = HostRateLimiter()
+    limiter.pause("web.archive.org", 30)
+    limiter.pause("web.archive.org", None) # No Retry-After: ignored
+
+    limiter.acquire("timetravel.mementoweb.org")
+    mock_sleep.assert_not_called()
+    limiter.acquire("web.archive.org")
+    mock_sleep.assert_called_once_with(30.0)
+
+
+@patch('api_clients.rate_limiter.time.sleep')
+def test_host_rate_limiter_caps_pause(mock_sleep, clock):
+    """Test that a huge Retry-After holds the host back for at most max_pause seconds."""
+    limiter = HostRateLimiter()
+    limiter.configure(1, 1, max_pause=30)
+
+    limiter.pause("web.archive.org", 86400)
+    limiter.acquire("web.archive.org")
+    mock_sleep.assert_called_once_with(30.0)
+
+
+@patch('api_clients.rate_limiter.time.sleep')
+def test_host_rate_limiter_caps_pause_when_unlimited(mock_sleep, clock):
+    """Test that the max_pause cap also applies when the rate itself is unlimited (0)."""
+    limiter = HostRateLimiter()
+    limiter.configure(0, 1, max_pause=30)
+
+    limiter.pause("web.archive.org", 86400)
+    limiter.acquire("web.archive.org")
+    mock_sleep.assert_called_once_with(30.0)
+
+    clock.return_value = 130.0 # Cap elapsed: the host is open again
+    limiter.acquire("web.archive.org")
+    mock_sleep.assert_called_once()
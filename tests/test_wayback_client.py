@@ -21,25 +21,21 @@ def mock_config():
     }
 
 @pytest.fixture
-def mock_response():
+def mock_response(make_mock_response):
     """Creates a reusable MagicMock for requests.Response."""
-    response = MagicMock(spec=requests.Response)
-    response.status_code = 200
+    response = make_mock_response()
     response.content = b"Sample asset content"
     response.text = "<html><body>Sample HTML</body></html>"
     response.encoding = 'utf-8'
-    response.url = "http://mocked.url"
-    # Mock the close method
-    response.close = MagicMock()
-    # Mock raise_for_status to potentially raise HTTPError
-    response.raise_for_status = MagicMock()
+    response.headers = {'Content-Type': 'text/html; charset=utf-8'}
     return response
 
 # --- Tests for fetch_asset ---
 
-@patch('api_clients.wayback_client.requests.get')
-def test_fetch_asset_success(mock_get, mock_config, mock_response, caplog):
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_asset_success(mock_get_session, mock_config, mock_response, caplog):
     """Test successful fetching of asset content."""
+    mock_get = mock_get_session.return_value.get
     mock_response.content = b"Test asset bytes"
     mock_get.return_value = mock_response
 
@@ -51,18 +47,19 @@ def test_fetch_asset_success(mock_get, mock_config, mock_response, caplog):
         content = wayback_client.fetch_asset(asset_url, timestamp, config=mock_config)
 
     assert content == b"Test asset bytes"
+    mock_get_session.assert_called_once_with(mock_config['user_agent']) # User-Agent set on the shared session
     mock_get.assert_called_once_with(
         expected_archive_url,
-        headers={'User-Agent': mock_config['user_agent']},
         timeout=mock_config['request_timeout_seconds'],
         stream=True
     )
     assert f"Successfully fetched asset: {asset_url}" in caplog.text
     mock_response.close.assert_called_once()
 
-@patch('api_clients.wayback_client.requests.get')
-def test_fetch_asset_not_found_404(mock_get, mock_config, mock_response, caplog):
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_asset_not_found_404(mock_get_session, mock_config, mock_response, caplog):
     """Test fetch_asset when the asset returns a 404 status."""
+    mock_get = mock_get_session.return_value.get
     mock_response.status_code = 404
     mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError("404 Client Error")
     mock_get.return_value = mock_response
@@ -78,14 +75,11 @@ def test_fetch_asset_not_found_404(mock_get, mock_config, mock_response, caplog)
     mock_get.assert_called_once() # Decorator should not retry on 404
     mock_response.close.assert_called_once()
 
-@patch('api_clients.wayback_client.requests.get')
-def test_fetch_asset_retry_success(mock_get, mock_config, mock_response, caplog):
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_asset_retry_success(mock_get_session, mock_config, mock_response, caplog, make_mock_response):
     """Test fetch_asset successfully fetches after a retryable error."""
-    fail_response = MagicMock(spec=requests.Response)
-    fail_response.status_code = 503
-    fail_response.url = "http://mocked.url/fail"
-    fail_response.close = MagicMock()
-    fail_response.raise_for_status.side_effect = requests.exceptions.HTTPError("503 Server Error", response=fail_response)
+    mock_get = mock_get_session.return_value.get
+    fail_response = make_mock_response(503, "http://mocked.url/fail", http_error="503 Server Error")
 
     success_response = mock_response # Use the fixture for success
     success_response.content = b"Success after retry"
@@ -106,14 +100,11 @@ def test_fetch_asset_retry_success(mock_get, mock_config, mock_response, caplog)
     fail_response.close.assert_called_once()
     success_response.close.assert_called_once()
 
-@patch('api_clients.wayback_client.requests.get')
-def test_fetch_asset_retry_fails(mock_get, mock_config, caplog):
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_asset_retry_fails(mock_get_session, mock_config, caplog, make_mock_response):
     """Test fetch_asset fails after exhausting retries."""
-    fail_response = MagicMock(spec=requests.Response)
-    fail_response.status_code = 500
-    fail_response.url = "http://mocked.url/fail_always"
-    fail_response.close = MagicMock()
-    fail_response.raise_for_status.side_effect = requests.exceptions.HTTPError("500 Server Error", response=fail_response)
+    mock_get = mock_get_session.return_value.get
+    fail_response = make_mock_response(500, "http://mocked.url/fail_always", http_error="500 Server Error")
 
     # Simulate failures for all attempts (initial + retries)
     max_attempts = mock_config['max_retries'] + 1
@@ -131,9 +122,10 @@ def test_fetch_asset_retry_fails(mock_get, mock_config, caplog):
     assert f"Request failed for {asset_url}... after {mock_config['max_retries']} retries. Last exception: 500 Server Error" in caplog.text
     assert fail_response.close.call_count == max_attempts
 
-@patch('api_clients.wayback_client.requests.get')
-def test_fetch_asset_request_exception(mock_get, mock_config, caplog):
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_asset_request_exception(mock_get_session, mock_config, caplog):
     """Test fetch_asset handles requests.exceptions.RequestException."""
+    mock_get = mock_get_session.return_value.get
     mock_get.side_effect = requests.exceptions.Timeout("Connection timed out")
 
     asset_url = "http://example.com/timeout.png"
@@ -148,9 +140,10 @@ def test_fetch_asset_request_exception(mock_get, mock_config, caplog):
     # Check the final error log from the decorator after retries are exhausted
     assert f"Request failed for {asset_url}... after {mock_config['max_retries']} retries. Last exception: Connection timed out" in caplog.text
 
-@patch('api_clients.wayback_client.requests.get')
-def test_fetch_asset_empty_content(mock_get, mock_config, mock_response, caplog):
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_asset_empty_content(mock_get_session, mock_config, mock_response, caplog):
     """Test fetch_asset handles empty but successful response."""
+    mock_get = mock_get_session.return_value.get
     mock_response.content = b"" # Empty content
     mock_get.return_value = mock_response
 
@@ -165,9 +158,69 @@ def test_fetch_asset_empty_content(mock_get, mock_config, mock_response, caplog)
     mock_get.assert_called_once()
     mock_response.close.assert_called_once()
 
-@patch('api_clients.wayback_client.requests.get')
-def test_fetch_asset_unhandled_client_error(mock_get, mock_config, mock_response, caplog):
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_asset_streams_to_dest_path(mock_get_session, mock_config, mock_response, tmp_path):
+    """Test fetch_asset writes the body to dest_path chunk by chunk."""
+    mock_get = mock_get_session.return_value.get
+    mock_response.iter_content.return_value = iter([b"chunk-1,", b"chunk-2"])
+    mock_get.return_value = mock_response
+    dest_path = tmp_path / "style.css"
+
+    result = wayback_client.fetch_asset("http://example.com/style.css", "20230101000000", config=mock_config, dest_path=str(dest_path))
+
+    assert result == str(dest_path)
+    assert dest_path.read_bytes() == b"chunk-1,chunk-2"
+    mock_response.iter_content.assert_called_once_with(chunk_size=wayback_client.constants.DOWNLOAD_CHUNK_SIZE)
+    mock_response.close.assert_called_once()
+
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_asset_uses_configured_chunk_size(mock_get_session, mock_config, mock_response, tmp_path):
+    """Test that 'asset_chunk_size' overrides the default streaming chunk size."""
+    mock_get_session.return_value.get.return_value = mock_response
+    mock_response.iter_content.return_value = iter([b"data"])
+    mock_config['asset_chunk_size'] = 8192
+
+    wayback_client.fetch_asset("http://example.com/a.js", "20230101000000", config=mock_config, dest_path=str(tmp_path / "a.js"))
+
+    mock_response.iter_content.assert_called_once_with(chunk_size=8192)
+
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_asset_dest_path_empty_removes_file(mock_get_session, mock_config, mock_response, tmp_path, caplog):
+    """Test an empty streamed body leaves no file behind."""
+    mock_get = mock_get_session.return_value.get
+    mock_response.iter_content.return_value = iter([])
+    mock_get.return_value = mock_response
+    dest_path = tmp_path / "empty.gif"
+
+    with caplog.at_level(logging.WARNING):
+        result = wayback_client.fetch_asset("http://example.com/empty.gif", "20230101000000", config=mock_config, dest_path=str(dest_path))
+
+    assert result is None
+    assert not dest_path.exists()
+    assert "Fetched empty asset content" in caplog.text
+
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_asset_dest_path_interrupted_stream_is_retried(mock_get_session, mock_config, mock_response, tmp_path):
+    """Test a connection drop mid-stream removes the partial file and retries."""
+    def broken_stream(chunk_size):
+        yield b"partial"
+        raise requests.exceptions.ConnectionError("Connection reset")
+
+    mock_get = mock_get_session.return_value.get
+    mock_response.iter_content.side_effect = [broken_stream(1), iter([b"complete"])]
+    mock_get.return_value = mock_response
+    dest_path = tmp_path / "logo.png"
+
+    result = wayback_client.fetch_asset("http://example.com/logo.png", "20230101000000", config=mock_config, dest_path=str(dest_path))
+
+    assert result == str(dest_path)
+    assert dest_path.read_bytes() == b"complete"
+    assert mock_get.call_count == 2
+
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_asset_unhandled_client_error(mock_get_session, mock_config, mock_response, caplog):
     """Test fetch_asset handles unhandled 4xx client errors."""
+    mock_get = mock_get_session.return_value.get
     mock_response.status_code = 403 # Forbidden, not in non_retryable_status by default
     mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError("403 Client Error")
     mock_get.return_value = mock_response
@@ -186,10 +239,11 @@ def test_fetch_asset_unhandled_client_error(mock_get, mock_config, mock_response
 
 # --- Tests for fetch_page_content ---
 
-@patch('api_clients.wayback_client.requests.get')
-def test_fetch_page_content_success(mock_get, mock_config, mock_response, caplog):
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_page_content_success(mock_get_session, mock_config, mock_response, caplog):
     """Test successful fetching of page HTML content."""
-    mock_response.text = "<html><head><title>Test Page</title></head><body>Content</body></html>"
+    mock_get = mock_get_session.return_value.get
+    mock_response.content = b"<html><head><title>Test Page</title></head><body>Content</body></html>"
     mock_get.return_value = mock_response
 
     original_url = "http://example.com/page.html"
@@ -200,17 +254,19 @@ def test_fetch_page_content_success(mock_get, mock_config, mock_response, caplog
         content = wayback_client.fetch_page_content(original_url, timestamp, config=mock_config)
 
     assert content == "<html><head><title>Test Page</title></head><body>Content</body></html>"
+    mock_get_session.assert_called_once_with(mock_config['user_agent']) # User-Agent set on the shared session
     mock_get.assert_called_once_with(
         expected_archive_url,
-        headers={'User-Agent': mock_config['user_agent']},
-        timeout=mock_config['request_timeout_seconds']
+        timeout=mock_config['request_timeout_seconds'],
+        stream=True
     )
     assert f"Successfully fetched content for: {original_url}" in caplog.text
     mock_response.close.assert_called_once()
 
-@patch('api_clients.wayback_client.requests.get')
-def test_fetch_page_content_not_found_404(mock_get, mock_config, mock_response, caplog):
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_page_content_not_found_404(mock_get_session, mock_config, mock_response, caplog):
     """Test fetch_page_content when the page returns a 404 status."""
+    mock_get = mock_get_session.return_value.get
     mock_response.status_code = 404
     mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError("404 Client Error")
     mock_get.return_value = mock_response
@@ -226,17 +282,14 @@ def test_fetch_page_content_not_found_404(mock_get, mock_config, mock_response,
     mock_get.assert_called_once() # Decorator should not retry on 404
     mock_response.close.assert_called_once()
 
-@patch('api_clients.wayback_client.requests.get')
-def test_fetch_page_content_retry_success(mock_get, mock_config, mock_response, caplog):
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_page_content_retry_success(mock_get_session, mock_config, mock_response, caplog, make_mock_response):
     """Test fetch_page_content successfully fetches after a retryable error."""
-    fail_response = MagicMock(spec=requests.Response)
-    fail_response.status_code = 429 # Too Many Requests
-    fail_response.url = "http://mocked.url/fail_page"
-    fail_response.close = MagicMock()
-    fail_response.raise_for_status.side_effect = requests.exceptions.HTTPError("429 Client Error", response=fail_response)
+    mock_get = mock_get_session.return_value.get
+    fail_response = make_mock_response(429, "http://mocked.url/fail_page", http_error="429 Client Error") # Too Many Requests
 
     success_response = mock_response # Use the fixture for success
-    success_response.text = "<html>Retry Success</html>"
+    success_response.content = b"<html>Retry Success</html>"
 
     # Simulate failure then success
     mock_get.side_effect = [fail_response, success_response]
@@ -254,14 +307,11 @@ def test_fetch_page_content_retry_success(mock_get, mock_config, mock_response,
     fail_response.close.assert_called_once()
     success_response.close.assert_called_once()
 
-@patch('api_clients.wayback_client.requests.get')
-def test_fetch_page_content_retry_fails(mock_get, mock_config, caplog):
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_page_content_retry_fails(mock_get_session, mock_config, caplog, make_mock_response):
     """Test fetch_page_content fails after exhausting retries."""
-    fail_response = MagicMock(spec=requests.Response)
-    fail_response.status_code = 500
-    fail_response.url = "http://mocked.url/fail_always_page"
-    fail_response.close = MagicMock()
-    fail_response.raise_for_status.side_effect = requests.exceptions.HTTPError("500 Server Error", response=fail_response)
+    mock_get = mock_get_session.return_value.get
+    fail_response = make_mock_response(500, "http://mocked.url/fail_always_page", http_error="500 Server Error")
 
     # Simulate failures for all attempts (initial + retries)
     max_attempts = mock_config['max_retries'] + 1
@@ -279,9 +329,10 @@ def test_fetch_page_content_retry_fails(mock_get, mock_config, caplog):
     assert f"Request failed for {original_url}... after {mock_config['max_retries']} retries. Last exception: 500 Server Error" in caplog.text
     assert fail_response.close.call_count == max_attempts
 
-@patch('api_clients.wayback_client.requests.get')
-def test_fetch_page_content_request_exception(mock_get, mock_config, caplog):
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_page_content_request_exception(mock_get_session, mock_config, caplog):
     """Test fetch_page_content handles requests.exceptions.RequestException."""
+    mock_get = mock_get_session.return_value.get
     mock_get.side_effect = requests.exceptions.ConnectionError("DNS lookup failed")
 
     original_url = "http://nonexistent.domain/page"
@@ -296,19 +347,20 @@ def test_fetch_page_content_request_exception(mock_get, mock_config, caplog):
     # Check the final error log from the decorator after retries are exhausted
     assert f"Request failed for {original_url}... after {mock_config['max_retries']} retries. Last exception: DNS lookup failed" in caplog.text
 
-@patch('api_clients.wayback_client.requests.get')
-def test_fetch_page_content_empty_or_non_html(mock_get, mock_config, mock_response, caplog):
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_page_content_empty_or_non_html(mock_get_session, mock_config, mock_response, caplog):
     """Test fetch_page_content handles empty or non-HTML successful response."""
+    mock_get = mock_get_session.return_value.get
     test_cases = [
-        "", # Empty string
-        "Just some text, no HTML tags",
-        '{"json": "data"}',
+        b"", # Empty body
+        b"Just some text, no HTML tags",
+        b'{"json": "data"}',
     ]
     original_url = "http://example.com/non_html"
     timestamp = "20230101000000"
 
-    for text_content in test_cases:
-        mock_response.text = text_content
+    for raw_content in test_cases:
+        mock_response.content = raw_content
         mock_get.return_value = mock_response
         mock_get.reset_mock()
         mock_response.close.reset_mock()
@@ -323,11 +375,39 @@ def test_fetch_page_content_empty_or_non_html(mock_get, mock_config, mock_respon
         mock_response.close.assert_called_once()
 
 
-@patch('api_clients.wayback_client.requests.get')
-def test_fetch_page_content_decoding_error(mock_get, mock_config, mock_response, caplog):
-    """Test fetch_page_content handles errors during text decoding."""
-    # Configure the mock response's text property to raise an error
-    type(mock_response).text = property(fget=MagicMock(side_effect=UnicodeDecodeError("utf-8", b"\x80abc", 0, 1, "invalid start byte")))
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_page_content_non_html_content_type(mock_get_session, mock_config, mock_response, caplog):
+    """Test that a non-HTML Content-Type is rejected before the body is read."""
+    mock_get = mock_get_session.return_value.get
+    mock_response.headers = {'Content-Type': 'application/pdf'}
+    type(mock_response).content = property(fget=MagicMock(side_effect=AssertionError("body must not be read")))
+    mock_get.return_value = mock_response
+
+    with caplog.at_level(logging.WARNING):
+        content = wayback_client.fetch_page_content("http://example.com/file.pdf", "20230101000000", config=mock_config)
+
+    assert content is None
+    assert "Skipping non-HTML content (application/pdf)" in caplog.text
+    mock_response.close.assert_called_once()
+
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_page_content_without_content_type(mock_get_session, mock_config, mock_response):
+    """Test that a missing Content-Type falls back to sniffing the body."""
+    mock_get = mock_get_session.return_value.get
+    mock_response.headers = {}
+    mock_response.content = b"<html><body>No header</body></html>"
+    mock_get.return_value = mock_response
+
+    content = wayback_client.fetch_page_content("http://example.com/page", "20230101000000", config=mock_config)
+
+    assert content == "<html><body>No header</body></html>"
+
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_page_content_decoding_error(mock_get_session, mock_config, mock_response, caplog):
+    """Test fetch_page_content handles errors while reading/decoding the body."""
+    mock_get = mock_get_session.return_value.get
+    # Reading the body fails, e.g. a corrupt gzip Content-Encoding
+    type(mock_response).content = property(fget=MagicMock(side_effect=requests.exceptions.ContentDecodingError("failed to decode gzip body")))
     mock_get.return_value = mock_response
 
     original_url = "http://example.com/bad_encoding"
@@ -338,13 +418,62 @@ def test_fetch_page_content_decoding_error(mock_get, mock_config, mock_response,
 
     assert content is None
     assert "Error decoding content" in caplog.text
-    assert "invalid start byte" in caplog.text
+    assert "failed to decode gzip body" in caplog.text
     mock_get.assert_called_once()
     mock_response.close.assert_called_once()
 
-@patch('api_clients.wayback_client.requests.get')
-def test_fetch_page_content_unhandled_client_error(mock_get, mock_config, mock_response, caplog):
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_page_content_interrupted_body_is_retried(mock_get_session, mock_config, mock_response):
+    """Test a connection drop while reading the page body is retried, not treated as a bad page."""
+    mock_get = mock_get_session.return_value.get
+    bodies = iter([requests.exceptions.ChunkedEncodingError("Connection broken: IncompleteRead"), b"<html><body>Complete</body></html>"])
+    def read_body(self):
+        body = next(bodies)
+        if isinstance(body, Exception):
+            raise body
+        return body
+    type(mock_response).content = property(fget=read_body)
+    mock_get.return_value = mock_response
+
+    content = wayback_client.fetch_page_content("http://example.com/page", "20230101000000", config=mock_config)
+
+    assert content == "<html><body>Complete</body></html>"
+    assert mock_get.call_count == 2
+    assert mock_response.close.call_count == 2
+
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_asset_interrupted_body_is_retried(mock_get_session, mock_config, mock_response):
+    """Test a connection drop while reading an asset body into memory is retried."""
+    mock_get = mock_get_session.return_value.get
+    bodies = iter([requests.exceptions.ConnectionError("Connection reset"), b"asset bytes"])
+    def read_body(self):
+        body = next(bodies)
+        if isinstance(body, Exception):
+            raise body
+        return body
+    type(mock_response).content = property(fget=read_body)
+    mock_get.return_value = mock_response
+
+    content = wayback_client.fetch_asset("http://example.com/app.js", "20230101000000", config=mock_config)
+
+    assert content == b"asset bytes"
+    assert mock_get.call_count == 2
+
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_page_content_invalid_utf8_is_replaced(mock_get_session, mock_config, mock_response):
+    """Test that invalid UTF-8 bytes are replaced instead of failing the page."""
+    mock_get = mock_get_session.return_value.get
+    mock_response.content = b"<HTML><body>caf\xe9 \xc3\xa9</body></HTML>"
+    mock_get.return_value = mock_response
+
+    content = wayback_client.fetch_page_content("http://example.com/latin1", "20230101000000", config=mock_config)
+
+    assert content == "<HTML><body>caf\ufffd \u00e9</body></HTML>"
+
+@patch('api_clients.wayback_client.get_session')
+def test_fetch_page_content_unhandled_client_error(mock_get_session, mock_config, mock_response, caplog):
     """Test fetch_page_content handles unhandled 4xx client errors."""
+    mock_get = mock_get_session.return_value.get
     mock_response.status_code = 401 # Unauthorized
     mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError("401 Client Error")
     mock_get.return_value = mock_response
@@ -358,4 +487,42 @@ def test_fetch_page_content_unhandled_client_error(mock_get, mock_config, mock_r
     assert content is None
     assert "Wayback Machine request failed with unhandled client error 401" in caplog.text
     mock_get.assert_called_once() # Should not retry
-    mock_response.close.assert_called_once()
\ No newline at end of file
+    mock_response.close.assert_called_once()
+
+# --- Tests for fetch_assets_batch ---
+
+@patch('api_clients.wayback_client.fetch_asset')
+def test_fetch_assets_batch_success(mock_fetch_asset, mock_config):
+    """Test that the batch downloads every asset and preserves input order."""
+    assets = {
+        "http://example.com/a.css": "/out/_assets/css/a.css",
+        "http://example.com/b.png": "/out/_assets/img/b.png",
+        "http://example.com/c.js": "/out/_assets/js/c.js",
+    }
+    mock_fetch_asset.side_effect = lambda url, ts, config, dest_path=None: None if url.endswith("b.png") else dest_path
+
+    results = wayback_client.fetch_assets_batch(assets, "20230101000000", mock_config)
+
+    assert list(results.keys()) == list(assets.keys())
+    assert results == {
+        "http://example.com/a.css": "/out/_assets/css/a.css",
+        "http://example.com/b.png": None,
+        "http://example.com/c.js": "/out/_assets/js/c.js",
+    }
+    for url, dest_path in assets.items():
+        mock_fetch_asset.assert_any_call(url, "20230101000000", config=mock_config, dest_path=dest_path)
+
+
+@patch('api_clients.wayback_client.fetch_asset', side_effect=RuntimeError("boom"))
+def test_fetch_assets_batch_worker_error(mock_fetch_asset, mock_config, caplog):
+    """Test that an unexpected worker error maps the asset to None instead of aborting the batch."""
+    with caplog.at_level(logging.ERROR):
+        results = wayback_client.fetch_assets_batch({"http://example.com/x.css": "/out/x.css"}, "20230101000000", mock_config)
+
+    assert results == {"http://example.com/x.css": None}
+    assert "Unexpected error downloading asset http://example.com/x.css: boom" in caplog.text
+
+
+def test_fetch_assets_batch_empty(mock_config):
+    """Test that an empty input returns an empty result without starting workers."""
+    assert wayback_client.fetch_assets_batch({}, "20230101000000", mock_config) == {}